@@ -1,14 +1,15 @@
 # extract_backup.py
 import csv
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from timetable.database import create_db_engine
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "timetable_v5.db")
 
 
 def extract():
-    engine = create_engine(f'sqlite:///{DB_PATH}')
+    engine = create_db_engine(DB_PATH)
     with engine.connect() as conn:
         print("--- Extracting Backup Data ---")
 
@@ -1,6 +1,7 @@
 # check_my_db.py
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from timetable.database import create_db_engine
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "timetable_v5.db")
@@ -14,7 +15,7 @@ def verify():
         print("ERROR: File does not exist at that path!")
         return
 
-    engine = create_engine(f'sqlite:///{DB_PATH}')
+    engine = create_db_engine(DB_PATH)
 
     with engine.connect() as conn:
         # Check Sections
@@ -1,8 +1,7 @@
 # debug_assignments.py
 import sys
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from timetable.database import create_db_engine, session_factory
 
 # IMPORTANT: We import the models from your main application
 from main import Base, Teacher, Subject, ClassSection, TeacherAssignment
@@ -18,8 +17,8 @@ def inspect_database(db_path):
 
     print(f"\n--- Inspecting Assignments in: {os.path.basename(db_path)} ---")
 
-    engine = create_engine(f'sqlite:///{db_path}')
-    Session = sessionmaker(bind=engine)
+    engine = create_db_engine(db_path)
+    Session = session_factory(engine)
     session = Session()
 
     try:
@@ -1,8 +1,9 @@
 # export_OLD_database.py
 import csv
 import os
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Table, UniqueConstraint
-from sqlalchemy.orm import relationship, sessionmaker, declarative_base
+from sqlalchemy import Column, Integer, String, ForeignKey, Table, UniqueConstraint
+from sqlalchemy.orm import relationship, declarative_base
+from timetable.database import create_db_engine, session_factory
 
 # --- IMPORTANT: We define the OLD database structure right here ---
 # This avoids importing the NEW, updated models from main.py
@@ -61,8 +62,8 @@ def export_original_data():
         print(f"ERROR: Database file not found at {DB_PATH}. Please ensure your old, working database is here.")
         return
 
-    engine = create_engine(f'sqlite:///{DB_PATH}')
-    Session = sessionmaker(bind=engine)
+    engine = create_db_engine(DB_PATH)
+    Session = session_factory(engine)
     session = Session()
 
     try:
@@ -1,9 +1,8 @@
 # export_assignments_names.py (THE ULTIMATE FIX)
 import csv
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy import text  # <--- CRITICAL NEW IMPORT
+from timetable.database import create_db_engine, session_factory
 
 # We still need to import the models for the table names
 from main import Base, Teacher, Subject, ClassSection, TeacherAssignment
@@ -14,8 +13,8 @@ DB_PATH = os.path.join(BASE_DIR, "timetable_v5.db")
 
 def export_name_assignments():
     print("--- Exporting ALL Assignments by NAME for Editing (Pure SQL) ---")
-    engine = create_engine(f'sqlite:///{DB_PATH}')
-    Session = sessionmaker(bind=engine)
+    engine = create_db_engine(DB_PATH)
+    Session = session_factory(engine)
     session = Session()
 
     try:
@@ -1,8 +1,7 @@
 # export_debug_ids.py
 import csv
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from timetable.database import create_db_engine, session_factory
 
 from main import Base, Teacher, Subject, ClassSection, TeacherAssignment, SubjectRequirement, ConcurrentSet
 
@@ -12,8 +11,8 @@ DB_PATH = os.path.join(BASE_DIR, "timetable_v5.db")
 
 def export_raw_ids():
     print("--- Starting RAW ID Export ---")
-    engine = create_engine(f'sqlite:///{DB_PATH}')
-    Session = sessionmaker(bind=engine)
+    engine = create_db_engine(DB_PATH)
+    Session = session_factory(engine)
     session = Session()
 
     try:
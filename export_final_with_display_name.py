@@ -1,7 +1,6 @@
 # export_original_data.py
 import csv, os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from timetable.database import create_db_engine, session_factory
 from main import Base, Teacher, Subject, ClassSection, TeacherAssignment, SubjectRequirement, ConcurrentSet
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -10,8 +9,8 @@ DB_PATH = os.path.join(BASE_DIR, "timetable_v5.db")
 
 def export_original():
     print("--- Exporting Original Database Data (AS-IS) ---")
-    engine = create_engine(f'sqlite:///{DB_PATH}')
-    Session = sessionmaker(bind=engine)
+    engine = create_db_engine(DB_PATH)
+    Session = session_factory(engine)
     session = Session()
     try:
         # Export all tables exactly as they are in the old database
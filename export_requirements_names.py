@@ -1,8 +1,8 @@
 # export_requirements_names.py
 import csv
 import os
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
+from timetable.database import create_db_engine, session_factory
 
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,8 +15,8 @@ def export_requirements():
         print("ERROR: Good database not found.")
         return
 
-    engine = create_engine(f'sqlite:///{DB_PATH}')
-    Session = sessionmaker(bind=engine)
+    engine = create_db_engine(DB_PATH)
+    Session = session_factory(engine)
     session = Session()
 
     try:
@@ -1,8 +1,7 @@
 # export_sets_to_names.py
 import csv
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from timetable.database import create_db_engine, session_factory
 from main import Base, ConcurrentSet
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -14,8 +13,8 @@ def export_sets():
         print("Database not found.")
         return
 
-    engine = create_engine(f'sqlite:///{DB_PATH}')
-    Session = sessionmaker(bind=engine)
+    engine = create_db_engine(DB_PATH)
+    Session = session_factory(engine)
     session = Session()
 
     sets = session.query(ConcurrentSet).all()
@@ -1,19 +1,8 @@
 # import_debug_ids.py (Corrected)
 import csv
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.engine import Engine
-from sqlalchemy import event
-
-
-# This is a special command to allow inserting IDs in SQLite
-@event.listens_for(Engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
-    cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.close()
-
+# create_db_engine turns on PRAGMA foreign_keys for every connection
+from timetable.database import create_db_engine, session_factory
 
 from main import Base, Teacher, Subject, ClassSection, TeacherAssignment, SubjectRequirement
 
@@ -26,13 +15,13 @@ DB_PATH = os.path.join(BASE_DIR, "timetable_v5.db")
 
 def import_raw_ids():
     print("--- Starting RAW ID Import ---")
-    engine = create_engine(f'sqlite:///{DB_PATH}')
+    engine = create_db_engine(DB_PATH)
 
     # Recreate the database schema from scratch
     Base.metadata.drop_all(engine)
     Base.metadata.create_all(engine)
 
-    Session = sessionmaker(bind=engine)
+    Session = session_factory(engine)
     session = Session()
 
     try:
@@ -1,8 +1,7 @@
 # import_final.py (Hardened Version)
 import csv
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from timetable.database import create_db_engine, session_factory
 from main import Base, Teacher, Subject, ClassSection, TeacherAssignment, SubjectRequirement, ConcurrentSet
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -26,7 +25,7 @@ def clean_csv_dict(reader):
 
 def import_final():
     print("--- Starting Final Database Import (Hardened) ---")
-    engine = create_engine(f'sqlite:///{DB_PATH}')
+    engine = create_db_engine(DB_PATH)
 
     confirm = input("WARNING: This will DELETE all existing data. Proceed? (yes/no): ")
     if confirm.lower() != 'yes':
@@ -37,7 +36,7 @@ def import_final():
     Base.metadata.drop_all(engine)
     Base.metadata.create_all(engine)
 
-    Session = sessionmaker(bind=engine)
+    Session = session_factory(engine)
     session = Session()
 
     try:
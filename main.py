@@ -1,26 +1,28 @@
 import sys
 import os
 import json
+import time
+import argparse
+import multiprocessing
 from collections import defaultdict
 import random
-import time
 import traceback
 
-from PySide6.QtCore import Qt, QSize, QObject, Signal, QThread
+from PySide6.QtCore import Qt, QSize, QObject, Signal, QThread, QAbstractTableModel, QModelIndex
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QGroupBox, QSpinBox, QFormLayout, QListWidget, QListWidgetItem, QInputDialog,
+    QPushButton, QGroupBox, QSpinBox, QDoubleSpinBox, QFormLayout, QListWidget, QListWidgetItem, QInputDialog,
     QMessageBox, QFileDialog, QHeaderView, QComboBox, QDialog, QDialogButtonBox, QScrollArea, QGridLayout,
-    QLabel, QTableWidget, QTableWidgetItem, QCheckBox, QSplitter, QTreeWidget, QTreeWidgetItem, QStackedWidget,
-    QLineEdit, QTabWidget, QTextEdit
+    QLabel, QTableWidget, QTableWidgetItem, QTableView, QCheckBox, QSplitter, QTreeWidget, QTreeWidgetItem,
+    QStackedWidget, QLineEdit, QTabWidget, QTextEdit
 )
 from PySide6.QtGui import QFont, QColor, QIcon, QMovie, QPixmap
 
 try:
-    from ortools.sat.python import cp_model
+    from PySide6.QtCharts import QChart, QChartView, QLineSeries
 except ImportError:
-    print("Error: The 'ortools' library is required. Please install it using: pip install ortools")
-    sys.exit(1)
+    # QtCharts ships with PySide6-Addons; without it the Solver History page shows only the table.
+    QChartView = None
 
 try:
     from reportlab.platypus import SimpleDocTemplate, Table as ReportLabTable, TableStyle, Paragraph, Spacer, PageBreak
@@ -32,127 +34,33 @@ except ImportError:
     print("Error: The 'reportlab' library is required. Please install it using: pip install reportlab")
     sys.exit(1)
 
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Table, UniqueConstraint
-from sqlalchemy.orm import relationship, sessionmaker, declarative_base
-
-Base = declarative_base()
-
-
-# region: ================= DATABASE MODELS =================
-class Teacher(Base):
-    __tablename__ = 'teachers'
-    id = Column(Integer, primary_key=True)
-    name = Column(String, unique=True, nullable=False)
-    assignments = relationship("TeacherAssignment", back_populates="teacher", cascade="all, delete-orphan")
-    schedule_entries = relationship("ScheduleEntry", back_populates="teacher", cascade="all, delete")
-    class_teacher_of_section = relationship("ClassSection", back_populates="class_teacher", uselist=False)
-
-
-class Subject(Base):
-    __tablename__ = 'subjects'
-    id = Column(Integer, primary_key=True)
-    name = Column(String, unique=True, nullable=False)
-    color = Column(String, default="#E0E0E0")
-    assignments = relationship("TeacherAssignment", back_populates="subject", cascade="all, delete-orphan")
-    requirements = relationship("SubjectRequirement", back_populates="subject", cascade="all, delete-orphan")
-    schedule_entries = relationship("ScheduleEntry", back_populates="subject", cascade="all, delete")
-
-
-class ClassSection(Base):
-    __tablename__ = 'class_sections'
-    id = Column(Integer, primary_key=True)
-    name = Column(String, unique=True, nullable=False)
-
-    # This is the new column
-    display_name = Column(String)
-
-    periods_per_day = Column(Integer, default=8)
-    assignments = relationship("TeacherAssignment", back_populates="class_section", cascade="all, delete-orphan")
-    schedule_entries = relationship("ScheduleEntry", back_populates="class_section", cascade="all, delete-orphan")
-    requirements = relationship("SubjectRequirement", back_populates="class_section", cascade="all, delete-orphan")
-    class_teacher_id = Column(Integer, ForeignKey('teachers.id'), unique=True, nullable=True)
-    class_teacher = relationship("Teacher", back_populates="class_teacher_of_section")
-
-class TeacherAssignment(Base):
-    __tablename__ = 'teacher_assignments'
-    id = Column(Integer, primary_key=True)
-    teacher_id = Column(Integer, ForeignKey('teachers.id'), nullable=False)
-    subject_id = Column(Integer, ForeignKey('subjects.id'), nullable=False)
-    class_section_id = Column(Integer, ForeignKey('class_sections.id'), nullable=False)
-    teacher = relationship("Teacher", back_populates="assignments")
-    subject = relationship("Subject", back_populates="assignments")
-    class_section = relationship("ClassSection", back_populates="assignments")
-    __table_args__ = (
-        UniqueConstraint('subject_id', 'class_section_id', name='_subject_class_teacher_uc'),
-    )
-
-
-class ScheduleEntry(Base):
-    __tablename__ = 'schedule_entries'
-    id = Column(Integer, primary_key=True)
-    class_section_id = Column(Integer, ForeignKey('class_sections.id', ondelete="CASCADE"), nullable=False)
-    day = Column(String, nullable=False)
-    period = Column(Integer, nullable=False)
-    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete="CASCADE"))
-    teacher_id = Column(Integer, ForeignKey('teachers.id', ondelete="CASCADE"))
-    class_section = relationship("ClassSection", back_populates="schedule_entries")
-    subject = relationship("Subject", back_populates="schedule_entries")
-    teacher = relationship("Teacher", back_populates="schedule_entries")
-    __table_args__ = (
-        UniqueConstraint('class_section_id', 'day', 'period', name='_class_day_period_uc'),
-    )
-
-
-class SubjectRequirement(Base):
-    __tablename__ = 'subject_requirements'
-    id = Column(Integer, primary_key=True)
-    class_section_id = Column(Integer, ForeignKey('class_sections.id', ondelete="CASCADE"), nullable=False)
-    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete="CASCADE"), nullable=False)
-    periods_per_week = Column(Integer, nullable=False)
-    class_section = relationship("ClassSection", back_populates="requirements")
-    subject = relationship("Subject", back_populates="requirements")
-
-
-concurrent_set_section = Table('concurrent_set_section', Base.metadata,
-                               Column('set_id', Integer, ForeignKey('concurrent_sets.id', ondelete="CASCADE")),
-                               Column('section_id', Integer, ForeignKey('class_sections.id', ondelete="CASCADE")))
-concurrent_set_subject = Table('concurrent_set_subject', Base.metadata,
-                               Column('set_id', Integer, ForeignKey('concurrent_sets.id', ondelete="CASCADE")),
-                               Column('subject_id', Integer, ForeignKey('subjects.id', ondelete="CASCADE")))
-
-
-class ConcurrentSet(Base):
-    __tablename__ = 'concurrent_sets'
-    id = Column(Integer, primary_key=True)
-    name = Column(String, unique=True, nullable=False)
-    color = Column(String, default="#FFCCCB")
-    sections = relationship("ClassSection", secondary=concurrent_set_section)
-    subjects = relationship("Subject", secondary=concurrent_set_subject)
-
-
-from sqlalchemy import ForeignKey
-from sqlalchemy.orm import relationship
-
-
-class User(Base):
-    __tablename__ = 'users'
-    id = Column(Integer, primary_key=True)
-    username = Column(String, unique=True, nullable=False)
-    password = Column(String, nullable=False)  # In a real app, this would be hashed!
-    teacher_id = Column(Integer, ForeignKey('teachers.id'), unique=True, nullable=False)
-
-    teacher = relationship("Teacher")
+from sqlalchemy.exc import IntegrityError
+
+from timetable.models import (Base, Teacher, Subject, ClassSection, TeacherAssignment, ScheduleEntry,
+                              SubjectRequirement, ConcurrentSet, User, concurrent_set_section, concurrent_set_subject,
+                              link_teachers_to_people, setup_database, seed_database_if_empty)
+from timetable.cache import SolutionCache
+from timetable.changes import take_changes
+from timetable.corpus import model_dir_for_database
+from timetable.database import session_factory
+from timetable.grid import EMPTY
+from timetable.snapshot import get_snapshot
+from timetable.solver import SolverConfig, TimetableSolver, add_solver_arguments, changed_cells
+from timetable.telemetry import load_solver_runs
+from timetable.versions import activate_version, list_versions, store_solution
 
-# endregion
 
-# region: ================= SOLVER & WORKER THREAD =================
+# region: ================= WORKER THREAD =================
 class SolverWorker(QObject):
     finished = Signal(object)
     error = Signal(str)
+    # solution, solution number, objective, best bound, elapsed seconds
+    progress = Signal(object, int, float, float, float)
 
     def __init__(self, solver_instance):
         super().__init__()
         self.solver = solver_instance
+        self.solver.on_solution = self.progress.emit
 
     def run(self):
         try:
@@ -161,199 +69,86 @@ class SolverWorker(QObject):
             self.error.emit(f"An error occurred in the solver thread:\n\n{traceback.format_exc()}")
 
 
-class TimetableSolver:
-    DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+class SaveWorker(QObject):
+    # version id, cell counts from save_solution, seconds taken
+    finished = Signal(int, object, float)
+    error = Signal(str)
 
-    def __init__(self, session):
-        self.session = session
-        self.model = cp_model.CpModel()
-        self.all_sections = {s.id: s for s in self.session.query(ClassSection).all()}
-        self.all_teachers = {t.id: t for t in self.session.query(Teacher).all()}
-        self.concurrent_sets = self.session.query(ConcurrentSet).all()
-        self.assignment_map = self._load_assignments()
-        self.class_periods = {}
-        self.subject_class_vars = defaultdict(list)
-
-    def _load_assignments(self):
-        return {(a.class_section_id, a.subject_id): a.teacher_id for a in self.session.query(TeacherAssignment).all()}
-
-    def solve(self):
-        print("\n--- Starting Timetable Generation (Diagnostic Mode) ---")
-        start_time = time.time()
-
-        # Run pre-check before even trying to solve
-        errors = self.run_diagnostics()
-        if errors:
-            print("Step 1: Found data errors. Aborting.")
-            # We return the errors as a string so the UI can show them
-            return {"errors": errors}
-
-        self._define_variables_and_constraints()
-        print("Step 2: Model defined.")
-
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = 60.0
-        status = solver.Solve(self.model)
-        duration = time.time() - start_time
-
-        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-            print(f"Step 3: Solution found in {duration:.2f}s.")
-            return self._extract_solution(solver)
-        else:
-            # If the solver fails, run a deep scan to find out why
-            print("Step 4: No solution. Running Deep Diagnostics...")
-            deep_errors = self.run_diagnostics(deep_scan=True)
-            return {"errors": deep_errors if deep_errors else "Unknown logic contradiction. Check Concurrent Sets."}
-
-    def run_diagnostics(self, deep_scan=False):
-        report = []
-        subject_requirements = self.session.query(SubjectRequirement).all()
-
-        # 1. Check Section Totals
-        section_totals = defaultdict(int)
-        for req in subject_requirements:
-            section_totals[req.class_section_id] += req.periods_per_week
-
-        for sec_id, total in section_totals.items():
-            sec = self.all_sections[sec_id]
-            target = sec.periods_per_day * 5
-            if total > target:
-                report.append(f"❌ SECTION OVERLOAD: {sec.name} has {total} periods, but only {target} slots available.")
-
-        # 2. Check Human Teacher Load vs. Student Availability
-        human_loads = defaultdict(int)
-        human_senior_loads = defaultdict(int)
-        for req in subject_requirements:
-            teacher_id = self.assignment_map.get((req.class_section_id, req.subject_id))
-            if teacher_id:
-                base_name = self.all_teachers[teacher_id].name.split(' (')[0]
-                human_loads[base_name] += req.periods_per_week
-                if self.all_sections[req.class_section_id].periods_per_day == 6:
-                    human_senior_loads[base_name] += req.periods_per_week
-
-        for name, load in human_loads.items():
-            if load > 40:
-                report.append(f"❌ PHYSICAL IMPOSSIBILITY: {name} assigned {load} periods. Max possible is 40.")
-            elif human_senior_loads[name] > 30:
-                # This is the "Suman Sharma" check.
-                # If she has 35 senior periods, she MUST be in a Concurrent Set for at least 5 of them.
-                needed_sync_periods = human_senior_loads[name] - 30
-                report.append(
-                    f"⚠️ TEACHER BOTTLENECK: {name} has {human_senior_loads[name]} senior periods but only 30 slots. You MUST ensure at least {needed_sync_periods} of these periods are in a 'Sync' Concurrent Set.")
-
-        # 3. Check for "Set Overlaps" (The most common 0.17s failure)
-        for cset in self.concurrent_sets:
-            set_sections = [s.id for s in cset.sections]
-            set_subjects = [s.id for s in cset.subjects]
-
-            # Check if any section is forced to do TWO things at once by ONE set
-            for sec_id in set_sections:
-                subjects_for_sec_in_set = [sub_id for sub_id in set_subjects if (sec_id, sub_id) in self.assignment_map]
-                if len(subjects_for_sec_in_set) > 1:
-                    sub_names = [self.session.get(Subject, s_id).name for s_id in subjects_for_sec_in_set]
-                    report.append(
-                        f"❌ SET LOGIC ERROR: Set '{cset.name}' forces {self.all_sections[sec_id].name} to attend {sub_names} at the same time. This is impossible.")
-
-        return "\n".join(report)
-
-    def _define_variables_and_constraints(self):
-        # We track intervals by both human and the specific teacher ID
-        human_intervals = defaultdict(list)
-        teacher_intervals = defaultdict(list)
-        section_intervals = defaultdict(list)
-
-        subject_requirements = self.session.query(SubjectRequirement).all()
-        for req in subject_requirements:
-            teacher_id = self.assignment_map.get((req.class_section_id, req.subject_id))
-            if not teacher_id: continue
-
-            section = self.all_sections[req.class_section_id]
-            max_p_week = len(self.DAYS) * section.periods_per_day
-
-            full_name = self.all_teachers[teacher_id].name
-            base_human_name = full_name.split(' (')[0]
-
-            for i in range(req.periods_per_week):
-                prefix = f'L_{section.id}_{req.subject_id}_{teacher_id}_{i}'
-                start_var = self.model.NewIntVar(0, max_p_week - 1, f'{prefix}_start')
-                interval = self.model.NewIntervalVar(start_var, 1, start_var + 1, f'{prefix}_interval')
-                self.class_periods[(section.id, req.subject_id, teacher_id, i)] = start_var
-
-                # Add to all three tracking lists
-                human_intervals[base_human_name].append(interval)
-                teacher_intervals[teacher_id].append(interval)  # For individual teacher check
-                section_intervals[section.id].append(interval)
-                self.subject_class_vars[(req.class_section_id, req.subject_id)].append(start_var)
-
-        # 1. Base Constraint: No section can be in two places at once.
-        for intervals in section_intervals.values():
-            self.model.AddNoOverlap(intervals)
-
-        # 2. Build the Concurrent Set "Glue"
-        var_to_cset_group_map = {}
-        for cset in self.concurrent_sets:
-            set_sec_ids = {s.id for s in cset.sections}
-            set_sub_ids = {s.id for s in cset.subjects}
-            groups = defaultdict(list)
-            for (sec_id, sub_id, t_id, i), start_var in self.class_periods.items():
-                if sec_id in set_sec_ids and sub_id in set_sub_ids:
-                    groups[i].append(start_var)
-            for i, vars_group in groups.items():
-                if len(vars_group) > 1:
-                    for other in vars_group[1:]: self.model.Add(other == vars_group[0])
-                for v in vars_group: var_to_cset_group_map[v.Index()] = (cset.id, i)
-
-        # 3. THE FIX: Prevent HUMAN overlap, but allow it for Concurrent Sets
-        for name, intervals in human_intervals.items():
-            # Filter out intervals that are part of the same concurrent group
-            filtered_intervals = []
-            handled_groups = set()
-            for interval in intervals:
-                idx = interval.StartExpr().Index()
-                if idx not in var_to_cset_group_map:
-                    filtered_intervals.append(interval)
-                else:
-                    group_id = var_to_cset_group_map[idx]
-                    if group_id not in handled_groups:
-                        filtered_intervals.append(interval)
-                        handled_groups.add(group_id)
-
-            if len(filtered_intervals) > 1:
-                self.model.AddNoOverlap(filtered_intervals)
-
-        # 4. Daily Subject Limit (Your "Max 2" rule)
-        for req in subject_requirements:
-            # ... (the max_per_day = 2 code from before goes here, it is correct)
-            max_per_day = 3
-            start_vars = self.subject_class_vars.get((req.class_section_id, req.subject_id))
-            if not start_vars: continue
-            section = self.all_sections[req.class_section_id]
-            for day_idx in range(len(self.DAYS)):
-                day_start = day_idx * section.periods_per_day
-                day_end = (day_idx + 1) * section.periods_per_day - 1
-                lits = []
-                for var in start_vars:
-                    lit = self.model.NewBoolVar(f'dist_{req.class_section_id}_{req.subject_id}_day_{day_idx}')
-                    self.model.AddLinearExpressionInDomain(var, cp_model.Domain(day_start, day_end)).OnlyEnforceIf(lit)
-                    self.model.AddLinearExpressionInDomain(var, cp_model.Domain.FromIntervals(
-                        [[0, day_start - 1], [day_end + 1, 999]])).OnlyEnforceIf(lit.Not())
-                    lits.append(lit)
-                self.model.Add(sum(lits) <= max_per_day)
-    def _extract_solution(self, solver):
-        solution = {}
-        for (section_id, subject_id, teacher_id, i), start_var in self.class_periods.items():
-            slot_val = solver.Value(start_var)
-            section = self.all_sections[section_id]
-            max_p = section.periods_per_day
-            day_val = self.DAYS[slot_val // max_p]
-            period_val = slot_val % max_p + 1
-            solution[(day_val, period_val, section_id)] = (subject_id, teacher_id)
-        return solution
+    def __init__(self, bind, solution, solver_run_id=None):
+        super().__init__()
+        self.bind = bind
+        self.solution = solution
+        self.solver_run_id = solver_run_id
+
+    def run(self):
+        db_session = session_factory(self.bind)()
+        try:
+            save_start = time.time()
+            version, counts = store_solution(db_session, self.solution, solver_run_id=self.solver_run_id)
+            db_session.commit()
+            self.finished.emit(version.id, counts, time.time() - save_start)
+        except Exception as e:
+            db_session.rollback()
+            self.error.emit(f"Save failed: {e}")
+        finally:
+            db_session.close()
 
 
 # endregion
 
+
 # region: ================= UI DIALOGS & WIDGETS =================
+class TimetableGridModel(QAbstractTableModel):
+    """Read-only timetable grid over precomputed cells: rows of (text, colour) tuples, None where free."""
+    # Colour name -> QColor, shared by every grid.
+    _colors = {}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cells = []
+        self.h_headers = []
+        self.v_headers = None
+
+    def set_cells(self, cells, h_headers, v_headers=None):
+        # The views only paint visible cells. A grid of the same shape just repaints them; a new shape resets.
+        same_shape = len(cells) == len(self.cells) and len(h_headers) == len(self.h_headers)
+        if not same_shape: self.beginResetModel()
+        self.cells, self.h_headers, self.v_headers = cells, h_headers, v_headers
+        if not same_shape:
+            self.endResetModel()
+        elif cells and h_headers:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(cells) - 1, len(h_headers) - 1))
+            self.headerDataChanged.emit(Qt.Horizontal, 0, len(h_headers) - 1)
+            self.headerDataChanged.emit(Qt.Vertical, 0, len(cells) - 1)
+
+    @classmethod
+    def color(cls, name):
+        color = cls._colors.get(name)
+        if color is None:
+            color = cls._colors[name] = QColor(name)
+        return color
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.cells)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.h_headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.TextAlignmentRole: return int(Qt.AlignCenter)
+        cell = self.cells[index.row()][index.column()]
+        if not cell: return None
+        # The tooltip shows the whole text of a cell too long for its fixed-height row (see the master grid).
+        if role in (Qt.DisplayRole, Qt.ToolTipRole): return cell[0]
+        if role == Qt.BackgroundRole and cell[1]: return self.color(cell[1])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal: return self.h_headers[section]
+        if role == Qt.DisplayRole and self.v_headers: return self.v_headers[section]
+        return super().headerData(section, orientation, role)
+
+
 class MultiSelectDialog(QDialog):
     def __init__(self, title, items, parent=None):
         super().__init__(parent)
@@ -699,19 +494,41 @@ class ConcurrentSetDialog(QDialog):
 
 class TimetableApp(QMainWindow):
     DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+    CLASH_COLOR = "#FF6B6B"
     MIN_PERIODS, MAX_PERIODS = 1, 16
-
-    def __init__(self, session, spinner_path="spinner.gif"):
+    # The tables each view reads (see timetable/changes.py) and the widgets that show it, in refresh order: the
+    # timetable combos pick what the grids show.
+    TIMETABLE_TABLES = {"class_sections", "subjects", "teachers", "people", "schedule_entries", "concurrent_sets",
+                        "concurrent_set_section", "concurrent_set_subject"}
+    VIEWS = [
+        ("refresh_manage_lists", {"teachers", "subjects", "class_sections"}, ["mg_tabs"]),
+        ("refresh_setup_page_combos", {"class_sections"}, ["req_section_combo"]),
+        ("refresh_cset_list", {"concurrent_sets"}, ["cset_list"]),
+        ("refresh_timetable_combos", {"class_sections", "teachers", "people"},
+         ["class_tt_section_combo", "teacher_tt_combo"]),
+        ("update_class_timetable_grid", TIMETABLE_TABLES, ["class_tt_grid"]),
+        ("update_teacher_timetable_grid", TIMETABLE_TABLES, ["teacher_tt_grid"]),
+        ("update_master_teacher_tt_grid", TIMETABLE_TABLES, ["master_teacher_tt_grid"]),
+        ("refresh_solver_history", {"solver_runs"}, ["history_table"]),
+        ("refresh_versions", {"schedule_versions"}, ["versions_table"]),
+    ]
+
+    def __init__(self, session, spinner_path="spinner.gif", solver_config=None):
         super().__init__()
         self.session = session
         self.spinner_path = spinner_path
+        self.solver_config = solver_config or SolverConfig()
         self.setWindowTitle("School Timetable Generator")
         self.setMinimumSize(1280, 800)
         self.setup_ui()
+        self.stale_views = {refresh for refresh, _, _ in self.VIEWS}
         self.connect_signals()
         self.nav_tree.setCurrentItem(self.nav_tree.topLevelItem(0))
         self.refresh_all_data()
         self.worker_thread = None
+        self.active_solver = None
+        self.save_thread = None
+        self.saving_solver = None
 
     def setup_ui(self):
         self.central_widget = QWidget()
@@ -727,7 +544,9 @@ class TimetableApp(QMainWindow):
         self.add_nav_page("Setup", self.create_setup_page())
         self.add_nav_page("Manage", self.create_manage_page())
         self.add_nav_page("Generator", self.create_generator_page())
+        self.add_nav_page("Solver History", self.create_solver_history_page())
         tt_page_parent = self.add_nav_page("Timetables", is_parent=True)
+        self.add_nav_page("Versions", self.create_versions_page(), parent=tt_page_parent)
         self.add_nav_page("Class Timetables", self.create_class_tt_page(), parent=tt_page_parent)
         self.add_nav_page("Teacher Timetables", self.create_teacher_tt_page(), parent=tt_page_parent)
         self.add_nav_page("Master Teacher View", self.create_master_teacher_tt_page(), parent=tt_page_parent)
@@ -749,6 +568,7 @@ class TimetableApp(QMainWindow):
 
     def connect_signals(self):
         self.nav_tree.currentItemChanged.connect(self.switch_page)
+        self.pages_stack.currentChanged.connect(self.refresh_all_data)
         self.mg_tabs.currentChanged.connect(self.refresh_manage_lists)
         self.add_btn.clicked.connect(self.add_item)
         self.edit_btn.clicked.connect(self.edit_item)
@@ -761,6 +581,10 @@ class TimetableApp(QMainWindow):
         self.edit_cset_btn.clicked.connect(self.edit_concurrent_set)
         self.del_cset_btn.clicked.connect(self.delete_concurrent_set)
         self.generate_btn.clicked.connect(self.run_logic_generator)
+        self.stop_btn.clicked.connect(self.stop_generation)
+        self.refresh_history_btn.clicked.connect(self.refresh_solver_history)
+        self.refresh_versions_btn.clicked.connect(self.refresh_versions)
+        self.activate_version_btn.clicked.connect(self.activate_selected_version)
         self.class_tt_section_combo.currentIndexChanged.connect(self.update_class_timetable_grid)
         self.teacher_tt_combo.currentIndexChanged.connect(self.update_teacher_timetable_grid)
         self.export_class_tt_btn.clicked.connect(self.export_class_timetables)
@@ -855,6 +679,10 @@ class TimetableApp(QMainWindow):
         self.generate_btn = QPushButton("Generate Timetable")
         self.generate_btn.setMinimumHeight(60)
         self.generate_btn.setFont(QFont("Arial", 16))
+        self.stop_btn = QPushButton("Stop and Keep Best Timetable")
+        self.stop_btn.hide()
+        self.progress_label = QLabel()
+        self.progress_label.setAlignment(Qt.AlignCenter)
         self.status_label = QLabel("Click the button to start the generation process.")
         self.status_label.setAlignment(Qt.AlignCenter)
         self.status_label.setWordWrap(True)
@@ -864,12 +692,210 @@ class TimetableApp(QMainWindow):
         self.spinner_label.setAlignment(Qt.AlignCenter)
         self.spinner_label.hide()
         layout.addStretch(1)
+        layout.addWidget(self.create_solver_settings_box())
         layout.addWidget(self.generate_btn)
+        layout.addWidget(self.stop_btn)
         layout.addWidget(self.spinner_label)
         layout.addWidget(self.status_label)
+        layout.addWidget(self.progress_label)
         layout.addStretch(2)
         return page
 
+    def create_solver_settings_box(self):
+        box = QGroupBox("Solver Settings")
+        form = QFormLayout(box)
+        cfg = self.solver_config
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(os.cpu_count() or 8, cfg.num_workers))
+        self.workers_spin.setValue(cfg.num_workers)
+        self.time_limit_spin = QDoubleSpinBox()
+        self.time_limit_spin.setRange(1.0, 3600.0)
+        self.time_limit_spin.setSuffix(" s")
+        self.time_limit_spin.setValue(cfg.max_time_in_seconds)
+        self.seed_spin = QSpinBox()
+        self.seed_spin.setRange(0, 2 ** 31 - 1)
+        self.seed_spin.setValue(cfg.random_seed)
+        self.linearization_spin = QSpinBox()
+        self.linearization_spin.setRange(0, 2)
+        self.linearization_spin.setValue(cfg.linearization_level)
+        self.relative_gap_spin = QDoubleSpinBox()
+        self.relative_gap_spin.setRange(0.0, 1.0)
+        self.relative_gap_spin.setDecimals(3)
+        self.relative_gap_spin.setSingleStep(0.01)
+        self.relative_gap_spin.setValue(cfg.relative_gap_limit)
+        self.improve_time_spin = QDoubleSpinBox()
+        self.improve_time_spin.setRange(0.0, 3600.0)
+        self.improve_time_spin.setSuffix(" s")
+        self.improve_time_spin.setSpecialValueText("Off")
+        self.improve_time_spin.setValue(cfg.improve_time_in_seconds)
+        self.log_progress_check = QCheckBox("Print search progress to the console")
+        self.log_progress_check.setChecked(cfg.log_search_progress)
+        self.warm_start_check = QCheckBox("Warm start from the current timetable")
+        self.repair_check = QCheckBox("Repair mode: only re-solve lessons affected by changes")
+        self.cache_check = QCheckBox("Reuse a cached timetable when the data has not changed")
+        self.cache_check.setChecked(True)
+        self.decompose_check = QCheckBox("Solve independent groups of classes in parallel")
+        self.decompose_check.setChecked(cfg.decompose)
+        self.dump_model_check = QCheckBox("Save the solver model for replay (solver_models/ next to the database)")
+        form.addRow("Search workers:", self.workers_spin)
+        form.addRow("Time limit:", self.time_limit_spin)
+        form.addRow("Random seed:", self.seed_spin)
+        form.addRow("Linearization level:", self.linearization_spin)
+        form.addRow("Relative gap:", self.relative_gap_spin)
+        form.addRow("Reduce gaps for:", self.improve_time_spin)
+        form.addRow("", self.log_progress_check)
+        form.addRow("", self.warm_start_check)
+        form.addRow("", self.repair_check)
+        form.addRow("", self.cache_check)
+        form.addRow("", self.decompose_check)
+        form.addRow("", self.dump_model_check)
+        return box
+
+    def get_solver_config(self):
+        self.solver_config = SolverConfig(
+            num_workers=self.workers_spin.value(),
+            max_time_in_seconds=self.time_limit_spin.value(),
+            random_seed=self.seed_spin.value(),
+            log_search_progress=self.log_progress_check.isChecked(),
+            linearization_level=self.linearization_spin.value(),
+            relative_gap_limit=self.relative_gap_spin.value(),
+            decompose=self.decompose_check.isChecked(),
+            improve_time_in_seconds=self.improve_time_spin.value())
+        return self.solver_config
+
+    def get_solution_cache(self):
+        db_path = self.session.get_bind().url.database
+        if not self.cache_check.isChecked() or not db_path or db_path == ":memory:":
+            return None
+        return SolutionCache.for_database(db_path)
+
+    def get_model_dir(self):
+        db_path = self.session.get_bind().url.database
+        if not self.dump_model_check.isChecked() or not db_path or db_path == ":memory:":
+            return None
+        return model_dir_for_database(db_path)
+
+    # (header, SolverRun attribute) for the history table; the seconds columns are also charted.
+    HISTORY_COLUMNS = [("Run", "id"), ("Started", "created_at"), ("Status", "status"), ("CP-SAT", "cp_status"),
+                       ("Sections", "num_sections"), ("Lessons", "num_lessons"), ("Variables", "num_variables"),
+                       ("Constraints", "num_constraints"), ("Total s", "total_seconds"), ("Load s", "load_seconds"),
+                       ("Checks s", "diagnostics_seconds"), ("Build s", "build_seconds"),
+                       ("Presolve s", "presolve_seconds"), ("Solve s", "solve_seconds"),
+                       ("Improve s", "improve_seconds"), ("Extract s", "extract_seconds"),
+                       ("Save s", "persist_seconds"), ("Conflicts", "num_conflicts"), ("Branches", "num_branches"),
+                       ("Fingerprint", "fingerprint"), ("Config", "config")]
+    HISTORY_CHART_SERIES = [("Total", "total_seconds"), ("Solve", "solve_seconds"),
+                            ("Presolve", "presolve_seconds"), ("Build", "build_seconds")]
+
+    def create_solver_history_page(self):
+        page = QWidget()
+        layout = QVBoxLayout(page)
+        controls_layout = QHBoxLayout()
+        title = QLabel("Solver History")
+        title.setFont(QFont("Arial", 16, QFont.Bold))
+        controls_layout.addWidget(title)
+        controls_layout.addStretch()
+        self.refresh_history_btn = QPushButton("Refresh")
+        controls_layout.addWidget(self.refresh_history_btn)
+        layout.addLayout(controls_layout)
+        self.history_chart = None
+        if QChartView is not None:
+            self.history_chart = QChart()
+            self.history_chart.setTitle("Seconds per solver run (cached runs omitted)")
+            chart_view = QChartView(self.history_chart)
+            chart_view.setMinimumHeight(280)
+            layout.addWidget(chart_view, 2)
+        self.history_table = QTableWidget()
+        self.history_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.history_table.setColumnCount(len(self.HISTORY_COLUMNS))
+        self.history_table.setHorizontalHeaderLabels([header for header, _ in self.HISTORY_COLUMNS])
+        self.history_table.verticalHeader().hide()
+        layout.addWidget(self.history_table, 3)
+        return page
+
+    def refresh_solver_history(self):
+        runs = load_solver_runs(self.session)
+        self.history_table.setRowCount(len(runs))
+        for row, run in enumerate(reversed(runs)):
+            for col, (_, attr) in enumerate(self.HISTORY_COLUMNS):
+                value = getattr(run, attr)
+                if value is None: text = ""
+                elif isinstance(value, float): text = f"{value:.2f}"
+                elif attr == "created_at": text = value.strftime("%Y-%m-%d %H:%M:%S")
+                elif attr == "fingerprint": text = value[:12]
+                else: text = str(value)
+                self.history_table.setItem(row, col, QTableWidgetItem(text))
+        self.history_table.resizeColumnsToContents()
+        if self.history_chart is None: return
+        self.history_chart.removeAllSeries()
+        for axis in self.history_chart.axes():
+            self.history_chart.removeAxis(axis)
+        solved = [run for run in runs if run.status != "CACHED"]
+        for name, attr in self.HISTORY_CHART_SERIES:
+            series = QLineSeries()
+            series.setName(name)
+            for run in solved:
+                if getattr(run, attr) is not None: series.append(run.id, getattr(run, attr))
+            self.history_chart.addSeries(series)
+        if solved: self.history_chart.createDefaultAxes()
+
+    VERSION_COLUMNS = ["Version", "Saved", "Label", "Lessons", "Changed", "Active"]
+
+    def create_versions_page(self):
+        page = QWidget()
+        layout = QVBoxLayout(page)
+        controls_layout = QHBoxLayout()
+        title = QLabel("Timetable Versions")
+        title.setFont(QFont("Arial", 16, QFont.Bold))
+        controls_layout.addWidget(title)
+        controls_layout.addStretch()
+        self.activate_version_btn = QPushButton("Make Selected Version Active")
+        self.refresh_versions_btn = QPushButton("Refresh")
+        controls_layout.addWidget(self.activate_version_btn)
+        controls_layout.addWidget(self.refresh_versions_btn)
+        layout.addLayout(controls_layout)
+        self.versions_table = QTableWidget()
+        self.versions_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.versions_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.versions_table.setSelectionMode(QTableWidget.SingleSelection)
+        self.versions_table.setColumnCount(len(self.VERSION_COLUMNS))
+        self.versions_table.setHorizontalHeaderLabels(self.VERSION_COLUMNS)
+        self.versions_table.verticalHeader().hide()
+        layout.addWidget(self.versions_table)
+        return page
+
+    def refresh_versions(self):
+        versions = list_versions(self.session)
+        self.versions_table.setRowCount(len(versions))
+        for row, version in enumerate(versions):
+            values = [str(version.id), version.created_at.strftime("%Y-%m-%d %H:%M:%S"), version.label,
+                      str(version.num_cells), "" if version.cells_changed is None else str(version.cells_changed),
+                      "Yes" if version.is_active else ""]
+            for col, text in enumerate(values):
+                item = QTableWidgetItem(text)
+                item.setData(Qt.UserRole, version.id)
+                self.versions_table.setItem(row, col, item)
+        self.versions_table.resizeColumnsToContents()
+
+    def activate_selected_version(self):
+        item = self.versions_table.currentItem()
+        if item is None:
+            QMessageBox.warning(self, "No Version", "Please select a version.")
+            return
+        version_id = item.data(Qt.UserRole)
+        if QMessageBox.question(self, "Confirm", f"Make version {version_id} the active timetable?",
+                                QMessageBox.Yes | QMessageBox.No, QMessageBox.No) != QMessageBox.Yes: return
+        try:
+            counts = activate_version(self.session, version_id)
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            QMessageBox.critical(self, "Error", f"Could not activate version {version_id}: {e}")
+            return
+        self.refresh_all_data()
+        QMessageBox.information(self, "Version Activated",
+                                f"Version {version_id} is now the active timetable ({changed_cells(counts)} cells changed).")
+
     def create_class_tt_page(self):
         page = QWidget()
         layout = QVBoxLayout(page)
@@ -884,8 +910,9 @@ class TimetableApp(QMainWindow):
         controls_layout.addStretch(1)
         controls_layout.addWidget(self.export_class_tt_btn, 1)
         layout.addWidget(controls_box)
-        self.class_tt_grid = QTableWidget()
-        self.class_tt_grid.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.class_tt_model = TimetableGridModel(self)
+        self.class_tt_grid = QTableView()
+        self.class_tt_grid.setModel(self.class_tt_model)
         self.class_tt_grid.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.class_tt_grid.verticalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.class_tt_grid)
@@ -903,8 +930,9 @@ class TimetableApp(QMainWindow):
         controls_layout.addStretch(1)
         controls_layout.addWidget(self.export_teacher_tt_btn, 1)
         layout.addWidget(controls_box)
-        self.teacher_tt_grid = QTableWidget()
-        self.teacher_tt_grid.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.teacher_tt_model = TimetableGridModel(self)
+        self.teacher_tt_grid = QTableView()
+        self.teacher_tt_grid.setModel(self.teacher_tt_model)
         self.teacher_tt_grid.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.teacher_tt_grid.verticalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.teacher_tt_grid)
@@ -925,44 +953,51 @@ class TimetableApp(QMainWindow):
 
         layout.addLayout(controls_layout)
 
-        self.master_teacher_tt_grid = QTableWidget()
-        self.master_teacher_tt_grid.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.master_teacher_tt_model = TimetableGridModel(self)
+        self.master_teacher_tt_grid = QTableView()
+        self.master_teacher_tt_grid.setModel(self.master_teacher_tt_model)
+        # Fixed rows tall enough for "Subject\n(Sections)": sizing them to their contents would measure every cell
+        # of the grid, not just the ones on screen.
+        line_spacing = self.master_teacher_tt_grid.fontMetrics().lineSpacing()
+        self.master_teacher_tt_grid.verticalHeader().setDefaultSectionSize(2 * line_spacing + 8)
         layout.addWidget(self.master_teacher_tt_grid)
         return page
 
-    def refresh_all_data(self):
-        self.refresh_manage_lists()
-        self.refresh_setup_page_combos()
-        self.refresh_cset_list()
-        self.refresh_timetable_combos()
-        self.update_class_timetable_grid()
-        self.update_teacher_timetable_grid()
-        self.update_master_teacher_tt_grid()
+    def refresh_all_data(self, page_index=None):
+        # After an edit or a save, and whenever another page is shown: the views that read a table changed since
+        # the last call are rebuilt now if they are on screen, otherwise when they are next shown.
+        changes = take_changes(self.session.get_bind())
+        self.stale_views.update(refresh for refresh, tables, _ in self.VIEWS if changes.touches(tables))
+        for refresh, _, widgets in self.VIEWS:
+            if refresh not in self.stale_views: continue
+            if not any(getattr(self, widget).isVisibleTo(self.pages_stack) for widget in widgets): continue
+            self.stale_views.discard(refresh)
+            getattr(self, refresh)()
 
     def refresh_manage_lists(self, index=0):
+        snapshot = get_snapshot(self.session)
         self.teachers_list.clear()
-        [self.teachers_list.addItem(QListWidgetItem(t.name)) for t in
-         self.session.query(Teacher).order_by(Teacher.name)]
+        [self.teachers_list.addItem(QListWidgetItem(t.name)) for t in snapshot.teachers.values()]
         self.subjects_list.clear()
-        [self.subjects_list.addItem(QListWidgetItem(s.name)) for s in
-         self.session.query(Subject).order_by(Subject.name)]
+        [self.subjects_list.addItem(QListWidgetItem(s.name)) for s in snapshot.subjects.values()]
         # ... inside refresh_manage_lists ...
         self.sections_list.clear()
-        # Query all sections, but we'll manually filter to show unique display names
-        all_sections = self.session.query(ClassSection).order_by(ClassSection.name).all()
+        # Go through all sections, but we'll manually filter to show unique display names
+        sections_by_name = {sec.name: sec for sec in snapshot.sections.values()}
         displayed_sections = {}  # Use a dict to store the main section for each display name
 
-        for sec in all_sections:
+        for sec in snapshot.sections.values():
             display = sec.display_name or sec.name
             if display not in displayed_sections:
-                # Find the "main" section object that matches the display name
-                main_sec = self.session.query(ClassSection).filter_by(name=display).first()
+                # Find the "main" section that matches the display name
+                main_sec = sections_by_name.get(display)
                 if main_sec:
                     displayed_sections[display] = main_sec
 
         # Now add the unique, main sections to the list
         for display, sec_obj in sorted(displayed_sections.items()):
-            teacher_name = f" (CT: {sec_obj.class_teacher.name})" if sec_obj.class_teacher else ""
+            class_teacher = snapshot.teachers.get(sec_obj.class_teacher_id)
+            teacher_name = f" (CT: {class_teacher.name})" if class_teacher else ""
             item_text = f"{display} ({sec_obj.periods_per_day} periods/day){teacher_name}"
             item = QListWidgetItem(item_text)
             item.setData(Qt.UserRole, sec_obj.id)
@@ -970,13 +1005,12 @@ class TimetableApp(QMainWindow):
 
     def refresh_setup_page_combos(self):
         self.req_section_combo.clear()
-        [self.req_section_combo.addItem(sec.name, sec.id) for sec in
-         self.session.query(ClassSection).order_by(ClassSection.name).all()]
+        [self.req_section_combo.addItem(sec.name, sec.id) for sec in get_snapshot(self.session).sections.values()]
         self.update_req_button_state()
 
     def refresh_cset_list(self):
         self.cset_list.clear()
-        for cset in self.session.query(ConcurrentSet).order_by(ConcurrentSet.name).all():
+        for cset in sorted(get_snapshot(self.session).concurrent_sets, key=lambda c: c.name):
             item = QListWidgetItem(cset.name)
             item.setData(Qt.UserRole, cset.id)
             self.cset_list.addItem(item)
@@ -987,9 +1021,8 @@ class TimetableApp(QMainWindow):
 
         # --- CLEAN CLASS DROPDOWN (Shows "11 Sci" once) ---
         self.class_tt_section_combo.clear()
-        all_sections = self.session.query(ClassSection).order_by(ClassSection.name).all()
         displayed_classes = {}
-        for sec in all_sections:
+        for sec in get_snapshot(self.session).sections.values():
             display = sec.display_name or sec.name
             if display not in displayed_classes:
                 displayed_classes[display] = sec.id  # Keep the ID of the first one found
@@ -998,15 +1031,17 @@ class TimetableApp(QMainWindow):
 
         # --- CLEAN TEACHER DROPDOWN (Shows "Suman Sharma" once) ---
         self.teacher_tt_combo.clear()
-        all_teachers = self.session.query(Teacher).order_by(Teacher.name).all()
-        unique_teacher_names = sorted(list(set([t.name.split(' (')[0] for t in all_teachers])))
-        for name in unique_teacher_names:
-            # We store the base name string so the grid can search for all variants
-            self.teacher_tt_combo.addItem(name, name)
+        for person in self._get_people():
+            # We store the person ID so the grid can find all of their teacher records
+            self.teacher_tt_combo.addItem(person.name, person.id)
 
         self.class_tt_section_combo.blockSignals(False)
         self.teacher_tt_combo.blockSignals(False)
 
+    def _get_people(self):
+        # People with at least one teacher record; deleting a teacher can leave its person behind.
+        return get_snapshot(self.session).people_with_teachers()
+
     def _get_current_manage_info(self):
         idx = self.mg_tabs.currentIndex()
         if idx == 0: return Teacher, self.teachers_list, "Teacher"
@@ -1030,6 +1065,7 @@ class TimetableApp(QMainWindow):
         if self.session.query(Model).filter(Model.name.ilike(name.strip())).first(): QMessageBox.warning(self, "Exists",
                                                                                                          f"A {model_name} with that name already exists."); return
         self.session.add(instance)
+        if Model == Teacher: link_teachers_to_people(self.session)
         self.session.commit()
         self.refresh_all_data()
 
@@ -1047,7 +1083,11 @@ class TimetableApp(QMainWindow):
             if self.session.query(Model).filter(Model.name.ilike(new_name.strip()),
                                                 Model.id != instance.id).first(): QMessageBox.warning(self, "Exists",
                                                                                                       f"A {model_name} with that name already exists."); return
+            if Model == Teacher and instance.name != new_name.strip():
+                # A renamed teacher may now belong to someone else, e.g. "Suman Sharma (2)" -> "Neha Goel".
+                instance.person = None
             instance.name = new_name.strip()
+            if Model == Teacher and instance.person is None: link_teachers_to_people(self.session)
         if Model == ClassSection:
             new_periods, ok = QInputDialog.getInt(self, "Edit Periods", "Periods per day:", instance.periods_per_day,
                                                   self.MIN_PERIODS, self.MAX_PERIODS)
@@ -1066,8 +1106,17 @@ class TimetableApp(QMainWindow):
         if not instance: return
         if QMessageBox.question(self, f"Delete {model_name}", f"Delete '{instance.name}'?",
                                 QMessageBox.Yes | QMessageBox.No,
-                                QMessageBox.No) == QMessageBox.Yes: self.session.delete(
-            instance); self.session.commit(); self.refresh_all_data()
+                                QMessageBox.No) != QMessageBox.Yes: return
+        try:
+            self.session.delete(instance)
+            self.session.commit()
+        except IntegrityError:
+            # Foreign keys are enforced (see timetable/database.py), e.g. for a teacher with a login.
+            self.session.rollback()
+            QMessageBox.warning(self, "In Use", f"'{instance.name}' is still referenced elsewhere "
+                                                f"(for example by a teacher login) and cannot be deleted.")
+            return
+        self.refresh_all_data()
 
     def open_assignment_dialog(self):
         dlg = AssignmentDialog(self.session, self)
@@ -1093,14 +1142,14 @@ class TimetableApp(QMainWindow):
     def add_concurrent_set(self):
         dlg = ConcurrentSetDialog(self.session, parent=self)
         if dlg.exec() == QDialog.Accepted:
-            self.refresh_cset_list()
+            self.refresh_all_data()
 
     def edit_concurrent_set(self):
         item = self.cset_list.currentItem()
         if not item: return
         dlg = ConcurrentSetDialog(self.session, set_id=item.data(Qt.UserRole), parent=self)
         if dlg.exec() == QDialog.Accepted:
-            self.refresh_cset_list()
+            self.refresh_all_data()
 
     def delete_concurrent_set(self):
         item = self.cset_list.currentItem()
@@ -1110,19 +1159,29 @@ class TimetableApp(QMainWindow):
                                 QMessageBox.No) == QMessageBox.Yes:
             self.session.delete(cset)
             self.session.commit()
-            self.refresh_cset_list()
+            self.refresh_all_data()
 
     def run_logic_generator(self):
-        if QMessageBox.question(self, "Confirm", "This will clear the current timetable. Proceed?",
+        if QMessageBox.question(self, "Confirm", "The new timetable will be saved as a new version and made active. "
+                                                "The current one stays available under Versions. Proceed?",
                                 QMessageBox.Yes | QMessageBox.No, QMessageBox.No) != QMessageBox.Yes: return
         self.generate_btn.setEnabled(False)
         self.status_label.setText("Generating... Please wait.")
         self.spinner_label.show()
         self.spinner_movie.start()
+        self.progress_label.clear()
+        self.stop_btn.setEnabled(True)
+        self.stop_btn.show()
         self.worker_thread = QThread()
-        self.worker = SolverWorker(TimetableSolver(self.session))
+        self.active_solver = TimetableSolver(self.session, self.get_solver_config(),
+                                             warm_start=self.warm_start_check.isChecked(),
+                                             repair=self.repair_check.isChecked(),
+                                             cache=self.get_solution_cache(),
+                                             model_dir=self.get_model_dir())
+        self.worker = SolverWorker(self.active_solver)
         self.worker.moveToThread(self.worker_thread)
         self.worker_thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.on_generation_progress)
         self.worker.finished.connect(self.on_generation_complete)
         self.worker.error.connect(self.on_generation_error)
         self.worker.finished.connect(self.worker_thread.quit)
@@ -1130,7 +1189,24 @@ class TimetableApp(QMainWindow):
         self.worker_thread.finished.connect(self.worker_thread.deleteLater)
         self.worker_thread.start()
 
+    def on_generation_progress(self, solution, count, objective, bound, elapsed):
+        self.progress_label.setText(f"Solution #{count}: {len(solution)} lessons placed after {elapsed:.1f}s "
+                                    f"(objective {objective:g}, bound {bound:g})")
+
+    def stop_generation(self):
+        if self.active_solver is None: return
+        # The worker thread is blocked inside CP-SAT, so stop it directly rather than through a queued signal.
+        self.active_solver.stop()
+        self.stop_btn.setEnabled(False)
+        self.status_label.setText("Stopping... keeping the best timetable found so far.")
+
+    def _finish_generation_ui(self):
+        self.active_solver = None
+        self.stop_btn.hide()
+
     def on_generation_complete(self, solution):
+        solver = self.active_solver
+        self._finish_generation_ui()
         # Handle Diagnostic Errors
         if isinstance(solution, dict) and "errors" in solution:
             self.generate_btn.setEnabled(True)
@@ -1145,33 +1221,52 @@ class TimetableApp(QMainWindow):
             msg.exec()
             return
 
-        # Handle Success
+        # Handle Success: save on a worker thread, so the window stays responsive
         if solution:
-            Session = sessionmaker(bind=self.session.get_bind())
-            db_session = Session()
-            try:
-                db_session.query(ScheduleEntry).delete()
-                for (day, period, section_id), (subject_id, teacher_id) in solution.items():
-                    db_session.add(
-                        ScheduleEntry(class_section_id=section_id, subject_id=subject_id, teacher_id=teacher_id,
-                                      day=day, period=period))
-                db_session.commit()
-                self.refresh_all_data()
-                QMessageBox.information(self, "Success", "Timetable generated!")
-            except Exception as e:
-                db_session.rollback()
-                QMessageBox.critical(self, "Error", f"Save failed: {e}")
-            finally:
-                db_session.close()
-        else:
-            QMessageBox.critical(self, "Failed", "No solution found.")
+            self.status_label.setText("Saving the timetable...")
+            self.saving_solver = solver
+            self.save_thread = QThread()
+            self.save_worker = SaveWorker(self.session.get_bind(), solution, solver.run_id)
+            self.save_worker.moveToThread(self.save_thread)
+            self.save_thread.started.connect(self.save_worker.run)
+            self.save_worker.finished.connect(self.on_save_complete)
+            self.save_worker.error.connect(self.on_save_error)
+            self.save_worker.finished.connect(self.save_thread.quit)
+            self.save_worker.error.connect(self.save_thread.quit)
+            self.save_worker.finished.connect(self.save_worker.deleteLater)
+            self.save_worker.error.connect(self.save_worker.deleteLater)
+            self.save_thread.finished.connect(self.save_thread.deleteLater)
+            self.save_thread.start()
+            return
+
+        QMessageBox.critical(self, "Failed", "No solution found.")
+        self._finish_save_ui("Generation complete.")
 
+    def on_save_complete(self, version_id, counts, seconds):
+        self.saving_solver.record_persist_time(seconds, changed_cells(counts))
+        self.saving_solver = None
+        # The rows were written by another session; drop what this one has cached.
+        self.session.expire_all()
+        self.refresh_all_data()
+        self._finish_save_ui("Generation complete.")
+        QMessageBox.information(self, "Success", f"Timetable generated and saved as version {version_id}! "
+                                                 f"{changed_cells(counts)} cells changed ({counts['inserted']} added, "
+                                                 f"{counts['updated']} updated, {counts['deleted']} removed) "
+                                                 f"in {seconds:.2f}s.")
+
+    def on_save_error(self, error_message):
+        self.saving_solver = None
+        self._finish_save_ui("Saving failed.")
+        QMessageBox.critical(self, "Error", error_message)
+
+    def _finish_save_ui(self, status):
         self.generate_btn.setEnabled(True)
-        self.status_label.setText("Generation complete.")
+        self.status_label.setText(status)
         self.spinner_movie.stop();
         self.spinner_label.hide()
 
     def on_generation_error(self, error_message):
+        self._finish_generation_ui()
         QMessageBox.critical(self, "Error", error_message)
         self.generate_btn.setEnabled(True)
         self.status_label.setText("An error occurred.")
@@ -1182,130 +1277,102 @@ class TimetableApp(QMainWindow):
         main_section_id = self.class_tt_section_combo.currentData()
         if not main_section_id: return
 
-        main_sec = self.session.get(ClassSection, main_section_id)
+        snapshot = get_snapshot(self.session)
+        main_sec = snapshot.sections[main_section_id]
         display_name_to_show = main_sec.display_name or main_sec.name
 
         self.class_periods_label.setText(f"({main_sec.periods_per_day} periods/day)")
-        self.class_tt_grid.setRowCount(main_sec.periods_per_day)
-        self.class_tt_grid.setColumnCount(len(self.DAYS))
-        self.class_tt_grid.setHorizontalHeaderLabels(self.DAYS)
-
-        section_ids = [s.id for s in self.session.query(ClassSection).filter(
-            (ClassSection.display_name == display_name_to_show) | (ClassSection.name == display_name_to_show)
-        ).all()]
 
-        all_entries = self.session.query(ScheduleEntry).filter(ScheduleEntry.class_section_id.in_(section_ids)).all()
+        section_ids = [s.id for s in snapshot.sections.values()
+                       if display_name_to_show in (s.display_name, s.name)]
 
-        merged_schedule = defaultdict(list)
-        for entry in all_entries:
-            merged_schedule[(entry.day, entry.period)].append(entry)
+        # [section, day, period] subject and teacher ids of every section shown under this name
+        rows = [snapshot.grid.section_row[section_id] for section_id in section_ids]
+        subjects, teachers = snapshot.grid.subjects[rows], snapshot.grid.teachers[rows]
 
-        # --- CONCURRENT SET NAME FIX: Build a map to find set info ---
-        set_info_map = {}
-        for cset in self.session.query(ConcurrentSet).all():
-            for section in cset.sections:
-                for subject in cset.subjects:
-                    set_info_map[(section.id, subject.id)] = (cset.name, cset.color)
+        # --- CONCURRENT SET NAME FIX: the snapshot maps (section, subject) to set info ---
+        set_info_map = snapshot.set_info
 
+        cells = [[None] * len(self.DAYS) for _ in range(main_sec.periods_per_day)]
         for r in range(main_sec.periods_per_day):
             for c, day in enumerate(self.DAYS):
-                entries = merged_schedule.get((day, r + 1))
-                item = QTableWidgetItem("")
+                entries = [(section_ids[k], int(subjects[k, c, r]), int(teachers[k, c, r])) for k in range(len(rows))
+                           if subjects[k, c, r] != EMPTY]
 
                 if entries:
                     unique_parts = {}
-                    bg_color = QColor("#FFFFFF")
+                    bg_color = "#FFFFFF"
 
                     # Check if the first entry is part of ANY concurrent set for this time slot
-                    is_concurrent_slot = any((e.class_section_id, e.subject_id) in set_info_map for e in entries)
+                    is_concurrent_slot = any((sec_id, sub_id) in set_info_map for sec_id, sub_id, _ in entries)
 
                     if is_concurrent_slot:
                         # If it's a concurrent slot, use the SET name and color
-                        first_entry = entries[0]
-                        set_name, set_color = set_info_map.get((first_entry.class_section_id, first_entry.subject_id),
-                                                               ("Concurrent", "#FFCCCB"))
-                        item.setText(set_name)
-                        item.setBackground(QColor(set_color))
+                        first_sec_id, first_sub_id, _ = entries[0]
+                        cells[r][c] = set_info_map.get((first_sec_id, first_sub_id), ("Concurrent", "#FFCCCB"))
                     else:
                         # Otherwise, use the normal subject/teacher display
-                        for entry in entries:
-                            clean_t_name = entry.teacher.name.split(' (')[0]
-                            display_text = f"{entry.subject.name}\n({clean_t_name})"
-                            unique_parts[entry.subject.name] = display_text
+                        for _, sub_id, t_id in entries:
+                            subject = snapshot.subjects[sub_id]
+                            clean_t_name = snapshot.person_name(t_id)
+                            display_text = f"{subject.name}\n({clean_t_name})"
+                            unique_parts[subject.name] = display_text
 
                         final_text = " / ".join(sorted(unique_parts.values()))
-                        item.setText(final_text)
-                        if entries[0].subject:
-                            bg_color = QColor(entries[0].subject.color or "#E0E0E0")
-                        item.setBackground(bg_color)
+                        if entries[0][1] in snapshot.subjects:
+                            bg_color = snapshot.subjects[entries[0][1]].color or "#E0E0E0"
+                        cells[r][c] = (final_text, bg_color)
+        self.class_tt_model.set_cells(cells, self.DAYS)
 
-                item.setTextAlignment(Qt.AlignCenter)
-                self.class_tt_grid.setItem(r, c, item)
     def update_teacher_timetable_grid(self):
-        base_name = self.teacher_tt_combo.currentData()
-        if not base_name or not isinstance(base_name, str): return
-
-        # --- LOGIC: Find ALL IDs that belong to this teacher ---
-        teacher_ids = [t.id for t in self.session.query(Teacher).filter(Teacher.name.like(f"{base_name}%")).all()]
-
-        max_periods = max((s.periods_per_day for s in self.session.query(ClassSection).all()), default=8)
-        self.teacher_tt_grid.setRowCount(max_periods)
-        self.teacher_tt_grid.setColumnCount(len(self.DAYS))
-        self.teacher_tt_grid.setHorizontalHeaderLabels(self.DAYS)
-
-        # Query entries for ALL matching teacher IDs
-        schedule = {(e.day, e.period): e for e in
-                    self.session.query(ScheduleEntry).filter(ScheduleEntry.teacher_id.in_(teacher_ids)).all()}
-
-        for r in range(max_periods):
-            for c, day in enumerate(self.DAYS):
-                entry = schedule.get((day, r + 1))
-                txt = f"{entry.subject.name}\n({entry.class_section.display_name or entry.class_section.name})" if entry else ""
-                item = QTableWidgetItem(txt)
-                if entry: item.setBackground(QColor(entry.subject.color or "#E0E0E0"))
-                item.setTextAlignment(Qt.AlignCenter)
-                self.teacher_tt_grid.setItem(r, c, item)
+        person_id = self.teacher_tt_combo.currentData()
+        if not person_id: return
+
+        max_periods = get_snapshot(self.session).max_periods_per_day
+        # Lessons of ALL of this person's teacher records
+        schedule = self._get_person_schedule(person_id)
+        self.teacher_tt_model.set_cells([[self._person_cell(person_id, schedule, c, r, display_name=True)
+                                          for c in range(len(self.DAYS))] for r in range(max_periods)], self.DAYS)
+
+    def _get_person_schedule(self, person_id):
+        # [day, period] arrays of section ids, subject ids and lesson counts (see ScheduleGrid.combined)
+        snapshot = get_snapshot(self.session)
+        return snapshot.grid.combined(snapshot.teachers_of_person.get(person_id, ()))
+
+    def _get_master_schedule_map(self):
+        # One column per person, merging their teacher records.
+        return {person.id: self._get_person_schedule(person.id) for person in self._get_people()}
+
+    def _person_cell(self, person_id, schedule, day_idx, period_idx, display_name=False):
+        # "Subject\n(Sections)" and colour of a teacher or master timetable cell, or None for a free cell.
+        # A concurrent set can give a person several sections at once; lessons outside one set cannot share a
+        # period (e.g. in an old version restored after teachers were linked to people) and show as a clash.
+        sections, subjects, lessons = schedule
+        if period_idx >= sections.shape[1] or sections[day_idx, period_idx] == EMPTY: return None
+        snapshot = get_snapshot(self.session)
+        if lessons[day_idx, period_idx] > 1:
+            cell_lessons = snapshot.grid.lessons_at(snapshot.teachers_of_person.get(person_id, ()), day_idx, period_idx)
+        else:
+            cell_lessons = [(int(sections[day_idx, period_idx]), int(subjects[day_idx, period_idx]))]
+        section_names = defaultdict(dict)
+        for section_id, subject_id in cell_lessons:
+            if subject_id not in snapshot.subjects: continue
+            name = snapshot.section_display_name(section_id) if display_name else snapshot.sections[section_id].name
+            section_names[subject_id][name] = True
+        if not section_names: return None
+        text = " / ".join(f"{snapshot.subjects[subject_id].name}\n({', '.join(names)})"
+                          for subject_id, names in section_names.items())
+        if (person_id, self.DAYS[day_idx], period_idx + 1) in snapshot.person_clashes:
+            return f"{text}\nCLASH", self.CLASH_COLOR
+        return text, snapshot.subjects[next(iter(section_names))].color or "#E0E0E0"
 
     def update_master_teacher_tt_grid(self):
-        self.master_teacher_tt_grid.clear()
-        all_teachers = self.session.query(Teacher).order_by(Teacher.name).all()
-        if not all_teachers:
-            self.master_teacher_tt_grid.setRowCount(0)
-            self.master_teacher_tt_grid.setColumnCount(0)
-            return
-        teacher_map = {teacher.id: i for i, teacher in enumerate(all_teachers)}
-        max_periods = max((s.periods_per_day for s in self.session.query(ClassSection).all()), default=8)
-        self.master_teacher_tt_grid.setColumnCount(len(all_teachers))
-        self.master_teacher_tt_grid.setHorizontalHeaderLabels([t.name for t in all_teachers])
-        total_rows = len(self.DAYS) * max_periods
-        self.master_teacher_tt_grid.setRowCount(total_rows)
-        v_headers = []
-        for day in self.DAYS:
-            for p in range(max_periods):
-                v_headers.append(f"{day[:3]} - P{p + 1}")
-        self.master_teacher_tt_grid.setVerticalHeaderLabels(v_headers)
-        schedule_map = {(e.day, e.period, e.teacher_id): e for e in self.session.query(ScheduleEntry).all()}
-        row_index = 0
-        for day in self.DAYS:
-            for period in range(1, max_periods + 1):
-                for teacher in all_teachers:
-                    col_index = teacher_map[teacher.id]
-                    entry = schedule_map.get((day, period, teacher.id))
-                    if entry and entry.subject and entry.class_section:
-                        item_text = f"{entry.subject.name}\n({entry.class_section.name})"
-                        bg_color = QColor(entry.subject.color or "#E0E0E0")
-                    else:
-                        item_text = ""
-                        bg_color = QColor("#FFFFFF")
-                    item = QTableWidgetItem(item_text)
-                    item.setBackground(bg_color)
-                    item.setTextAlignment(Qt.AlignCenter)
-                    self.master_teacher_tt_grid.setItem(row_index, col_index, item)
-                row_index += 1
-        self.master_teacher_tt_grid.resizeRowsToContents()
+        # The same cells as the PDF export; the view only lays out and paints what is on screen.
+        data, h_headers, v_headers = self._get_master_timetable_data()
+        self.master_teacher_tt_model.set_cells(data, h_headers, v_headers)
 
     def export_class_timetables(self):
-        all_sections = self.session.query(ClassSection).order_by(ClassSection.name).all()
+        all_sections = list(get_snapshot(self.session).sections.values())
         if not all_sections:
             QMessageBox.warning(self, "No Data", "There are no class sections to export.")
             return
@@ -1325,7 +1392,7 @@ class TimetableApp(QMainWindow):
             if not path: return
             timetables_data = []
             for sid in selected_ids:
-                section = self.session.get(ClassSection, sid)
+                section = get_snapshot(self.session).sections[sid]
                 data, max_periods = self._get_class_timetable_data(sid)
                 timetables_data.append({
                     "title": f"Timetable for Class: {section.name}",
@@ -1335,11 +1402,11 @@ class TimetableApp(QMainWindow):
             self._write_timetables_to_pdf(path, timetables_data)
 
     def export_teacher_timetables(self):
-        all_teachers = self.session.query(Teacher).order_by(Teacher.name).all()
-        if not all_teachers:
+        all_people = self._get_people()
+        if not all_people:
             QMessageBox.warning(self, "No Data", "There are no teachers to export.")
             return
-        items = [(t.name, t.id) for t in all_teachers]
+        items = [(p.name, p.id) for p in all_people]
         dialog = MultiSelectDialog("Select Teachers to Export", items, self)
         current_id = self.teacher_tt_combo.currentData()
         if current_id:
@@ -1354,12 +1421,13 @@ class TimetableApp(QMainWindow):
             path, _ = QFileDialog.getSaveFileName(self, "Save PDF", "", "PDF Files (*.pdf)")
             if not path: return
             timetables_data = []
-            max_periods_overall = max((s.periods_per_day for s in self.session.query(ClassSection).all()), default=8)
-            for tid in selected_ids:
-                teacher = self.session.get(Teacher, tid)
-                data, _ = self._get_teacher_timetable_data(tid, max_periods_overall)
+            snapshot = get_snapshot(self.session)
+            max_periods_overall = snapshot.max_periods_per_day
+            for person_id in selected_ids:
+                person = snapshot.people[person_id]
+                data, _ = self._get_teacher_timetable_data(person_id, max_periods_overall)
                 timetables_data.append({
-                    "title": f"Timetable for Teacher: {teacher.name}",
+                    "title": f"Timetable for Teacher: {person.name}",
                     "data": data,
                     "max_periods": max_periods_overall
                 })
@@ -1376,68 +1444,56 @@ class TimetableApp(QMainWindow):
         self._write_master_timetable_to_pdf(path, data, h_headers, v_headers)
 
     def _get_class_timetable_data(self, section_id):
-        section = self.session.get(ClassSection, section_id)
+        snapshot = get_snapshot(self.session)
+        section = snapshot.sections[section_id]
         grid_data = [["" for _ in self.DAYS] for _ in range(section.periods_per_day)]
-        set_info_map = {}
-        for cset in self.session.query(ConcurrentSet).all():
-            for subject in cset.subjects:
-                for sec in cset.sections:
-                    set_info_map[(subject.id, sec.id)] = (cset.name, cset.color)
-        schedule = {(e.day, e.period): e for e in
-                    self.session.query(ScheduleEntry).filter_by(class_section_id=section_id).all()}
+        set_info_map = snapshot.set_info
         for r in range(section.periods_per_day):
             for c, day in enumerate(self.DAYS):
-                entry = schedule.get((day, r + 1))
+                lesson = snapshot.grid.cell(section_id, c, r)
                 cell_text, cell_color = "", "#FFFFFF"
-                if entry and entry.subject and entry.teacher:
-                    lookup_key = (entry.subject.id, entry.class_section_id)
+                if lesson and lesson[0] in snapshot.subjects and lesson[1] in snapshot.teachers:
+                    subject_id, teacher_id = lesson
+                    lookup_key = (section_id, subject_id)
                     if lookup_key in set_info_map:
                         cell_text = set_info_map[lookup_key][0]
                         cell_color = set_info_map[lookup_key][1] or "#FFCCCB"
                     else:
-                        cell_text = f"{entry.subject.name}\n({entry.teacher.name})"
-                        cell_color = entry.subject.color or "#E0E0E0"
+                        subject = snapshot.subjects[subject_id]
+                        cell_text = f"{subject.name}\n({snapshot.teachers[teacher_id].name})"
+                        cell_color = subject.color or "#E0E0E0"
                 grid_data[r][c] = (cell_text, cell_color)
         return grid_data, section.periods_per_day
 
-    def _get_teacher_timetable_data(self, teacher_id, max_periods):
+    def _get_teacher_timetable_data(self, person_id, max_periods):
         grid_data = [["" for _ in self.DAYS] for _ in range(max_periods)]
-        schedule = {(e.day, e.period): e for e in
-                    self.session.query(ScheduleEntry).filter_by(teacher_id=teacher_id).all()}
+        schedule = self._get_person_schedule(person_id)
         for r in range(max_periods):
             for c, day in enumerate(self.DAYS):
-                entry = schedule.get((day, r + 1))
-                cell_text, cell_color = "", "#FFFFFF"
-                if entry and entry.subject and entry.class_section:
-                    cell_text = f"{entry.subject.name}\n({entry.class_section.name})"
-                    cell_color = entry.subject.color or "#E0E0E0"
-                grid_data[r][c] = (cell_text, cell_color)
+                grid_data[r][c] = self._person_cell(person_id, schedule, c, r) or ("", "#FFFFFF")
         return grid_data, max_periods
 
     def _get_master_timetable_data(self):
-        all_teachers = self.session.query(Teacher).order_by(Teacher.name).all()
-        if not all_teachers:
+        all_people = self._get_people()
+        if not all_people:
             return [], [], []
-        teacher_map = {teacher.id: i for i, teacher in enumerate(all_teachers)}
-        h_headers = [t.name for t in all_teachers]
-        max_periods = max((s.periods_per_day for s in self.session.query(ClassSection).all()), default=8)
+        person_map = {person.id: i for i, person in enumerate(all_people)}
+        h_headers = [p.name for p in all_people]
+        max_periods = get_snapshot(self.session).max_periods_per_day
         total_rows = len(self.DAYS) * max_periods
         v_headers = []
         for day in self.DAYS:
             for p in range(max_periods):
                 v_headers.append(f"{day[:3]} - P{p + 1}")
-        grid_data = [[("", "#FFFFFF") for _ in all_teachers] for _ in range(total_rows)]
-        schedule_map = {(e.day, e.period, e.teacher_id): e for e in self.session.query(ScheduleEntry).all()}
+        grid_data = [[("", "#FFFFFF") for _ in all_people] for _ in range(total_rows)]
+        schedule_map = self._get_master_schedule_map()
         row_index = 0
-        for day in self.DAYS:
-            for period in range(1, max_periods + 1):
-                for teacher in all_teachers:
-                    col_index = teacher_map[teacher.id]
-                    entry = schedule_map.get((day, period, teacher.id))
-                    if entry and entry.subject and entry.class_section:
-                        item_text = f"{entry.subject.name}\n({entry.class_section.name})"
-                        bg_color = entry.subject.color or "#E0E0E0"
-                        grid_data[row_index][col_index] = (item_text, bg_color)
+        for c, day in enumerate(self.DAYS):
+            for r in range(max_periods):
+                for person in all_people:
+                    col_index = person_map[person.id]
+                    cell = self._person_cell(person.id, schedule_map[person.id], c, r)
+                    if cell: grid_data[row_index][col_index] = cell
                 row_index += 1
         return grid_data, h_headers, v_headers
 
@@ -1547,22 +1603,6 @@ class TimetableApp(QMainWindow):
             traceback.print_exc()
 
 
-def setup_database(db_path):
-    engine = create_engine(f'sqlite:///{db_path}')
-    Base.metadata.create_all(engine)
-    return engine
-
-
-def seed_database_if_empty(session):
-    # Only select the ID column so it doesn't crash if display_name is missing initially
-    if not session.query(ClassSection.id).first():
-        print("Database is empty. Seeding...")
-        default_sections = ["9th-A", "9th-B", "9th-C", "9th-D", "10th-A", "10th-B", "10th-C", "10th-D"]
-        for sec_name in default_sections:
-            session.add(ClassSection(name=sec_name, display_name=sec_name, periods_per_day=8))
-        session.commit()
-
-
 def get_base_path():
     if getattr(sys, 'frozen', False):
         return os.path.dirname(sys.executable)
@@ -1571,14 +1611,17 @@ def get_base_path():
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    multiprocessing.freeze_support()
+    parser = add_solver_arguments(argparse.ArgumentParser(description="HPS Timetable Generator"))
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[:1] + qt_args)
     BASE_DIR = get_base_path()
     DB_PATH = os.path.join(BASE_DIR, "timetable_v5.db")
     SPINNER_PATH = os.path.join(BASE_DIR, "spinner.gif")
     engine = setup_database(DB_PATH)
-    Session = sessionmaker(bind=engine)
+    Session = session_factory(engine)
     session = Session()
     seed_database_if_empty(session)
-    window = TimetableApp(session, spinner_path=SPINNER_PATH)
+    window = TimetableApp(session, spinner_path=SPINNER_PATH, solver_config=SolverConfig.from_args(args))
     window.show()
     sys.exit(app.exec())
\ No newline at end of file
@@ -2,19 +2,26 @@
 import os
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, joinedload  # <-- IMPORT joinedload
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload  # <-- IMPORT joinedload
 
 import uvicorn
-from main import Base, Teacher, Subject, ClassSection, ScheduleEntry, User
+from timetable.database import create_db_engine, server_session_factory
+from timetable.grid import DAYS, ScheduleGrid
+from timetable.migrations import check_schema
+from timetable.models import Base, Teacher, Subject, ClassSection, ScheduleEntry, User
 
 # --- Configuration ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "timetable_v5.db")
 
 # --- Database Setup ---
-engine = create_engine(f'sqlite:///{DB_PATH}', connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# WAL journaling (see timetable/database.py) lets this keep serving reads while the GUI saves a timetable.
+engine = create_db_engine(DB_PATH, check_same_thread=False)
+# This server only reads. Schema upgrades are left to the GUI and the CLI, which would otherwise race it for the
+# write lock; an outdated database stops it here.
+check_schema(engine)
+SessionLocal = server_session_factory(engine)
 
 # --- FastAPI App ---
 app = FastAPI()
@@ -70,26 +77,35 @@ def login(request: LoginRequest):
 @app.get("/timetable/{teacher_id}", response_model=list[TimetableEntry])
 def get_timetable(teacher_id: int):
     db = SessionLocal()
-    # Eagerly load related objects to avoid N+1 query problems and detachment errors
-    schedule = (
-        db.query(ScheduleEntry)
-        .options(
-            joinedload(ScheduleEntry.subject),
-            joinedload(ScheduleEntry.class_section)
-        )
-        .filter(ScheduleEntry.teacher_id == teacher_id)
-        .all()
-    )
+    # The whole week of the person behind this teacher, including their other teacher identities
+    person_id = db.query(Teacher.person_id).filter(Teacher.id == teacher_id).scalar()
+    teacher_ids = (db.scalars(select(Teacher.id).where(Teacher.person_id == person_id)).all()
+                   if person_id is not None else [teacher_id])
+    # Plain rows and name lookups only, so nothing is lazily loaded after the session closes
+    schedule = db.execute(
+        select(ScheduleEntry.class_section_id, ScheduleEntry.day, ScheduleEntry.period, ScheduleEntry.subject_id,
+               ScheduleEntry.teacher_id)
+        .where(ScheduleEntry.teacher_id.in_(teacher_ids))
+    ).all()
+    section_ids = {row.class_section_id for row in schedule}
+    subject_ids = {row.subject_id for row in schedule}
+    sections = db.execute(select(ClassSection.id, ClassSection.name, ClassSection.periods_per_day)
+                          .where(ClassSection.id.in_(section_ids))).all()
+    section_names = {section.id: section.name for section in sections}
+    subject_names = dict(db.execute(select(Subject.id, Subject.name).where(Subject.id.in_(subject_ids))).all())
     db.close()
 
+    # Laid out as a grid, the week comes back in day and period order
+    grid = ScheduleGrid.from_entries(schedule, {section.id: section.periods_per_day for section in sections},
+                                     teacher_ids)
     timetable_data = []
-    for entry in schedule:
-        if entry.subject and entry.class_section:
+    for day_idx, period_idx, section_id, subject_id in grid.lessons_of(teacher_ids):
+        if subject_id in subject_names and section_id in section_names:
             timetable_data.append(TimetableEntry(
-                day=entry.day,
-                period=entry.period,
-                subject_name=entry.subject.name,
-                section_name=entry.class_section.name
+                day=DAYS[day_idx],
+                period=period_idx + 1,
+                subject_name=subject_names[subject_id],
+                section_name=section_names[section_id]
             ))
     return timetable_data
 
@@ -1,8 +1,7 @@
 # setup_users.py (IDE-Friendly Version)
 # import getpass  <-- We no longer need this
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from timetable.database import create_db_engine, session_factory
 
 from main import Base, Teacher, User
 
@@ -11,9 +10,9 @@ DB_PATH = os.path.join(BASE_DIR, "timetable_v5.db")
 
 
 def setup_teacher_logins():
-    engine = create_engine(f'sqlite:///{DB_PATH}')
+    engine = create_db_engine(DB_PATH)
     Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
+    Session = session_factory(engine)
     session = Session()
 
     existing_user_teacher_ids = {user.teacher_id for user in session.query(User).all()}
@@ -0,0 +1,75 @@
+# tests/benchmarks/test_solver_benchmarks.py
+# Model build time, solve time, peak memory and model size on generated schools (see timetable/synthetic.py).
+# Left out of the default test run (see pytest.ini); run them with
+#   python -m pytest tests/benchmarks -m benchmark --benchmark-autosave
+# and compare later runs with --benchmark-compare. Needs pytest-benchmark; skipped without it.
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from ortools.sat.python import cp_model
+
+from timetable.benchmark import peak_rss_mb
+from timetable.database import create_db_engine, session_factory
+from timetable.solver import SolverConfig, TimetableSolver
+from timetable.synthetic import create_school_database
+
+pytest.importorskip("pytest_benchmark")
+pytestmark = pytest.mark.benchmark
+
+SIZES = [16, 50, 100, 200]
+# The whole school is one model, as in timetable/benchmark.py: decomposition would hide where it stops scaling.
+CONFIG = SolverConfig(num_workers=8, max_time_in_seconds=120, decompose=False)
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda size: f"{size}_sections")
+def school(request, tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("schools") / f"school_{request.param}.db")
+    create_school_database(db_path, request.param, seed=0)
+    return db_path
+
+
+def _build(session):
+    solver = TimetableSolver(session, CONFIG)
+    solver._define_variables_and_constraints()
+    return solver
+
+
+def _solve(db_path):
+    # Runs in a fresh process per school, so the peak memory is this school's alone.
+    engine = create_db_engine(db_path)
+    session = session_factory(engine)()
+    try:
+        solver = _build(session)
+        cp_solver = CONFIG.apply(cp_model.CpSolver())
+        start = time.perf_counter()
+        status = cp_solver.StatusName(cp_solver.Solve(solver.model))
+        return {"status": status, "solve_s": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb()}
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def test_build_model(benchmark, school):
+    engine = create_db_engine(school)
+    session = session_factory(engine)()
+    try:
+        solver = benchmark(_build, session)
+        proto = solver.model.Proto()
+        benchmark.extra_info.update(lessons=len(solver.class_periods), variables=len(proto.variables),
+                                    constraints=len(proto.constraints))
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def test_solve(benchmark, school):
+    # One round: a solve takes seconds to minutes, and CP-SAT's own run-to-run spread outweighs more rounds. The
+    # time includes starting the process; solve_s in extra_info is the solve alone.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        result = benchmark.pedantic(lambda: pool.submit(_solve, school).result(), rounds=1, iterations=1)
+    benchmark.extra_info.update(result)
+    # The largest schools may run out of time without a timetable (UNKNOWN); that is a result, not a failure.
+    assert result["status"] not in ("INFEASIBLE", "MODEL_INVALID")
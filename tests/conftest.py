@@ -0,0 +1,83 @@
+# tests/conftest.py
+# Run from the repository root: python -m pytest tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timetable.database import session_factory  # noqa: E402
+from timetable.models import (ClassSection, ConcurrentSet, ScheduleEntry, Subject, SubjectRequirement,  # noqa: E402
+                              Teacher, TeacherAssignment, link_teachers_to_people, setup_database)
+from timetable.solver import TimetableSolver  # noqa: E402
+
+PERIODS_PER_DAY = 2
+# section: [(subject, teacher, saved slots)]; slot = day * PERIODS_PER_DAY + period - 1, as in the solver.
+# "music" is in one concurrent set for both sections, but A has 6 periods of it and B only 4, so A's first four
+# copies are glued to B's and its last two are not. A's unglued lessons are saved in the earliest slots.
+PARTLY_GLUED_SCHOOL = {
+    "A": [("music", "Asha", [0, 1, 2, 3, 4, 5]), ("maths", "Rohit", [6, 7, 8, 9])],
+    "B": [("music", "Neha", [2, 3, 4, 5]), ("english", "Vikas", [0, 1, 6, 7, 8, 9])],
+}
+# Asha teaches music to both sections at once, as one concurrent set.
+SHARED_TEACHER_SCHOOL = {
+    "A": [("music", "Asha", [0, 1]), ("maths", "Rohit", [2, 3, 4, 5, 6, 7, 8, 9])],
+    "B": [("music", "Asha", [0, 1]), ("english", "Vikas", [2, 3, 4, 5, 6, 7, 8, 9])],
+}
+# No teacher or set links A and B, so they are solved as two independent components.
+TWO_COMPONENT_SCHOOL = {
+    "A": [("maths", "Rohit", [0, 1, 2, 3, 4]), ("english", "Vikas", [5, 6, 7, 8, 9])],
+    "B": [("maths", "Asha", [0, 1, 2, 3, 4]), ("english", "Neha", [5, 6, 7, 8, 9])],
+}
+
+
+def build_school(db_path, school):
+    # Saves the school and its timetable, with "music" as a concurrent set of the sections that have it. Returns a
+    # session.
+    engine = setup_database(db_path)
+    session = session_factory(engine)()
+    subjects, teachers = {}, {}
+    for section_name, lessons in school.items():
+        section = ClassSection(name=section_name, display_name=section_name, periods_per_day=PERIODS_PER_DAY)
+        session.add(section)
+        for subject_name, teacher_name, slots in lessons:
+            subject = subjects.setdefault(subject_name, Subject(name=subject_name))
+            teacher = teachers.setdefault(teacher_name, Teacher(name=teacher_name))
+            session.add_all([SubjectRequirement(class_section=section, subject=subject, periods_per_week=len(slots)),
+                             TeacherAssignment(class_section=section, subject=subject, teacher=teacher)])
+            for slot in slots:
+                day, period = divmod(slot, PERIODS_PER_DAY)
+                session.add(ScheduleEntry(class_section=section, subject=subject, teacher=teacher,
+                                          day=TimetableSolver.DAYS[day], period=period + 1))
+    session.flush()
+    if "music" in subjects:
+        session.add(ConcurrentSet(name="Music", sections=[req.class_section for req in subjects["music"].requirements],
+                                  subjects=[subjects["music"]]))
+    link_teachers_to_people(session)
+    session.commit()
+    return session
+
+
+@pytest.fixture
+def partly_glued_school(tmp_path):
+    session = build_school(str(tmp_path / "school.db"), PARTLY_GLUED_SCHOOL)
+    yield session
+    session.close()
+    session.get_bind().dispose()
+
+
+@pytest.fixture
+def shared_teacher_school(tmp_path):
+    session = build_school(str(tmp_path / "school.db"), SHARED_TEACHER_SCHOOL)
+    yield session
+    session.close()
+    session.get_bind().dispose()
+
+
+@pytest.fixture
+def two_component_school(tmp_path):
+    session = build_school(str(tmp_path / "school.db"), TWO_COMPONENT_SCHOOL)
+    yield session
+    session.close()
+    session.get_bind().dispose()
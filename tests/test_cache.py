@@ -0,0 +1,13 @@
+# tests/test_cache.py
+from timetable import cache
+from timetable.cache import scheduling_fingerprint
+from timetable.snapshot import get_snapshot
+from timetable.solver import SolverConfig
+
+
+def test_fingerprint_changes_with_the_cache_version(partly_glued_school, monkeypatch):
+    snapshot, config = get_snapshot(partly_glued_school), SolverConfig()
+    current = scheduling_fingerprint(snapshot, config)
+    assert scheduling_fingerprint(snapshot, config) == current
+    monkeypatch.setattr(cache, "CACHE_VERSION", cache.CACHE_VERSION - 1)
+    assert scheduling_fingerprint(snapshot, config) != current
@@ -0,0 +1,58 @@
+# tests/test_gui_queries.py
+# The timetable views read everything from the snapshot (see timetable/snapshot.py), so showing them, and
+# picking another class or teacher, costs the same number of SQL statements however large the school is.
+import os
+
+import pytest
+
+from timetable.benchmark import fill_schedule
+from timetable.database import count_statements, create_db_engine, session_factory
+from timetable.snapshot import invalidate_snapshot
+from timetable.synthetic import create_school_database
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # before the QApplication below exists
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+
+SIZES = [8, 24]
+# Picks per combo: fewer than the smallest school has, so every size makes the same changes.
+PICKS = 3
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def _timetable_statements(app, tmp_path, num_sections):
+    from main import TimetableApp
+
+    db_path = str(tmp_path / f"school_{num_sections}.db")
+    create_school_database(db_path, num_sections, seed=0)
+    engine = create_db_engine(db_path)
+    session = session_factory(engine)()
+    window = TimetableApp(session, spinner_path="")
+    try:
+        fill_schedule(session)
+        window.refresh_timetable_combos()
+        assert window.class_tt_section_combo.count() > PICKS and window.teacher_tt_combo.count() > PICKS
+        invalidate_snapshot(engine)  # the first view loads it, as after a save
+        with count_statements(engine) as counter:
+            window.update_class_timetable_grid()
+            window.update_teacher_timetable_grid()
+            window.update_master_teacher_tt_grid()
+            for index in range(1, PICKS + 1):
+                window.class_tt_section_combo.setCurrentIndex(index)
+                window.teacher_tt_combo.setCurrentIndex(index)
+        return counter.statements
+    finally:
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+        session.close()
+        engine.dispose()
+
+
+def test_timetable_views_cost_the_same_queries_at_every_size(app, tmp_path):
+    small, large = (_timetable_statements(app, tmp_path, size) for size in SIZES)
+    assert small  # the snapshot load
+    assert len(small) == len(large), (small, large)
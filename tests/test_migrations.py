@@ -0,0 +1,51 @@
+# tests/test_migrations.py
+import sqlite3
+
+import pytest
+
+from timetable.database import create_db_engine
+from timetable.migrations import check_schema
+from timetable.models import setup_database
+
+
+def test_check_schema_accepts_an_upgraded_database(tmp_path):
+    engine = setup_database(str(tmp_path / "school.db"))
+    check_schema(engine)
+    engine.dispose()
+
+
+def test_check_schema_refuses_an_outdated_database(tmp_path):
+    db_path = str(tmp_path / "school.db")
+    setup_database(db_path).dispose()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA user_version=1")
+    conn.close()
+    engine = create_db_engine(db_path)
+    with pytest.raises(RuntimeError, match="schema version 1"):
+        check_schema(engine)
+    engine.dispose()
+
+
+def test_version_cells_lose_their_cascading_foreign_keys(tmp_path):
+    db_path = str(tmp_path / "school.db")
+    setup_database(db_path).dispose()
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        "DROP TABLE schedule_version_cells;"
+        "CREATE TABLE schedule_version_cells (version_id INTEGER NOT NULL REFERENCES schedule_versions (id) "
+        "ON DELETE CASCADE, class_section_id INTEGER NOT NULL REFERENCES class_sections (id) ON DELETE CASCADE, "
+        "day VARCHAR NOT NULL, period INTEGER NOT NULL, subject_id INTEGER REFERENCES subjects (id) ON DELETE "
+        "CASCADE, teacher_id INTEGER REFERENCES teachers (id) ON DELETE CASCADE, "
+        "PRIMARY KEY (version_id, class_section_id, day, period));"
+        "INSERT INTO schedule_versions (id, created_at, label, num_cells, is_active) "
+        "VALUES (1, '2026-01-01 00:00:00', 'Old', 1, 0);"
+        "INSERT INTO schedule_version_cells VALUES (1, 7, 'Monday', 1, 8, 9);"
+        "PRAGMA user_version=3;")
+    conn.close()
+    setup_database(db_path).dispose()
+    conn = sqlite3.connect(db_path)
+    referred = {row[2] for row in conn.execute("PRAGMA foreign_key_list(schedule_version_cells)")}
+    rows = conn.execute("SELECT * FROM schedule_version_cells").fetchall()
+    conn.close()
+    assert referred == {"schedule_versions"}
+    assert rows == [(1, 7, "Monday", 1, 8, 9)]
@@ -0,0 +1,32 @@
+# tests/test_replay.py
+import hashlib
+import os
+import sqlite3
+
+from tests.conftest import SHARED_TEACHER_SCHOOL, build_school
+from timetable.replay import replay
+from timetable.solver import SolverConfig
+
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_replay_leaves_the_saved_database_unchanged(tmp_path):
+    db_path = str(tmp_path / "case.db")
+    session = build_school(db_path, SHARED_TEACHER_SCHOOL)
+    session.close()
+    session.get_bind().dispose()
+    # A case saved before WAL journaling and the latest migrations.
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("PRAGMA user_version=0")
+    conn.close()
+    before = _digest(db_path)
+
+    rows = list(replay([db_path], [SolverConfig(num_workers=1, max_time_in_seconds=10)], ["default"]))
+
+    assert [row["status"] for row in rows] == ["OPTIMAL"]
+    assert _digest(db_path) == before
+    assert not os.path.exists(db_path + "-wal")
@@ -0,0 +1,24 @@
+# tests/test_snapshot.py
+from timetable import snapshot as snapshots
+from timetable.snapshot import get_snapshot
+
+
+def test_snapshot_is_cached_until_a_commit(partly_glued_school):
+    first = get_snapshot(partly_glued_school)
+    assert get_snapshot(partly_glued_school) is first
+    partly_glued_school.commit()
+    assert get_snapshot(partly_glued_school) is not first
+
+
+def test_snapshot_loaded_during_a_commit_is_not_cached(partly_glued_school, monkeypatch):
+    class CommitWhileLoading(snapshots.SchedulingSnapshot):
+        def __init__(self, session):
+            super().__init__(session)
+            # Another session commits after this one has read its rows.
+            snapshots.invalidate_snapshot(session.get_bind())
+
+    partly_glued_school.commit()
+    monkeypatch.setattr(snapshots, "SchedulingSnapshot", CommitWhileLoading)
+    stale = get_snapshot(partly_glued_school)
+    monkeypatch.undo()
+    assert get_snapshot(partly_glued_school) is not stale
@@ -0,0 +1,62 @@
+# tests/test_solver.py
+from ortools.sat.python import cp_model
+
+from timetable.solver import SolverConfig, TimetableSolver
+from timetable.versions import current_solution
+
+CONFIG = SolverConfig(num_workers=1, max_time_in_seconds=30)
+
+
+def test_repair_on_unchanged_data_pins_partly_glued_set(partly_glued_school):
+    solver = TimetableSolver(partly_glued_school, CONFIG, repair=True)
+    solver._define_variables_and_constraints()
+    assert solver._fix_unaffected_lessons() == len(solver.class_periods)
+
+    saved = current_solution(partly_glued_school)
+    solver = TimetableSolver(partly_glued_school, CONFIG, repair=True)
+    assert solver.solve() == saved
+    assert solver._fallback is None
+    assert solver.stats["cp_status"] == "OPTIMAL"
+
+
+def test_warm_start_on_unchanged_data_keeps_the_timetable(partly_glued_school):
+    saved = current_solution(partly_glued_school)
+    for seed in range(3):
+        solver = TimetableSolver(partly_glued_school, SolverConfig(num_workers=1, random_seed=seed), warm_start=True)
+        assert solver.solve() == saved
+
+
+def _explain_model(session):
+    solver = TimetableSolver(session, CONFIG)
+    guards = solver._define_variables_and_constraints(explain=True)
+    return solver, guards
+
+
+def _status(solver, assumptions):
+    solver.model.ClearAssumptions()
+    solver.model.AddAssumptions(assumptions)
+    return CONFIG.apply(cp_model.CpSolver()).Solve(solver.model)
+
+
+def test_explain_mode_allows_glued_lessons_of_one_teacher(shared_teacher_school):
+    solver, guards = _explain_model(shared_teacher_school)
+    assert _status(solver, list(guards.values())) == cp_model.OPTIMAL
+
+
+def test_explain_mode_keeps_teacher_overlap_when_set_is_relaxed(shared_teacher_school):
+    # With the set switched off, Asha's two music lessons are separate lessons and may not share a period.
+    solver, guards = _explain_model(shared_teacher_school)
+    music = [key for key in solver.class_periods if solver.snapshot.subjects[key[1]].name == "music" and key[3] == 0]
+    solver.model.Add(solver.class_periods[music[0]] == solver.class_periods[music[1]])
+    assumptions = [lit if name[0] != 'set' else lit.Not() for name, lit in guards.items()]
+    assert _status(solver, assumptions) == cp_model.INFEASIBLE
+
+
+def test_decomposed_solve_streams_progress(two_component_school):
+    updates = []
+    solver = TimetableSolver(two_component_school, SolverConfig(num_workers=2, max_time_in_seconds=30))
+    solver.on_solution = lambda solution, count, objective, bound, elapsed: updates.append((solution, count))
+    assert len(solver.find_components()) == 2
+    solution = solver.solve()
+    assert updates[-1] == (solution, len(updates))
+    assert len(solution) == 20
@@ -0,0 +1,26 @@
+# tests/test_telemetry.py
+from ortools.sat.python import cp_model
+
+from timetable.telemetry import SearchLogMonitor
+
+
+def _solve(log_search_progress):
+    model = cp_model.CpModel()
+    model.Maximize(model.NewIntVar(0, 10, "x"))
+    solver = cp_model.CpSolver()
+    solver.parameters.log_search_progress = log_search_progress
+    monitor = SearchLogMonitor().attach(solver)
+    solver.Solve(model)
+    return solver, monitor
+
+
+def test_monitor_leaves_the_search_log_off(capfd):
+    solver, monitor = _solve(False)
+    assert not solver.parameters.log_search_progress
+    assert monitor.presolve_seconds is None
+    assert capfd.readouterr().out == ""
+
+
+def test_monitor_times_presolve_from_a_requested_log():
+    _, monitor = _solve(True)
+    assert monitor.presolve_seconds is not None
@@ -0,0 +1,55 @@
+# tests/test_versions.py
+from sqlalchemy import func
+
+from timetable.models import ScheduleVersionCell, Teacher
+from timetable.solver import save_solution
+from timetable.versions import activate_version, current_solution, store_solution, version_solution
+
+
+def _swap_music_and_maths(solution):
+    # Section A's first music lesson and first maths lesson trade places.
+    music = next(key for key, lesson in sorted(solution.items()) if key[2] == 1 and lesson[0] == 1)
+    maths = next(key for key, lesson in sorted(solution.items()) if key[2] == 1 and lesson[0] == 2)
+    edited = dict(solution)
+    edited[music], edited[maths] = solution[maths], solution[music]
+    return edited
+
+
+def test_activating_a_version_writes_only_the_changed_cells(partly_glued_school):
+    session = partly_glued_school
+    original = current_solution(session)
+    first, _ = store_solution(session, original)
+    store_solution(session, _swap_music_and_maths(original), label="Edited")
+    session.commit()
+    counts = activate_version(session, first.id)
+    session.commit()
+    assert current_solution(session) == original
+    assert counts == {"inserted": 0, "updated": 2, "deleted": 0, "unchanged": len(original) - 2}
+
+
+def test_activating_a_version_matches_save_solution(partly_glued_school):
+    session = partly_glued_school
+    original = current_solution(session)
+    first, _ = store_solution(session, original)
+    edited = _swap_music_and_maths(original)
+    del edited[next(iter(sorted(edited)))]
+    store_solution(session, edited, label="Edited")
+    session.commit()
+    expected = save_solution(session, original)
+    session.rollback()
+    assert activate_version(session, first.id) == expected
+
+
+def test_deleting_a_teacher_keeps_stored_versions_whole(partly_glued_school):
+    session = partly_glued_school
+    version, _ = store_solution(session, current_solution(session))
+    session.commit()
+    teacher = session.query(Teacher).filter_by(name="Rohit").one()
+    session.delete(teacher)
+    session.commit()
+    stored = session.query(func.count()).select_from(ScheduleVersionCell).filter_by(version_id=version.id).scalar()
+    assert stored == version.num_cells
+    activate_version(session, version.id)
+    session.commit()
+    assert len(current_solution(session)) == version.num_cells - 4  # Rohit's maths lessons
+    assert len(version_solution(session, version.id)) == version.num_cells
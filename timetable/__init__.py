@@ -0,0 +1,3 @@
+# timetable/__init__.py
+# Qt-free core of the timetable generator: database models and the CP-SAT solver.
+# The GUI lives in main.py; `python -m timetable` runs the solver headless.
@@ -0,0 +1,269 @@
+# timetable/__main__.py
+# Headless entry point, e.g.:
+#   python -m timetable solve --db timetable_v5.db --time-limit 120 --workers 8
+#   python -m timetable replay solver_models/ timetable_v5.db --workers 1 8
+#   python -m timetable generate big_school.db --sections 64
+#   python -m timetable benchmark --sizes 16 32 64 128 200
+#   python -m timetable benchmark-queries --sections 200
+#   python -m timetable benchmark-refresh --sizes 16 64 200
+#   python -m timetable versions --activate 12
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from timetable import benchmark
+from timetable.cache import SolutionCache
+from timetable.corpus import model_dir_for_database
+from timetable.database import session_factory
+from timetable.models import setup_database
+from timetable.replay import FORMULATIONS, config_grid, format_table, replay, write_csv
+from timetable.solver import SolverConfig, TimetableSolver, add_solver_arguments, changed_cells
+from timetable.synthetic import create_school_database
+from timetable.versions import activate_version, list_versions, store_solution
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "timetable_v5.db")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m timetable", description="HPS Timetable Generator (headless)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    solve = commands.add_parser("solve", help="Generate a timetable and store it in the database")
+    solve.add_argument("--db", default=DEFAULT_DB_PATH, help=f"SQLite database (default: {DEFAULT_DB_PATH})")
+    solve.add_argument("--warm-start", action="store_true", help="Hint the solver with the stored timetable")
+    solve.add_argument("--repair", action="store_true",
+                       help="Only re-solve lessons affected by changes since the stored timetable")
+    solve.add_argument("--dry-run", action="store_true", help="Solve and report, but do not save the timetable")
+    solve.add_argument("--no-cache", action="store_true",
+                       help="Always solve, even if a cached timetable matches the current data")
+    solve.add_argument("--dump-model", action="store_true",
+                       help="Save the built CP-SAT model and its metadata in solver_models/ next to the database")
+    add_solver_arguments(solve)
+
+    defaults = SolverConfig()
+    replay = commands.add_parser("replay", help="Re-solve saved models and databases and print a timing table")
+    replay.add_argument("paths", nargs="+", help="Saved models (*.pb.txt), SQLite databases, or directories of them")
+    replay.add_argument("--formulation", nargs="+", choices=sorted(FORMULATIONS), default=["default"],
+                        help="How databases are turned into models (saved models are replayed as saved)")
+    replay.add_argument("--workers", nargs="+", type=int, default=[defaults.num_workers])
+    replay.add_argument("--seed", nargs="+", type=int, default=[defaults.random_seed])
+    replay.add_argument("--linearization-level", nargs="+", type=int, choices=[0, 1, 2],
+                        default=[defaults.linearization_level])
+    replay.add_argument("--time-limit", type=float, default=defaults.max_time_in_seconds,
+                        help="Maximum solve time in seconds per run")
+    replay.add_argument("--csv", help="Also write the table to this CSV file")
+
+    generate = commands.add_parser("generate", help="Create a database with a generated school")
+    generate.add_argument("db", help="SQLite database to create")
+    generate.add_argument("--sections", type=int, default=16, help="Number of class sections (default: 16)")
+    generate.add_argument("--seed", type=int, default=0, help="Random seed for teachers and identities")
+    generate.add_argument("--split-ratio", type=float, default=0.25,
+                          help="Share of teachers who also teach a second subject under a ' (2)' identity")
+    generate.add_argument("--force", action="store_true", help="Replace the database if it exists")
+
+    bench = commands.add_parser("benchmark", help="Time model build and solve on generated schools of growing size")
+    bench.add_argument("--sizes", nargs="+", type=int, default=benchmark.DEFAULT_SIZES,
+                       help="Numbers of class sections to generate")
+    bench.add_argument("--seed", type=int, default=0, help="Random seed for the generated schools")
+    bench.add_argument("--workers", type=int, default=defaults.num_workers)
+    bench.add_argument("--time-limit", type=float, default=defaults.max_time_in_seconds,
+                       help="Maximum solve time in seconds per school")
+    bench.add_argument("--keep-dir", help="Keep the generated databases in this directory")
+    bench.add_argument("--csv", help="Also write the table to this CSV file")
+
+    queries = commands.add_parser("benchmark-queries",
+                                  help="Time the hot database lookups with and without the covering indexes")
+    queries.add_argument("--sections", type=int, default=200, help="Number of class sections (default: 200)")
+    queries.add_argument("--seed", type=int, default=0, help="Random seed for the generated school")
+    queries.add_argument("--repeat", type=int, default=5, help="Timing runs per query; the best one counts")
+    queries.add_argument("--keep-dir", help="Keep the generated database in this directory")
+    queries.add_argument("--csv", help="Also write the table to this CSV file")
+
+    refresh = commands.add_parser("benchmark-refresh",
+                                  help="Count the queries behind the timetable views on schools of growing size")
+    refresh.add_argument("--sizes", nargs="+", type=int, default=benchmark.DEFAULT_SIZES,
+                         help="Numbers of class sections to generate")
+    refresh.add_argument("--seed", type=int, default=0, help="Random seed for the generated schools")
+    refresh.add_argument("--keep-dir", help="Keep the generated databases in this directory")
+    refresh.add_argument("--csv", help="Also write the table to this CSV file")
+
+    versions = commands.add_parser("versions", help="List saved timetable versions or make one the active timetable")
+    versions.add_argument("--db", default=DEFAULT_DB_PATH, help=f"SQLite database (default: {DEFAULT_DB_PATH})")
+    versions.add_argument("--activate", type=int, metavar="ID", help="Make this version the active timetable")
+    versions.add_argument("--limit", type=int, default=20, help="Number of versions to list (default: 20)")
+    return parser
+
+
+def run_solve(args):
+    if not os.path.exists(args.db):
+        print(f"Error: database not found: {args.db}")
+        return 2
+
+    timings = {}
+    start = time.time()
+    engine = setup_database(args.db)
+    session = session_factory(engine)()
+    try:
+        cache = None if args.no_cache else SolutionCache.for_database(args.db)
+        model_dir = model_dir_for_database(args.db) if args.dump_model else None
+        solver = TimetableSolver(session, SolverConfig.from_args(args), warm_start=args.warm_start,
+                                 repair=args.repair, cache=cache, model_dir=model_dir)
+        timings["load"] = time.time() - start
+
+        start = time.time()
+        solution = solver.solve()
+        timings["solve"] = time.time() - start
+
+        if "errors" in solution:
+            print("\nStatus: FAILED")
+            print(solution["errors"])
+            return 1
+
+        if args.dry_run:
+            print(f"\nStatus: SOLVED ({len(solution)} lessons, not saved: --dry-run)")
+        else:
+            start = time.time()
+            version, counts = store_solution(session, solution, solver_run_id=solver.run_id)
+            session.commit()
+            timings["save"] = time.time() - start
+            solver.record_persist_time(timings["save"], changed_cells(counts))
+            print(f"\nStatus: SOLVED ({len(solution)} lessons saved to {args.db} as version {version.id}; "
+                  f"{format_counts(counts)})")
+        print("Timings: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items()))
+        return 0
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def format_counts(counts):
+    return (f"{changed_cells(counts)} cells changed: {counts['inserted']} added, {counts['updated']} updated, "
+            f"{counts['deleted']} removed")
+
+
+def run_versions(args):
+    if not os.path.exists(args.db):
+        print(f"Error: database not found: {args.db}")
+        return 2
+    engine = setup_database(args.db)
+    session = session_factory(engine)()
+    try:
+        if args.activate is not None:
+            start = time.time()
+            try:
+                counts = activate_version(session, args.activate)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return 2
+            session.commit()
+            print(f"Version {args.activate} is now the active timetable ({format_counts(counts)}) "
+                  f"in {time.time() - start:.3f}s")
+        for version in list_versions(session, args.limit):
+            marker = "*" if version.is_active else " "
+            changed = "" if version.cells_changed is None else f", {version.cells_changed} changed"
+            print(f"{marker} {version.id:>4}  {version.created_at:%Y-%m-%d %H:%M:%S}  {version.label} "
+                  f"({version.num_cells} lessons{changed})")
+        return 0
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def run_replay(args):
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        print(f"Error: not found: {', '.join(missing)}")
+        return 2
+    configs = config_grid(SolverConfig(max_time_in_seconds=args.time_limit), args.workers, args.seed,
+                          args.linearization_level)
+    rows = []
+    for row in replay(args.paths, configs, args.formulation):
+        print(f"{row['instance']} [{row['formulation']}, {row['workers']} workers, seed {row['seed']}]: "
+              f"{row['status']} in {row['solve_s']:.2f}s")
+        rows.append(row)
+    if not rows:
+        print("No saved models or databases found.")
+        return 1
+    print()
+    print(format_table(rows))
+    if args.csv:
+        write_csv(rows, args.csv)
+    return 0
+
+
+def run_generate(args):
+    try:
+        summary = create_school_database(args.db, args.sections, seed=args.seed, split_ratio=args.split_ratio,
+                                         overwrite=args.force)
+    except FileExistsError:
+        print(f"Error: {args.db} already exists (use --force to replace it)")
+        return 2
+    print(f"Created {args.db}: " + ", ".join(f"{count} {what.replace('_', ' ')}" for what, count in summary.items()))
+    return 0
+
+
+def run_benchmark(args):
+    config = SolverConfig(num_workers=args.workers, max_time_in_seconds=args.time_limit, random_seed=args.seed)
+    rows = []
+    for row in benchmark.run_benchmark(args.sizes, config, seed=args.seed, directory=args.keep_dir):
+        print(f"{row['sections']} sections: {row['status']}, build {row['build_s']:.2f}s, "
+              f"solve {row['solve_s']:.2f}s, {row['variables']} variables")
+        rows.append(row)
+    print()
+    print(format_table(rows, benchmark.COLUMNS))
+    if args.csv:
+        write_csv(rows, args.csv, benchmark.COLUMNS)
+    return 0
+
+
+def run_query_benchmark(args):
+    rows = benchmark.benchmark_queries(args.sections, seed=args.seed, directory=args.keep_dir, repeat=args.repeat)
+    print()
+    print(format_table(rows, benchmark.QUERY_COLUMNS))
+    if args.csv:
+        write_csv(rows, args.csv, benchmark.QUERY_COLUMNS)
+    return 0
+
+
+def run_refresh_benchmark(args):
+    rows = benchmark.benchmark_refresh(args.sizes, seed=args.seed, directory=args.keep_dir)
+    print(format_table(rows, benchmark.REFRESH_COLUMNS))
+    if args.csv:
+        write_csv(rows, args.csv, benchmark.REFRESH_COLUMNS)
+    # The views must not go back to a query per cell, section or teacher as the school grows.
+    counts = {(row["load_queries"], row["refresh_queries"]) for row in rows}
+    if len(counts) > 1:
+        print("\nError: the number of queries grows with the school size.")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "solve":
+        return run_solve(args)
+    if args.command == "replay":
+        return run_replay(args)
+    if args.command == "generate":
+        return run_generate(args)
+    if args.command == "benchmark":
+        return run_benchmark(args)
+    if args.command == "benchmark-queries":
+        return run_query_benchmark(args)
+    if args.command == "benchmark-refresh":
+        return run_refresh_benchmark(args)
+    if args.command == "versions":
+        return run_versions(args)
+    return 2
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# timetable/benchmark.py
+# Scaling benchmarks on generated schools (see timetable/synthetic.py), e.g.:
+#   python -m timetable benchmark --sizes 16 32 64 128 200 --time-limit 120
+#   python -m timetable benchmark-queries --sections 200
+#   python -m timetable benchmark-refresh --sizes 16 64 200
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from ortools.sat.python import cp_model
+from sqlalchemy import insert, text
+
+from timetable.database import count_statements, create_db_engine, session_factory
+from timetable.grid import DAYS
+from timetable.migrations import COVERING_INDEXES
+from timetable.models import ClassSection, ScheduleEntry, SubjectRequirement, TeacherAssignment
+from timetable.snapshot import get_snapshot
+from timetable.solver import TimetableSolver
+from timetable.synthetic import create_school_database
+from timetable.telemetry import SearchLogMonitor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+COLUMNS = ["sections", "teachers", "lessons", "variables", "constraints", "checks_s", "build_s", "presolve_s",
+           "solve_s", "status", "conflicts", "peak_rss_mb"]
+DEFAULT_SIZES = [16, 32, 64, 128, 200]
+
+
+def peak_rss_mb():
+    # The most memory this process has held so far, so one measurement per fresh process (see run_benchmark).
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def benchmark_school(num_sections, config, seed, directory):
+    # Runs in a fresh process per size (see run_benchmark), so the peak RSS belongs to this school alone.
+    # The whole school is one model here: decomposition would hide where the formulation stops scaling.
+    db_path = os.path.join(directory, f"school_{num_sections}_{seed}.db")
+    summary = create_school_database(db_path, num_sections, seed=seed, overwrite=True)
+    engine = create_db_engine(db_path)
+    session = session_factory(engine)()
+    try:
+        solver = TimetableSolver(session, config)
+        start = time.time()
+        errors = solver.run_diagnostics()
+        checks = time.time() - start
+        start = time.time()
+        solver._define_variables_and_constraints()
+        build = time.time() - start
+
+        cp_solver = config.apply(cp_model.CpSolver())
+        monitor = SearchLogMonitor().attach(cp_solver)
+        start = time.time()
+        status = cp_solver.StatusName(cp_solver.Solve(solver.model)) if not errors else "CHECKS_FAILED"
+        proto = solver.model.Proto()
+        return {"sections": summary["sections"], "teachers": summary["teachers"], "lessons": summary["lessons"],
+                "variables": len(proto.variables), "constraints": len(proto.constraints), "checks_s": checks,
+                "build_s": build, "presolve_s": monitor.presolve_seconds, "solve_s": time.time() - start,
+                "status": status, "conflicts": cp_solver.NumConflicts(), "peak_rss_mb": peak_rss_mb()}
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def run_benchmark(sizes, config, seed=0, directory=None):
+    # Yields one result row per size, smallest first. The generated databases are kept in directory if one is
+    # given, otherwise they go to a temporary directory that is removed afterwards.
+    context = multiprocessing.get_context("spawn")
+    if directory: os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="timetable-benchmark-") as scratch:
+        for num_sections in sorted(sizes):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                yield pool.submit(benchmark_school, num_sections, config, seed, directory or scratch).result()
+
+
+QUERY_COLUMNS = ["query", "runs", "rows", "without_ms", "with_ms", "speedup", "plan_with"]
+# The lookups the covering indexes in timetable/migrations.py are for: (name, SQL, parameter source).
+HOT_QUERIES = [
+    ("teacher timetable", "SELECT day, period, class_section_id, subject_id FROM schedule_entries "
+                          "WHERE teacher_id = :teacher_id", "teachers"),
+    ("person timetable", "SELECT e.day, e.period, e.class_section_id, e.subject_id FROM schedule_entries e "
+                         "JOIN teachers t ON t.id = e.teacher_id WHERE t.person_id = :person_id", "people"),
+    ("teacher assignments", "SELECT class_section_id, subject_id FROM teacher_assignments "
+                            "WHERE teacher_id = :teacher_id", "teachers"),
+    ("section requirement", "SELECT periods_per_week FROM subject_requirements "
+                            "WHERE class_section_id = :section_id AND subject_id = :subject_id", "requirements"),
+]
+
+
+def fill_schedule(session):
+    # Saves a timetable for a generated school. Query timing and counting only need realistic row counts, not a
+    # valid timetable: each section's lessons simply take its slots in order, which is much faster than solving
+    # a school of hundreds of sections. Returns the number of lessons saved.
+    teachers = {(a.class_section_id, a.subject_id): a.teacher_id for a in session.query(TeacherAssignment)}
+    periods_per_day = {s.id: s.periods_per_day for s in session.query(ClassSection)}
+    next_slot = defaultdict(int)
+    rows = []
+    for req in session.query(SubjectRequirement).order_by(SubjectRequirement.id):
+        section_id = req.class_section_id
+        for _ in range(req.periods_per_week):
+            day, period = divmod(next_slot[section_id], periods_per_day[section_id])
+            if day >= len(TimetableSolver.DAYS): break
+            next_slot[section_id] += 1
+            rows.append({"class_section_id": section_id, "day": TimetableSolver.DAYS[day], "period": period + 1,
+                         "subject_id": req.subject_id, "teacher_id": teachers.get((section_id, req.subject_id))})
+    session.execute(insert(ScheduleEntry.__table__), rows)
+    session.commit()
+    return len(rows)
+
+
+def _query_parameters(conn):
+    return {
+        "teachers": [{"teacher_id": row[0]} for row in conn.execute(text("SELECT id FROM teachers"))],
+        "people": [{"person_id": row[0]} for row in conn.execute(text("SELECT id FROM people"))],
+        "requirements": [{"section_id": row[0], "subject_id": row[1]} for row in conn.execute(
+            text("SELECT class_section_id, subject_id FROM subject_requirements"))],
+    }
+
+
+def _time_queries(conn, parameters, repeat):
+    # Mean milliseconds per query over every parameter set, best of repeat; plus rows returned and the plan.
+    results = {}
+    for name, sql, source in HOT_QUERIES:
+        statement = text(sql)
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = sum(len(conn.execute(statement, params).fetchall()) for params in parameters[source])
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        plan = conn.execute(text("EXPLAIN QUERY PLAN " + sql), parameters[source][0]).fetchall()
+        results[name] = (1000 * best / len(parameters[source]), rows, "; ".join(row[-1] for row in plan))
+    return results
+
+
+def benchmark_queries(num_sections=200, seed=0, directory=None, repeat=5):
+    # Times the hot lookups on a generated school with the covering indexes, then again after dropping them.
+    # Returns one row per query (see QUERY_COLUMNS).
+    with tempfile.TemporaryDirectory(prefix="timetable-queries-") as scratch:
+        if directory: os.makedirs(directory, exist_ok=True)
+        db_path = os.path.join(directory or scratch, f"school_{num_sections}_{seed}_queries.db")
+        create_school_database(db_path, num_sections, seed=seed, overwrite=True)
+        engine = create_db_engine(db_path)
+        try:
+            session = session_factory(engine)()
+            try:
+                lessons = fill_schedule(session)
+            finally:
+                session.close()
+            print(f"{num_sections} sections, {lessons} timetable rows.")
+            with engine.connect() as conn:
+                parameters = _query_parameters(conn)
+                with_indexes = _time_queries(conn, parameters, repeat)
+                for name in COVERING_INDEXES:
+                    conn.execute(text(f"DROP INDEX {name}"))
+                conn.commit()
+                without_indexes = _time_queries(conn, parameters, repeat)
+        finally:
+            engine.dispose()
+    rows = []
+    for name, _, source in HOT_QUERIES:
+        with_ms, count, plan = with_indexes[name]
+        without_ms = without_indexes[name][0]
+        rows.append({"query": name, "runs": len(parameters[source]), "rows": count, "without_ms": without_ms,
+                     "with_ms": with_ms, "speedup": f"{without_ms / with_ms:.1f}x" if with_ms else None,
+                     "plan_with": plan})
+    return rows
+
+
+REFRESH_COLUMNS = ["sections", "teachers", "lessons", "load_queries", "refresh_queries", "load_ms", "refresh_ms"]
+
+
+def _read_views(snapshot):
+    # What the GUI's class and teacher timetables read when another class or teacher is picked: every cell
+    # with its subject, teacher and concurrent set, and every person's lessons and clashes. This only times them
+    # without a display; tests/test_gui_queries.py counts the statements of the real views.
+    grid = snapshot.grid
+    for section in snapshot.sections.values():
+        for day_idx in range(len(DAYS)):
+            for period_idx in range(section.periods_per_day):
+                lesson = grid.cell(section.id, day_idx, period_idx)
+                if not lesson or lesson[0] not in snapshot.subjects: continue
+                snapshot.set_info.get((section.id, lesson[0]))
+                if lesson[1] in snapshot.teachers: snapshot.person_name(lesson[1])
+    for person in snapshot.people_with_teachers():
+        grid.combined(snapshot.teachers_of_person[person.id])
+    return len(snapshot.person_clashes)
+
+
+def benchmark_refresh(sizes, seed=0, directory=None):
+    # Counts the SQL statements behind the timetable views on generated schools of growing size: loading the
+    # snapshot after a save, then refreshing every view from it. Both should stay the same for every size.
+    # Returns one row per size (see REFRESH_COLUMNS).
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="timetable-refresh-") as scratch:
+        if directory: os.makedirs(directory, exist_ok=True)
+        for num_sections in sorted(sizes):
+            db_path = os.path.join(directory or scratch, f"school_{num_sections}_{seed}_refresh.db")
+            summary = create_school_database(db_path, num_sections, seed=seed, overwrite=True)
+            engine = create_db_engine(db_path)
+            try:
+                session = session_factory(engine)()
+                try:
+                    lessons = fill_schedule(session)  # the commit drops any snapshot
+                    with count_statements(engine) as loading:
+                        start = time.perf_counter()
+                        get_snapshot(session).grid
+                        load_ms = 1000 * (time.perf_counter() - start)
+                    with count_statements(engine) as refreshing:
+                        start = time.perf_counter()
+                        _read_views(get_snapshot(session))
+                        refresh_ms = 1000 * (time.perf_counter() - start)
+                finally:
+                    session.close()
+            finally:
+                engine.dispose()
+            rows.append({"sections": summary["sections"], "teachers": summary["teachers"], "lessons": lessons,
+                         "load_queries": loading.count, "refresh_queries": refreshing.count, "load_ms": load_ms,
+                         "refresh_ms": refresh_ms})
+    return rows
@@ -0,0 +1,74 @@
+# timetable/cache.py
+# On-disk cache of generated timetables, keyed by a fingerprint of everything the solver reads.
+import hashlib
+import json
+import os
+
+
+# Bump when the model formulation changes, so solutions built by an older solver are not reused:
+#   2: the Large Neighbourhood Search stage that reduces idle gaps and subject clustering
+#   3: teachers of one person share a timeline (see Person in timetable/models.py)
+CACHE_VERSION = 3
+
+
+def scheduling_fingerprint(snapshot, config):
+    # snapshot is the SchedulingSnapshot the solver reads (see timetable/snapshot.py).
+    config_fields = config.to_dict()
+    config_fields.pop("log_search_progress", None)  # Only affects console output.
+    payload = {
+        "version": CACHE_VERSION,
+        "sections": sorted((s.id, s.periods_per_day) for s in snapshot.sections.values()),
+        # Teachers of one person share a timeline.
+        "teachers": sorted((t.id, t.person_id) for t in snapshot.teachers.values()),
+        "requirements": sorted(tuple(req) for req in snapshot.requirements),
+        "assignments": sorted(key + (teacher_id,) for key, teacher_id in snapshot.assignments.items()),
+        "set_sections": sorted((c.id, sec_id) for c in snapshot.concurrent_sets for sec_id in c.section_ids),
+        "set_subjects": sorted((c.id, sub_id) for c in snapshot.concurrent_sets for sub_id in c.subject_ids),
+        "config": config_fields,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SolutionCache:
+    """Least-recently-used store of solver solutions, one JSON file per fingerprint."""
+
+    def __init__(self, directory, max_entries=20):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    @classmethod
+    def for_database(cls, db_path, max_entries=20):
+        return cls(os.path.join(os.path.dirname(os.path.abspath(db_path)), "solution_cache"), max_entries)
+
+    def _path(self, fingerprint):
+        return os.path.join(self.directory, f"{fingerprint}.json")
+
+    def get(self, fingerprint):
+        path = self._path(fingerprint)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+            os.utime(path)  # Mark as recently used.
+        except (OSError, ValueError):
+            return None
+        return {(day, period, section_id): (subject_id, teacher_id)
+                for day, period, section_id, subject_id, teacher_id in rows}
+
+    def put(self, fingerprint, solution):
+        os.makedirs(self.directory, exist_ok=True)
+        rows = [[day, period, section_id, subject_id, teacher_id]
+                for (day, period, section_id), (subject_id, teacher_id) in solution.items()]
+        tmp_path = self._path(fingerprint) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        os.replace(tmp_path, self._path(fingerprint))
+        self._evict()
+
+    def _evict(self):
+        entries = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
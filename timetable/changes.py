@@ -0,0 +1,85 @@
+# timetable/changes.py
+# Which tables, and which of their rows, each commit changed. Every session on a database (the GUI's, its save
+# thread's, the solver's telemetry) adds what it committed to one record per database, and the GUI takes what
+# has changed since it last looked, so it only rebuilds the views that read those tables (see
+# TimetableApp.refresh_all_data in main.py).
+import threading
+import weakref
+from itertools import chain
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+# Stands for every row of a table, for statements that do not say which rows they change, e.g. a bulk delete.
+ALL_ROWS = None
+
+
+class Changes:
+    """Changed rows by table name: a set of ids, or ALL_ROWS."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def add(self, table, row_id=ALL_ROWS):
+        if row_id is ALL_ROWS:
+            self.rows[table] = ALL_ROWS
+        elif self.rows.get(table, set()) is not ALL_ROWS:
+            self.rows.setdefault(table, set()).add(row_id)
+
+    def update(self, other):
+        for table, row_ids in other.rows.items():
+            if row_ids is ALL_ROWS: self.add(table)
+            else:
+                for row_id in row_ids: self.add(table, row_id)
+
+    def touches(self, tables):
+        return not self.rows.keys().isdisjoint(tables)
+
+
+# Committed changes per engine, not yet taken.
+_committed = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def take_changes(bind):
+    # What was committed on this database since the last call; the first call returns everything since start-up.
+    with _lock:
+        return _committed.pop(bind, None) or Changes()
+
+
+def _pending(session):
+    # Changes of the session's open transaction.
+    return session.info.setdefault("pending_changes", Changes())
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    # Objects added, modified (including their relationship collections) or deleted by the ORM.
+    changes = _pending(session)
+    for obj in chain(session.new, session.dirty, session.deleted):
+        state = inspect(obj)
+        key = state.identity
+        changes.add(state.mapper.local_table.name, key[0] if key and len(key) == 1 else key)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_statement(orm_execute_state):
+    # INSERT, UPDATE and DELETE statements run through the session, e.g. save_solution's executemany.
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _pending(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session):
+    changes = session.info.pop("pending_changes", None)
+    if not changes: return
+    with _lock:
+        _committed.setdefault(session.get_bind(), Changes()).update(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("pending_changes", None)
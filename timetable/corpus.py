@@ -0,0 +1,82 @@
+# timetable/corpus.py
+# Saved CP-SAT models of real solves, for replaying slow instances outside the GUI (see timetable/replay.py).
+import datetime
+import json
+import os
+
+from ortools.sat.python import cp_model
+
+MODEL_SUFFIX = ".pb.txt"
+
+
+def model_dir_for_database(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "solver_models")
+
+
+def _metadata_path(model_path):
+    return model_path[:-len(MODEL_SUFFIX)] + ".json"
+
+
+def dump_model(timetable_solver, directory):
+    # Text format, so the models stay readable and load with any ortools version. Returns the model's path.
+    os.makedirs(directory, exist_ok=True)
+    name = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    if timetable_solver.fingerprint: name += f"_{timetable_solver.fingerprint[:12]}"
+    if timetable_solver.section_ids is not None: name += f"_s{min(timetable_solver.section_ids)}"
+    path = os.path.join(directory, name + MODEL_SUFFIX)
+    timetable_solver.model.ExportToFile(path)
+    proto = timetable_solver.model.Proto()
+    write_metadata(path, {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "database": timetable_solver.session.get_bind().url.database,
+        "fingerprint": timetable_solver.fingerprint,
+        "section_ids": sorted(timetable_solver.section_ids) if timetable_solver.section_ids is not None else None,
+        "warm_start": timetable_solver.warm_start,
+        "repair": timetable_solver.repair,
+        "config": timetable_solver.config.to_dict(),
+        "num_lessons": len(timetable_solver.class_periods),
+        "num_variables": len(proto.variables),
+        "num_constraints": len(proto.constraints),
+    })
+    return path
+
+
+def write_metadata(model_path, values):
+    metadata = read_metadata(model_path)
+    metadata.update(values)
+    with open(_metadata_path(model_path), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, sort_keys=True)
+
+
+def read_metadata(model_path):
+    try:
+        with open(_metadata_path(model_path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_model(model_path):
+    model = cp_model.CpModel()
+    with open(model_path, encoding="utf-8") as f:
+        text = f.read()
+    proto = model.Proto()
+    if hasattr(proto, "parse_text_format"):
+        proto.parse_text_format(text)
+    else:
+        # Older ortools releases expose the plain protobuf message.
+        from google.protobuf import text_format
+        text_format.Parse(text, proto)
+    return model
+
+
+def find_instances(paths):
+    # Expands directories into the saved models and SQLite databases they contain.
+    instances = []
+    for path in paths:
+        if os.path.isdir(path):
+            instances += sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.endswith(MODEL_SUFFIX) or name.endswith(".db"))
+        else:
+            instances.append(path)
+    return instances
@@ -0,0 +1,81 @@
+# timetable/database.py
+# Opens the SQLite database the same way for every entry point (GUI, teacher API server, CLI and the
+# maintenance scripts). WAL journaling lets the server keep reading while the GUI saves a timetable.
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# Wait this long for another connection's write lock before failing with "database is locked".
+BUSY_TIMEOUT_MS = 10000
+# Page cache and memory map grow with the file, within these limits (the cache never drops below SQLite's
+# default of about 2 MB).
+MIN_CACHE_KB, MAX_CACHE_KB = 2 * 1024, 64 * 1024
+MAX_MMAP_BYTES = 256 * 1024 * 1024
+
+
+def sqlite_pragmas(db_path):
+    # Returns the PRAGMAs applied to each new connection to db_path, in order.
+    size = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+    cache_kb = min(max(size // 1024, MIN_CACHE_KB), MAX_CACHE_KB)
+    # Leave the map room to grow, e.g. for the versions saved while the application runs.
+    mmap_bytes = min(2 * size, MAX_MMAP_BYTES)
+    return [("journal_mode", "WAL"), ("synchronous", "NORMAL"), ("foreign_keys", "ON"),
+            ("busy_timeout", BUSY_TIMEOUT_MS), ("cache_size", -cache_kb), ("mmap_size", mmap_bytes)]
+
+
+def create_db_engine(db_path, **connect_args):
+    """Engine for a SQLite file with the PRAGMAs from sqlite_pragmas set on every connection."""
+    db_path = os.path.abspath(db_path)
+    engine = create_engine(f"sqlite:///{db_path}",
+                           connect_args={"timeout": BUSY_TIMEOUT_MS / 1000, **connect_args})
+    pragmas = sqlite_pragmas(db_path)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
+
+
+class StatementCounter:
+    """SQL statements run on an engine inside a count_statements() block."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_statements(engine):
+    # e.g. to check that a screen costs the same number of queries however large the school is:
+    #   with count_statements(engine) as counter: ...
+    #   counter.count
+    counter = StatementCounter()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def session_factory(engine):
+    # For the GUI's long-lived session, the solver and the scripts.
+    return sessionmaker(bind=engine)
+
+
+def server_session_factory(engine):
+    # One short session per API request. The loaded rows are used after the session closes, so they are not
+    # expired on commit.
+    return sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,152 @@
+# timetable/grid.py
+# The timetable as dense int32 arrays: subject and teacher ids indexed [section, day, period], plus a
+# teacher-major view indexed [teacher, day, period]. Free cells hold EMPTY. The GUI grids, PDF exports, the
+# clash check and the teacher API read lessons from here by array indexing instead of building their own
+# (day, period) -> entry dicts.
+from collections import defaultdict
+from itertools import product
+
+import numpy as np
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+EMPTY = -1
+
+
+def _index(ids):
+    return {id_: i for i, id_ in enumerate(ids)}
+
+
+def _lookup(ids):
+    # Array mapping each id to its row, EMPTY for ids not in the list.
+    table = np.full(max(ids, default=0) + 1, EMPTY, dtype=np.int32)
+    table[list(ids)] = np.arange(len(ids), dtype=np.int32)
+    return table
+
+
+class ScheduleGrid:
+    """Subject and teacher of every (section, day, period) cell, with the same lessons per teacher."""
+
+    def __init__(self, periods_per_day, teacher_ids):
+        # periods_per_day: {section id: periods per day}; the grid is as long as the longest day.
+        self.section_ids = np.array(list(periods_per_day), dtype=np.int32)
+        self.periods_per_day = np.array(list(periods_per_day.values()), dtype=np.int32)
+        self.teacher_ids = np.asarray(teacher_ids, dtype=np.int32)
+        self.section_row = _index(periods_per_day)
+        self.teacher_row = _index(teacher_ids)
+        self.num_periods = int(self.periods_per_day.max(initial=0))
+        shape = (len(self.section_ids), len(DAYS), self.num_periods)
+        self.subjects = np.full(shape, EMPTY, dtype=np.int32)
+        self.teachers = np.full(shape, EMPTY, dtype=np.int32)
+        self._teacher_view = None
+
+    @classmethod
+    def from_entries(cls, entries, periods_per_day, teacher_ids):
+        # entries: (section id, day name, period, subject id, teacher id), e.g. the snapshot's EntryRows.
+        grid = cls(periods_per_day, teacher_ids)
+        grid.place(entries)
+        return grid
+
+    def place(self, entries):
+        # Lessons of unknown sections, or outside their section's week, have no cell and are left out.
+        day_index = _index(DAYS)
+        cells = [(self.section_row[section_id], day_index[day], period - 1,
+                  EMPTY if subject_id is None else subject_id, EMPTY if teacher_id is None else teacher_id)
+                 for section_id, day, period, subject_id, teacher_id in entries
+                 if section_id in self.section_row and day in day_index
+                 and 1 <= period <= self.periods_per_day[self.section_row[section_id]]]
+        if cells:
+            rows, days, periods, subjects, teachers = np.array(cells, dtype=np.int32).T
+            self.subjects[rows, days, periods] = subjects
+            self.teachers[rows, days, periods] = teachers
+        self._teacher_view = None
+
+    def cell(self, section_id, day_idx, period_idx):
+        # (subject id, teacher id) of a lesson, or None for a free cell. Indexes are 0-based.
+        row = self.section_row[section_id]
+        subject_id = int(self.subjects[row, day_idx, period_idx])
+        if subject_id == EMPTY: return None
+        return subject_id, int(self.teachers[row, day_idx, period_idx])
+
+    def _teacher_major(self):
+        if self._teacher_view is None:
+            shape = (len(self.teacher_ids), len(DAYS), self.num_periods)
+            sections = np.full(shape, EMPTY, dtype=np.int32)
+            subjects = np.full(shape, EMPTY, dtype=np.int32)
+            lessons = np.zeros(shape, dtype=np.int32)
+            rows, days, periods = np.nonzero(self.teachers != EMPTY)
+            teacher_ids = self.teachers[rows, days, periods]
+            lookup = _lookup(self.teacher_ids.tolist())
+            known = teacher_ids < len(lookup)
+            teacher_rows = np.where(known, lookup[np.where(known, teacher_ids, 0)], EMPTY)
+            keep = teacher_rows != EMPTY
+            rows, days, periods, teacher_rows = rows[keep], days[keep], periods[keep], teacher_rows[keep]
+            sections[teacher_rows, days, periods] = self.section_ids[rows]
+            subjects[teacher_rows, days, periods] = self.subjects[rows, days, periods]
+            np.add.at(lessons, (teacher_rows, days, periods), 1)
+            self._teacher_view = sections, subjects, lessons
+        return self._teacher_view
+
+    @property
+    def teacher_sections(self):
+        # One of the sections each teacher teaches per [teacher, day, period]; see teacher_lessons.
+        return self._teacher_major()[0]
+
+    @property
+    def teacher_subjects(self):
+        return self._teacher_major()[1]
+
+    @property
+    def teacher_lessons(self):
+        # Lessons per [teacher, day, period]. A teacher of a concurrent set teaches several sections at once.
+        return self._teacher_major()[2]
+
+    def lessons_at(self, teacher_ids, day_idx, period_idx):
+        # (section id, subject id) of every lesson these teacher records give in one period.
+        rows = np.nonzero(np.isin(self.teachers[:, day_idx, period_idx], list(teacher_ids)))[0]
+        return [(int(self.section_ids[row]), int(self.subjects[row, day_idx, period_idx])) for row in rows]
+
+    def lessons_of(self, teacher_ids):
+        # (day index, period index, section id, subject id) of every lesson of these teacher records, in day
+        # and period order.
+        rows, days, periods = np.nonzero(np.isin(self.teachers, list(teacher_ids)))
+        return [(int(days[i]), int(periods[i]), int(self.section_ids[rows[i]]),
+                 int(self.subjects[rows[i], days[i], periods[i]])) for i in np.lexsort((rows, periods, days))]
+
+    def combined(self, teacher_ids):
+        # [day, period] arrays of a section id, subject id and lesson count across several teacher records,
+        # e.g. all of one person's. Where there is more than one lesson, lessons_at lists them all.
+        rows = [self.teacher_row[t] for t in teacher_ids if t in self.teacher_row]
+        if not rows:
+            free = np.full((len(DAYS), self.num_periods), EMPTY, dtype=np.int32)
+            return free, free.copy(), np.zeros_like(free)
+        sections, subjects, lessons = (view[rows] for view in self._teacher_major())
+        first = (sections != EMPTY).argmax(axis=0)[np.newaxis]
+        return (np.take_along_axis(sections, first, axis=0)[0], np.take_along_axis(subjects, first, axis=0)[0],
+                lessons.sum(axis=0))
+
+    def clashes(self, groups, concurrent_sets=()):
+        # groups: {key: teacher ids that share one timeline, e.g. a person's}; concurrent_sets: the (section
+        # ids, subject ids) of each set, whose lessons are held together and may share a teacher. Returns the
+        # (key, day name, period) of every cell in which a group has lessons that no one set holds together.
+        # Periods only line up between sections with the same number of periods per day (as in the solver's
+        # slots), so lessons are compared within those.
+        keys = list(groups)
+        group_of = np.full(len(self.teacher_ids), EMPTY, dtype=np.int32)
+        for i, key in enumerate(keys):
+            group_of[[self.teacher_row[t] for t in groups[key] if t in self.teacher_row]] = i
+        counts = np.zeros((len(keys), len(DAYS), self.num_periods), dtype=np.int32)
+        grouped = group_of != EMPTY
+        np.add.at(counts, group_of[grouped], self.teacher_lessons[grouped])
+        sets_of = defaultdict(set)
+        for i, (section_ids, subject_ids) in enumerate(concurrent_sets):
+            for pair in product(section_ids, subject_ids):
+                sets_of[pair].add(i)
+        clashes = []
+        for g, d, p in zip(*np.nonzero(counts > 1)):
+            by_length = defaultdict(list)
+            for lesson in self.lessons_at(groups[keys[g]], d, p):
+                by_length[int(self.periods_per_day[self.section_row[lesson[0]]])].append(lesson)
+            if any(len(lessons) > 1 and not set.intersection(*(sets_of[lesson] for lesson in lessons))
+                   for lessons in by_length.values()):
+                clashes.append((keys[g], DAYS[d], int(p) + 1))
+        return clashes
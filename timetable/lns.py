@@ -0,0 +1,204 @@
+# timetable/lns.py
+import random
+import re
+import time
+from collections import defaultdict
+
+from ortools.sat.python import cp_model
+
+
+class LargeNeighbourhoodSearch:
+    """Anytime improvement of a feasible timetable.
+
+    Each iteration frees one neighbourhood (every lesson on one day, the classes of one human teacher, or one
+    grade), pins every other lesson to its current slot and lets CP-SAT minimise teacher idle gaps and same-day
+    repeats of a subject inside it. A move is kept only if the penalty of the whole timetable goes down.
+    """
+
+    NEIGHBOURHOODS = ("day", "teacher", "grade")
+    GAP_WEIGHT = 1  # per idle period between a teacher's first and last lesson of a day
+    SPREAD_WEIGHT = 1  # per extra period of a subject on a day that already has one
+    MAX_FREE_LESSONS = 120  # larger neighbourhoods rarely improve within one iteration
+
+    def __init__(self, timetable_solver, time_budget, iteration_time=2.0):
+        self.parent = timetable_solver
+        self.time_budget = time_budget
+        self.iteration_time = iteration_time
+        self.rng = random.Random(timetable_solver.config.random_seed)
+        # One (iteration, neighbourhood, penalty before, penalty after, seconds) tuple per iteration.
+        self.history = []
+
+    def _human(self, teacher_id):
+        return self.parent.person_of[teacher_id]
+
+    def _grade(self, section_id):
+        name = self.parent.all_sections[section_id].name
+        match = re.match(r'\d+', name)
+        return match.group() if match else name.split('-')[0]
+
+    def _day_and_period(self, key, slot):
+        return divmod(slot, self.parent.all_sections[key[0]].periods_per_day)
+
+    def penalty(self, slots):
+        # slots maps every lesson key (section, subject, teacher, copy) to its slot. Returns (idle gaps, repeats).
+        busy = defaultdict(set)
+        per_day = defaultdict(int)
+        for key, slot in slots.items():
+            day, period = self._day_and_period(key, slot)
+            busy[(self._human(key[2]), day)].add(period)
+            per_day[(key[0], key[1], day)] += 1
+        gaps = sum(max(periods) - min(periods) + 1 - len(periods) for periods in busy.values())
+        repeats = sum(count - 1 for count in per_day.values() if count > 1)
+        return gaps, repeats
+
+    def score(self, gaps, repeats):
+        return self.GAP_WEIGHT * gaps + self.SPREAD_WEIGHT * repeats
+
+    def improve(self, slots):
+        start_time = time.time()
+        gaps, repeats = self.penalty(slots)
+        best = self.score(gaps, repeats)
+        print(f"Step 4: Improving for up to {self.time_budget:.0f}s. Penalty {best} "
+              f"({gaps} teacher idle gaps, {repeats} same-day subject repeats).")
+        iteration = 0
+        while best > 0 and not self.parent._stop_requested:
+            remaining = self.time_budget - (time.time() - start_time)
+            if remaining < 0.1: break
+            kind = self.NEIGHBOURHOODS[iteration % len(self.NEIGHBOURHOODS)]
+            iteration += 1
+            label, free = self._pick_neighbourhood(kind, slots)
+            iteration_start = time.time()
+            candidate = self._reoptimise(slots, free, min(self.iteration_time, remaining))
+            score = self.score(*self.penalty(candidate)) if candidate is not None else best
+            self.history.append((iteration, f"{kind} {label}", best, min(score, best), time.time() - iteration_start))
+            if score < best:
+                print(f"   LNS {iteration} [{kind} {label}, {len(free)} lessons]: penalty {best} -> {score}")
+                slots, best = candidate, score
+                if self.parent.on_solution:
+                    self.parent.on_solution(self.parent._solution_from_slots(slots), iteration, best, 0.0,
+                                            time.time() - start_time)
+            else:
+                print(f"   LNS {iteration} [{kind} {label}, {len(free)} lessons]: no improvement")
+        gaps, repeats = self.penalty(slots)
+        print(f"Step 4: {iteration} iterations in {time.time() - start_time:.2f}s. Penalty {best} "
+              f"({gaps} teacher idle gaps, {repeats} same-day subject repeats).")
+        return slots
+
+    def _pick_neighbourhood(self, kind, slots):
+        if kind == "day":
+            day_idx = self.rng.randrange(len(self.parent.DAYS))
+            return self.parent.DAYS[day_idx], {key for key, slot in slots.items()
+                                               if self._day_and_period(key, slot)[0] == day_idx}
+        if kind == "teacher":
+            # A teacher's lessons can only move if their classes' other lessons can make room.
+            person_id = self.rng.choice(sorted({self._human(key[2]) for key in slots}))
+            sections = {key[0] for key in slots if self._human(key[2]) == person_id}
+            free = {key for key in slots if key[0] in sections}
+            return self.parent.person_names[person_id], self._limit_days(free, slots)
+        grade = self.rng.choice(sorted({self._grade(key[0]) for key in slots}))
+        return grade, self._limit_days({key for key in slots if self._grade(key[0]) == grade}, slots)
+
+    def _limit_days(self, free, slots):
+        # Keeps the lessons of randomly chosen days until the neighbourhood would exceed MAX_FREE_LESSONS.
+        days = list(range(len(self.parent.DAYS)))
+        self.rng.shuffle(days)
+        kept = set()
+        for day_idx in days:
+            lessons = {key for key in free if self._day_and_period(key, slots[key])[0] == day_idx}
+            if kept and len(kept) + len(lessons) > self.MAX_FREE_LESSONS: break
+            kept |= lessons
+        return kept
+
+    def _reoptimise(self, slots, free, time_limit):
+        # A fresh model with the same lesson keys; glued lessons share a variable, so freeing one frees its group.
+        sub = type(self.parent)(self.parent.session, self.parent.config, section_ids=self.parent.section_ids)
+        sub._define_variables_and_constraints()
+        free_vars = {sub.class_periods[key].Index() for key in free}
+        free = {key for key, start_var in sub.class_periods.items() if start_var.Index() in free_vars}
+        seen = set()
+        for key, start_var in sub.class_periods.items():
+            if start_var.Index() in seen: continue
+            seen.add(start_var.Index())
+            if start_var.Index() in free_vars:
+                sub.model.AddHint(start_var, slots[key])
+            else:
+                sub.model.Add(start_var == slots[key])
+
+        # Only the teachers and subjects inside the neighbourhood can change their part of the penalty.
+        humans = {self._human(key[2]) for key in free}
+        pairs = {key[:2] for key in free}
+        gap_terms = self._gap_terms(sub, slots, humans, free_vars)
+        spread_terms = []
+        for (sec_id, sub_id), start_vars in sub.subject_class_vars.items():
+            if (sec_id, sub_id) not in pairs: continue
+            periods_per_day = sub.all_sections[sec_id].periods_per_day
+            for day_idx in range(len(sub.DAYS)):
+                lits = [sub._day_literal(var, day_idx, periods_per_day) for var in start_vars]
+                excess = sub.model.NewIntVar(0, len(lits), f'repeats_{sec_id}_{sub_id}_{day_idx}')
+                sub.model.Add(excess >= sum(lits) - 1)
+                spread_terms.append(excess)
+        sub.model.Minimize(self.GAP_WEIGHT * sum(gap_terms) + self.SPREAD_WEIGHT * sum(spread_terms))
+
+        solver = self.parent.config.apply(cp_model.CpSolver())
+        solver.parameters.max_time_in_seconds = time_limit
+        solver.parameters.log_search_progress = False
+        self.parent._cp_solver = solver
+        status = solver.Solve(sub.model)
+        self.parent._cp_solver = None
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None
+        return {key: solver.Value(start_var) for key, start_var in sub.class_periods.items()}
+
+    def _gap_terms(self, sub, slots, humans, free_vars):
+        # Occupancy of every (day, period) of a teacher is a constant for pinned lessons and an OR of
+        # "starts at this slot" literals for free ones. An idle period is a free period with a busy one
+        # both before and after it on the same day.
+        slot_literals = {}
+        occupancy = defaultdict(lambda: defaultdict(list))
+        periods = defaultdict(int)
+        for key, start_var in sub.class_periods.items():
+            person_id = self._human(key[2])
+            if person_id not in humans: continue
+            periods_per_day = sub.all_sections[key[0]].periods_per_day
+            periods[person_id] = max(periods[person_id], periods_per_day)
+            if start_var.Index() not in free_vars:
+                occupancy[person_id][self._day_and_period(key, slots[key])] = True
+                continue
+            if start_var.Index() not in slot_literals:
+                # Slots past a glued group's shared domain simply get literals that are always false.
+                lits = [sub.model.NewBoolVar(f'at_{start_var.Name()}_{slot}')
+                        for slot in range(len(sub.DAYS) * periods_per_day)]
+                sub.model.AddMapDomain(start_var, lits)
+                slot_literals[start_var.Index()] = lits
+            for slot, lit in enumerate(slot_literals[start_var.Index()]):
+                cell = occupancy[person_id][self._day_and_period(key, slot)]
+                if cell is not True: cell.append(lit)
+
+        terms = []
+        for person_id, cells in occupancy.items():
+            for day_idx in range(len(sub.DAYS)):
+                row = [self._any(sub.model, cells.get((day_idx, period), [])) for period in range(periods[person_id])]
+                before = [False]
+                for busy in row[:-1]:
+                    before.append(self._any(sub.model, [before[-1], busy]))
+                after = [False]
+                for busy in reversed(row[1:]):
+                    after.append(self._any(sub.model, [after[-1], busy]))
+                after.reverse()
+                for busy, earlier, later in zip(row, before, after):
+                    if busy is True or earlier is False or later is False: continue
+                    idle = sub.model.NewBoolVar(f'idle_{person_id}_{day_idx}_{len(terms)}')
+                    sub.model.Add(idle >= earlier + later - busy - 1)
+                    terms.append(idle)
+        return terms
+
+    @staticmethod
+    def _any(model, items):
+        # OR of literals and the constants True/False, folding the constants away.
+        if items is True or any(item is True for item in items): return True
+        lits = [item for item in items if item is not False]
+        if not lits: return False
+        if len(lits) == 1: return lits[0]
+        lit = model.NewBoolVar('')
+        model.AddMaxEquality(lit, lits)
+        return lit
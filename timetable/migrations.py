@@ -0,0 +1,102 @@
+# timetable/migrations.py
+# Versioned, in-place schema upgrades for existing databases. The schema version is SQLite's user_version.
+# create_all builds missing tables (with their current columns and indexes) before the migrations run, so
+# every step checks what is already there and is safe on new and old files alike.
+from sqlalchemy import inspect, text
+
+
+def _columns(conn, table):
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table, column, ddl):
+    if column not in _columns(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _add_people(conn):
+    _add_column(conn, 'teachers', 'person_id', "INTEGER REFERENCES people(id)")
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_teachers_person_id ON teachers (person_id)"))
+
+
+def _add_cells_changed(conn):
+    _add_column(conn, 'solver_runs', 'cells_changed', "INTEGER")
+
+
+# Covering indexes for the hot lookups; the same indexes are declared on the models for new databases.
+COVERING_INDEXES = {
+    # A teacher's (or person's) timetable: grids, PDF exports and the server.
+    'ix_schedule_entries_teacher': "schedule_entries (teacher_id, day, period, class_section_id, subject_id)",
+    # A teacher's assignments: the assignment dialog.
+    'ix_teacher_assignments_teacher': "teacher_assignments (teacher_id, class_section_id, subject_id)",
+    # One section's requirement for a subject: the requirements dialog.
+    'ix_subject_requirements_section_subject':
+        "subject_requirements (class_section_id, subject_id, periods_per_week)",
+}
+
+
+def _add_covering_indexes(conn):
+    for name, target in COVERING_INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+
+
+def _keep_version_cells(conn):
+    # Version cells used to cascade from their section, subject and teacher, so deleting one of those silently
+    # changed every stored version. SQLite cannot drop a foreign key, so the table is rebuilt without them.
+    if 'schedule_version_cells' not in inspect(conn).get_table_names(): return
+    referred = {fk['referred_table'] for fk in inspect(conn).get_foreign_keys('schedule_version_cells')}
+    if referred <= {'schedule_versions'}: return
+    conn.execute(text("ALTER TABLE schedule_version_cells RENAME TO schedule_version_cells_old"))
+    conn.execute(text(
+        "CREATE TABLE schedule_version_cells ("
+        "version_id INTEGER NOT NULL REFERENCES schedule_versions (id) ON DELETE CASCADE, "
+        "class_section_id INTEGER NOT NULL, day VARCHAR NOT NULL, period INTEGER NOT NULL, "
+        "subject_id INTEGER, teacher_id INTEGER, PRIMARY KEY (version_id, class_section_id, day, period))"))
+    conn.execute(text("INSERT INTO schedule_version_cells SELECT version_id, class_section_id, day, period, "
+                      "subject_id, teacher_id FROM schedule_version_cells_old"))
+    conn.execute(text("DROP TABLE schedule_version_cells_old"))
+
+
+# (version, description, step). Append new steps at the end; never renumber or edit released ones.
+MIGRATIONS = [
+    (1, "Add teachers.person_id", _add_people),
+    (2, "Add solver_runs.cells_changed", _add_cells_changed),
+    (3, "Add covering indexes for teacher, assignment and requirement lookups", _add_covering_indexes),
+    (4, "Keep timetable version cells when their section, subject or teacher is deleted", _keep_version_cells),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def stamp(engine, version=SCHEMA_VERSION):
+    # For databases created from the current models, which already have everything the migrations add.
+    with engine.begin() as conn:
+        conn.execute(text(f"PRAGMA user_version = {version}"))
+
+
+def migrate(engine):
+    # Runs the steps newer than the database's version, each in its own transaction. Returns their versions.
+    applied = []
+    for version, description, step in MIGRATIONS:
+        with engine.begin() as conn:
+            if schema_version(conn) >= version: continue
+            print(f"Upgrading database schema to version {version}: {description}")
+            step(conn)
+            conn.execute(text(f"PRAGMA user_version = {version}"))
+        applied.append(version)
+    return applied
+
+
+def check_schema(engine):
+    # For processes that only read, e.g. the teacher API server: upgrades are left to the GUI and the CLI, so a
+    # reader never takes the write lock for DDL. Raises RuntimeError for a database that needs upgrading.
+    with engine.connect() as conn:
+        version = schema_version(conn)
+    if version < SCHEMA_VERSION:
+        database = engine.url.database
+        raise RuntimeError(f"{database} has schema version {version}, but this program needs version "
+                           f"{SCHEMA_VERSION}. Open it once in the GUI or run "
+                           f"'python -m timetable versions --db {database}' to upgrade it.")
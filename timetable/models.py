@@ -0,0 +1,236 @@
+# timetable/models.py
+import datetime
+
+from sqlalchemy import (inspect, Column, Integer, String, ForeignKey, Table, UniqueConstraint, Index, Boolean,
+                        DateTime, Float, Text)
+from sqlalchemy.orm import relationship, declarative_base, sessionmaker
+
+from timetable.database import create_db_engine
+from timetable.migrations import migrate, stamp
+
+Base = declarative_base()
+
+
+class Person(Base):
+    # The human behind one or more Teacher records: "Suman Sharma" and "Suman Sharma (2)" are separate
+    # teachers (each with their own subjects) but one person, who can only be in one class at a time.
+    __tablename__ = 'people'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    teachers = relationship("Teacher", back_populates="person")
+
+
+class Teacher(Base):
+    __tablename__ = 'teachers'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    person_id = Column(Integer, ForeignKey('people.id'), index=True)
+    person = relationship("Person", back_populates="teachers")
+    assignments = relationship("TeacherAssignment", back_populates="teacher", cascade="all, delete-orphan")
+    schedule_entries = relationship("ScheduleEntry", back_populates="teacher", cascade="all, delete")
+    class_teacher_of_section = relationship("ClassSection", back_populates="class_teacher", uselist=False)
+
+
+class Subject(Base):
+    __tablename__ = 'subjects'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    color = Column(String, default="#E0E0E0")
+    assignments = relationship("TeacherAssignment", back_populates="subject", cascade="all, delete-orphan")
+    requirements = relationship("SubjectRequirement", back_populates="subject", cascade="all, delete-orphan")
+    schedule_entries = relationship("ScheduleEntry", back_populates="subject", cascade="all, delete")
+
+
+class ClassSection(Base):
+    __tablename__ = 'class_sections'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+    # This is the new column
+    display_name = Column(String)
+
+    periods_per_day = Column(Integer, default=8)
+    assignments = relationship("TeacherAssignment", back_populates="class_section", cascade="all, delete-orphan")
+    schedule_entries = relationship("ScheduleEntry", back_populates="class_section", cascade="all, delete-orphan")
+    requirements = relationship("SubjectRequirement", back_populates="class_section", cascade="all, delete-orphan")
+    class_teacher_id = Column(Integer, ForeignKey('teachers.id'), unique=True, nullable=True)
+    class_teacher = relationship("Teacher", back_populates="class_teacher_of_section")
+
+class TeacherAssignment(Base):
+    __tablename__ = 'teacher_assignments'
+    id = Column(Integer, primary_key=True)
+    teacher_id = Column(Integer, ForeignKey('teachers.id'), nullable=False)
+    subject_id = Column(Integer, ForeignKey('subjects.id'), nullable=False)
+    class_section_id = Column(Integer, ForeignKey('class_sections.id'), nullable=False)
+    teacher = relationship("Teacher", back_populates="assignments")
+    subject = relationship("Subject", back_populates="assignments")
+    class_section = relationship("ClassSection", back_populates="assignments")
+    __table_args__ = (
+        UniqueConstraint('subject_id', 'class_section_id', name='_subject_class_teacher_uc'),
+        Index('ix_teacher_assignments_teacher', 'teacher_id', 'class_section_id', 'subject_id'),
+    )
+
+
+class ScheduleEntry(Base):
+    __tablename__ = 'schedule_entries'
+    id = Column(Integer, primary_key=True)
+    class_section_id = Column(Integer, ForeignKey('class_sections.id', ondelete="CASCADE"), nullable=False)
+    day = Column(String, nullable=False)
+    period = Column(Integer, nullable=False)
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete="CASCADE"))
+    teacher_id = Column(Integer, ForeignKey('teachers.id', ondelete="CASCADE"))
+    class_section = relationship("ClassSection", back_populates="schedule_entries")
+    subject = relationship("Subject", back_populates="schedule_entries")
+    teacher = relationship("Teacher", back_populates="schedule_entries")
+    __table_args__ = (
+        UniqueConstraint('class_section_id', 'day', 'period', name='_class_day_period_uc'),
+        Index('ix_schedule_entries_teacher', 'teacher_id', 'day', 'period', 'class_section_id', 'subject_id'),
+    )
+
+
+class SubjectRequirement(Base):
+    __tablename__ = 'subject_requirements'
+    id = Column(Integer, primary_key=True)
+    class_section_id = Column(Integer, ForeignKey('class_sections.id', ondelete="CASCADE"), nullable=False)
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete="CASCADE"), nullable=False)
+    periods_per_week = Column(Integer, nullable=False)
+    class_section = relationship("ClassSection", back_populates="requirements")
+    subject = relationship("Subject", back_populates="requirements")
+    __table_args__ = (
+        Index('ix_subject_requirements_section_subject', 'class_section_id', 'subject_id', 'periods_per_week'),
+    )
+
+
+concurrent_set_section = Table('concurrent_set_section', Base.metadata,
+                               Column('set_id', Integer, ForeignKey('concurrent_sets.id', ondelete="CASCADE")),
+                               Column('section_id', Integer, ForeignKey('class_sections.id', ondelete="CASCADE")))
+concurrent_set_subject = Table('concurrent_set_subject', Base.metadata,
+                               Column('set_id', Integer, ForeignKey('concurrent_sets.id', ondelete="CASCADE")),
+                               Column('subject_id', Integer, ForeignKey('subjects.id', ondelete="CASCADE")))
+
+
+class ConcurrentSet(Base):
+    __tablename__ = 'concurrent_sets'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    color = Column(String, default="#FFCCCB")
+    sections = relationship("ClassSection", secondary=concurrent_set_section)
+    subjects = relationship("Subject", secondary=concurrent_set_subject)
+
+
+class User(Base):
+    __tablename__ = 'users'
+    id = Column(Integer, primary_key=True)
+    username = Column(String, unique=True, nullable=False)
+    password = Column(String, nullable=False)  # In a real app, this would be hashed!
+    teacher_id = Column(Integer, ForeignKey('teachers.id'), unique=True, nullable=False)
+
+    teacher = relationship("Teacher")
+
+
+class SolverRun(Base):
+    # One row per TimetableSolver.solve() call, so solve times can be compared as the school grows.
+    __tablename__ = 'solver_runs'
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.datetime.now, nullable=False)
+    fingerprint = Column(String(64))
+    status = Column(String, nullable=False)  # SOLVED, FAILED, STOPPED or CACHED
+    cp_status = Column(String)  # CP-SAT's status; empty for cached and decomposed runs
+    num_sections = Column(Integer)
+    num_lessons = Column(Integer)
+    num_variables = Column(Integer)
+    num_constraints = Column(Integer)
+    # Wall time per phase, in seconds
+    load_seconds = Column(Float)
+    diagnostics_seconds = Column(Float)
+    build_seconds = Column(Float)
+    solve_seconds = Column(Float)
+    improve_seconds = Column(Float)
+    extract_seconds = Column(Float)
+    persist_seconds = Column(Float)
+    total_seconds = Column(Float)
+    cells_changed = Column(Integer)  # timetable cells inserted, updated or deleted when the solution was saved
+    # CP-SAT response statistics
+    presolve_seconds = Column(Float)
+    num_conflicts = Column(Integer)
+    num_branches = Column(Integer)
+    config = Column(Text)  # JSON of the SolverConfig plus warm_start/repair
+
+
+class ScheduleVersion(Base):
+    # Every saved timetable. schedule_entries holds the active version, which the grids, exports and the
+    # server read; see timetable/versions.py.
+    __tablename__ = 'schedule_versions'
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.datetime.now, nullable=False)
+    parent_id = Column(Integer, ForeignKey('schedule_versions.id'))  # the version that was active when it was saved
+    label = Column(String, nullable=False)
+    solver_run_id = Column(Integer, ForeignKey('solver_runs.id'))
+    num_cells = Column(Integer, nullable=False)
+    cells_changed = Column(Integer)  # cells that differ from the parent
+    is_active = Column(Boolean, default=False, nullable=False)
+    cells = relationship("ScheduleVersionCell", cascade="all, delete-orphan")
+
+
+class ScheduleVersionCell(Base):
+    # One lesson of a version; the same shape as a ScheduleEntry.
+    __tablename__ = 'schedule_version_cells'
+    version_id = Column(Integer, ForeignKey('schedule_versions.id', ondelete="CASCADE"), primary_key=True)
+    # Plain ids rather than foreign keys: deleting a section, subject or teacher leaves stored versions whole.
+    # activate_version skips the lessons whose section, subject or teacher no longer exists.
+    class_section_id = Column(Integer, primary_key=True)
+    day = Column(String, primary_key=True)
+    period = Column(Integer, primary_key=True)
+    subject_id = Column(Integer)
+    teacher_id = Column(Integer)
+
+
+def person_name(teacher_name):
+    # Naming convention for extra identities of one person: "Suman Sharma (2)" belongs to "Suman Sharma".
+    return teacher_name.split(' (')[0]
+
+
+def link_teachers_to_people(session):
+    # Gives every teacher without a person the person named by person_name(), creating it if needed.
+    # Returns the number of teachers linked; the caller commits.
+    people = {p.name: p for p in session.query(Person).all()}
+    unlinked = session.query(Teacher).filter(Teacher.person_id.is_(None)).all()
+    for teacher in unlinked:
+        name = person_name(teacher.name)
+        if name not in people:
+            people[name] = Person(name=name)
+            session.add(people[name])
+        teacher.person = people[name]
+    return len(unlinked)
+
+
+def upgrade_database(engine):
+    # create_all adds missing tables but not columns or indexes, so older databases are brought up to date by
+    # timetable/migrations.py, and teachers from before the people table are linked by name once.
+    is_new = not inspect(engine).get_table_names()
+    Base.metadata.create_all(engine)
+    if is_new:
+        stamp(engine)
+    else:
+        migrate(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        if link_teachers_to_people(session): session.commit()
+    finally:
+        session.close()
+
+
+def setup_database(db_path):
+    engine = create_db_engine(db_path)
+    upgrade_database(engine)
+    return engine
+
+
+def seed_database_if_empty(session):
+    # Only select the ID column so it doesn't crash if display_name is missing initially
+    if not session.query(ClassSection.id).first():
+        print("Database is empty. Seeding...")
+        default_sections = ["9th-A", "9th-B", "9th-C", "9th-D", "10th-A", "10th-B", "10th-C", "10th-D"]
+        for sec_name in default_sections:
+            session.add(ClassSection(name=sec_name, display_name=sec_name, periods_per_day=8))
+        session.commit()
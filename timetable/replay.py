@@ -0,0 +1,127 @@
+# timetable/replay.py
+# Re-solves a corpus of saved models and school databases and reports how long each took, e.g.:
+#   python -m timetable replay solver_models/ timetable_v5.db --workers 1 8 --formulation default no-symmetry
+import csv
+import itertools
+import os
+import sqlite3
+import tempfile
+import time
+from dataclasses import replace
+
+from ortools.sat.python import cp_model
+
+from timetable.corpus import MODEL_SUFFIX, find_instances, load_model
+from timetable.database import create_db_engine, session_factory
+from timetable.models import upgrade_database
+from timetable.solver import TimetableSolver
+from timetable.telemetry import SearchLogMonitor
+
+
+def _build_default(solver):
+    solver._define_variables_and_constraints()
+
+
+def _build_without_symmetry_breaking(solver):
+    solver._define_variables_and_constraints(break_symmetry=False)
+
+
+def _build_per_lesson(solver):
+    # The explanation model with every assumption enforced: one variable per lesson, glued lessons tied by
+    # equalities and optional intervals instead of shared ones.
+    for lit in solver._define_variables_and_constraints(explain=True).values():
+        solver.model.Add(lit == 1)
+
+
+# Ways of building the model from a database. Saved models are replayed as they were built ("saved").
+FORMULATIONS = {
+    "default": _build_default,
+    "no-symmetry": _build_without_symmetry_breaking,
+    "per-lesson": _build_per_lesson,
+}
+
+COLUMNS = ["instance", "formulation", "workers", "seed", "linearization", "status", "variables", "constraints",
+           "build_s", "presolve_s", "solve_s", "conflicts", "branches"]
+
+
+def config_grid(base, workers, seeds, linearization_levels):
+    return [replace(base, num_workers=w, random_seed=seed, linearization_level=level)
+            for w, seed, level in itertools.product(workers, seeds, linearization_levels)]
+
+
+def _solve(model, config):
+    solver = config.apply(cp_model.CpSolver())
+    monitor = SearchLogMonitor().attach(solver)
+    start = time.time()
+    status = solver.Solve(model)
+    proto = model.Proto()
+    return {"workers": config.num_workers, "seed": config.random_seed, "linearization": config.linearization_level,
+            "status": solver.StatusName(status), "variables": len(proto.variables),
+            "constraints": len(proto.constraints), "presolve_s": monitor.presolve_seconds,
+            "solve_s": time.time() - start, "conflicts": solver.NumConflicts(), "branches": solver.NumBranches()}
+
+
+def _scratch_copy(db_path, directory):
+    # A copy of a saved database to upgrade and solve, so replaying never changes the saved case. The case is
+    # opened read-only and copied with SQLite's backup API, which also picks up anything still in its WAL.
+    copy_path = os.path.join(directory, os.path.basename(db_path))
+    source = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    target = sqlite3.connect(copy_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    return copy_path
+
+
+def replay(paths, configs, formulations):
+    # Yields one result row per instance, formulation and config.
+    for path in find_instances(paths):
+        name = os.path.basename(path)
+        if path.endswith(MODEL_SUFFIX):
+            start = time.time()
+            model = load_model(path)
+            build = time.time() - start
+            for config in configs:
+                yield dict(_solve(model, config), instance=name, formulation="saved", build_s=build)
+            continue
+
+        with tempfile.TemporaryDirectory(prefix="timetable-replay-") as scratch:
+            engine = create_db_engine(_scratch_copy(path, scratch))
+            upgrade_database(engine)
+            session = session_factory(engine)()
+            try:
+                for formulation in formulations:
+                    start = time.time()
+                    solver = TimetableSolver(session, configs[0])
+                    FORMULATIONS[formulation](solver)
+                    build = time.time() - start
+                    for config in configs:
+                        yield dict(_solve(solver.model, config), instance=name, formulation=formulation,
+                                   build_s=build)
+            finally:
+                session.close()
+                engine.dispose()
+
+
+def format_cell(value):
+    if value is None: return "-"
+    if isinstance(value, float): return f"{value:.2f}"
+    return str(value)
+
+
+def format_table(rows, columns=COLUMNS):
+    cells = [columns] + [[format_cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in cells]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def write_csv(rows, path, columns=COLUMNS):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({column: row.get(column) for column in columns})
@@ -0,0 +1,144 @@
+# timetable/snapshot.py
+# A read-only copy of the scheduling data, loaded with one query per table, with the saved timetable as a
+# ScheduleGrid (see timetable/grid.py). The solver, its diagnostics, the GUI's lists, grids and PDF exports all
+# read from it instead of querying (and lazily loading) the ORM objects one by one. get_snapshot() keeps one
+# per database; any commit or rollback through a session on that database drops it, so the next reader loads
+# a fresh one.
+import threading
+import weakref
+from collections import defaultdict, namedtuple
+from types import MappingProxyType
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from timetable.grid import ScheduleGrid
+from timetable.models import (ClassSection, ConcurrentSet, Person, ScheduleEntry, Subject, SubjectRequirement,
+                              Teacher, TeacherAssignment, concurrent_set_section, concurrent_set_subject)
+
+SectionRow = namedtuple("SectionRow", "id name display_name periods_per_day class_teacher_id")
+SubjectRow = namedtuple("SubjectRow", "id name color")
+TeacherRow = namedtuple("TeacherRow", "id name person_id")
+PersonRow = namedtuple("PersonRow", "id name")
+RequirementRow = namedtuple("RequirementRow", "class_section_id subject_id periods_per_week")
+ConcurrentSetRow = namedtuple("ConcurrentSetRow", "id name color section_ids subject_ids")
+EntryRow = namedtuple("EntryRow", "class_section_id day period subject_id teacher_id")
+
+
+def _by_id(rows):
+    return MappingProxyType({row.id: row for row in rows})
+
+
+def _grouped(pairs):
+    groups = defaultdict(list)
+    for key, value in pairs:
+        groups[key].append(value)
+    return MappingProxyType({key: tuple(values) for key, values in groups.items()})
+
+
+class SchedulingSnapshot:
+    """Sections, subjects, teachers, people, requirements, assignments, concurrent sets and the timetable."""
+
+    def __init__(self, session):
+        def rows(row_type, *columns, order_by=None):
+            statement = select(*columns)
+            if order_by is not None: statement = statement.order_by(order_by)
+            return [row_type(*row) for row in session.execute(statement)]
+
+        # Sorted by name, as every list and combo box shows them.
+        self.sections = _by_id(rows(SectionRow, ClassSection.id, ClassSection.name, ClassSection.display_name,
+                                    ClassSection.periods_per_day, ClassSection.class_teacher_id,
+                                    order_by=ClassSection.name))
+        self.subjects = _by_id(rows(SubjectRow, Subject.id, Subject.name, Subject.color, order_by=Subject.name))
+        self.teachers = _by_id(rows(TeacherRow, Teacher.id, Teacher.name, Teacher.person_id, order_by=Teacher.name))
+        self.people = _by_id(rows(PersonRow, Person.id, Person.name, order_by=Person.name))
+        self.requirements = tuple(rows(RequirementRow, SubjectRequirement.class_section_id,
+                                       SubjectRequirement.subject_id, SubjectRequirement.periods_per_week,
+                                       order_by=SubjectRequirement.id))
+        self.assignments = MappingProxyType({(section_id, subject_id): teacher_id for section_id, subject_id, teacher_id
+                                             in session.execute(select(TeacherAssignment.class_section_id,
+                                                                       TeacherAssignment.subject_id,
+                                                                       TeacherAssignment.teacher_id))})
+        set_sections = _grouped(session.execute(select(concurrent_set_section.c.set_id,
+                                                       concurrent_set_section.c.section_id)))
+        set_subjects = _grouped(session.execute(select(concurrent_set_subject.c.set_id,
+                                                       concurrent_set_subject.c.subject_id)))
+        self.concurrent_sets = tuple(
+            ConcurrentSetRow(set_id, name, color, set_sections.get(set_id, ()), set_subjects.get(set_id, ()))
+            for set_id, name, color in session.execute(select(ConcurrentSet.id, ConcurrentSet.name,
+                                                              ConcurrentSet.color).order_by(ConcurrentSet.id)))
+        self.entries = tuple(rows(EntryRow, ScheduleEntry.class_section_id, ScheduleEntry.day, ScheduleEntry.period,
+                                  ScheduleEntry.subject_id, ScheduleEntry.teacher_id))
+
+        # Derived lookups.
+        self.teachers_of_person = _grouped((t.person_id, t.id) for t in self.teachers.values()
+                                           if t.person_id is not None)
+        # Concurrent set name and colour of each (section, subject); a later set wins where sets overlap.
+        self.set_info = MappingProxyType({(section_id, subject_id): (cset.name, cset.color)
+                                          for cset in self.concurrent_sets for section_id in cset.section_ids
+                                          for subject_id in cset.subject_ids})
+        self.max_periods_per_day = max((s.periods_per_day for s in self.sections.values()), default=8)
+        self._grid = None
+        self._person_clashes = None
+
+    @property
+    def grid(self):
+        # Built on first use: the solver only needs the entries.
+        if self._grid is None:
+            self._grid = ScheduleGrid.from_entries(
+                self.entries, {s.id: s.periods_per_day for s in self.sections.values()}, list(self.teachers))
+        return self._grid
+
+    def person_name(self, teacher_id):
+        teacher = self.teachers[teacher_id]
+        person = self.people.get(teacher.person_id)
+        return person.name if person else teacher.name
+
+    def people_with_teachers(self):
+        # Sorted by name; deleting a teacher can leave its person behind.
+        return [person for person in self.people.values() if person.id in self.teachers_of_person]
+
+    @property
+    def person_clashes(self):
+        # {(person id, day, period)} of every double-booked person in the saved timetable.
+        if self._person_clashes is None:
+            self._person_clashes = frozenset(self.grid.clashes(
+                self.teachers_of_person, [(cset.section_ids, cset.subject_ids) for cset in self.concurrent_sets]))
+        return self._person_clashes
+
+    def section_display_name(self, section_id):
+        section = self.sections[section_id]
+        return section.display_name or section.name
+
+
+# One snapshot per engine, so the GUI, its save thread and in-process solvers share it.
+_snapshots = weakref.WeakKeyDictionary()
+# Invalidations per engine. A snapshot is only cached if none happened while it was loading: a commit on
+# another thread in the meantime may not be in it.
+_generations = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def get_snapshot(session):
+    bind = session.get_bind()
+    with _lock:
+        snapshot = _snapshots.get(bind)
+        generation = _generations.get(bind, 0)
+    if snapshot is None:
+        snapshot = SchedulingSnapshot(session)
+        with _lock:
+            if _generations.get(bind, 0) == generation: _snapshots[bind] = snapshot
+    return snapshot
+
+
+def invalidate_snapshot(bind):
+    with _lock:
+        _generations[bind] = _generations.get(bind, 0) + 1
+        _snapshots.pop(bind, None)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_after_transaction(session):
+    # A rollback can discard flushed changes that a snapshot loaded inside the transaction has seen.
+    invalidate_snapshot(session.get_bind())
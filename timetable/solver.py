@@ -0,0 +1,903 @@
+# timetable/solver.py
+import json
+import os
+import sys
+import time
+import multiprocessing
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from dataclasses import dataclass, asdict, replace
+
+try:
+    from ortools.sat.python import cp_model
+except ImportError:
+    print("Error: The 'ortools' library is required. Please install it using: pip install ortools")
+    sys.exit(1)
+
+from sqlalchemy import bindparam, delete, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from timetable.cache import scheduling_fingerprint
+from timetable.corpus import dump_model, write_metadata
+from timetable.database import create_db_engine
+from timetable.lns import LargeNeighbourhoodSearch
+from timetable.telemetry import SearchLogMonitor, record_persist_time, record_solver_run
+from timetable.models import ScheduleEntry
+from timetable.snapshot import get_snapshot
+
+
+def _default_num_workers():
+    # CP-SAT's portfolio search gets little out of more than 16 workers, but every core up to that helps.
+    return max(1, min(os.cpu_count() or 8, 16))
+
+
+@dataclass
+class SolverConfig:
+    num_workers: int = _default_num_workers()
+    max_time_in_seconds: float = 60.0
+    random_seed: int = 0
+    log_search_progress: bool = False
+    linearization_level: int = 1
+    relative_gap_limit: float = 0.0
+    decompose: bool = True
+    # Seconds of Large Neighbourhood Search after the first feasible timetable; 0 keeps that timetable as is.
+    improve_time_in_seconds: float = 0.0
+
+    def apply(self, solver):
+        solver.parameters.num_workers = self.num_workers
+        solver.parameters.max_time_in_seconds = self.max_time_in_seconds
+        solver.parameters.random_seed = self.random_seed
+        solver.parameters.log_search_progress = self.log_search_progress
+        solver.parameters.linearization_level = self.linearization_level
+        solver.parameters.relative_gap_limit = self.relative_gap_limit
+        return solver
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(num_workers=args.workers, max_time_in_seconds=args.time_limit, random_seed=args.seed,
+                   log_search_progress=args.log_search_progress, linearization_level=args.linearization_level,
+                   relative_gap_limit=args.relative_gap, decompose=not args.no_decompose,
+                   improve_time_in_seconds=args.improve_time)
+
+
+def add_solver_arguments(parser):
+    defaults = SolverConfig()
+    group = parser.add_argument_group("solver")
+    group.add_argument("--workers", type=int, default=defaults.num_workers,
+                       help=f"CP-SAT search workers (default: {defaults.num_workers})")
+    group.add_argument("--time-limit", type=float, default=defaults.max_time_in_seconds,
+                       help="Maximum solve time in seconds")
+    group.add_argument("--seed", type=int, default=defaults.random_seed, help="Random seed for the search")
+    group.add_argument("--log-search-progress", action="store_true", help="Print CP-SAT search progress")
+    group.add_argument("--linearization-level", type=int, choices=[0, 1, 2], default=defaults.linearization_level,
+                       help="CP-SAT linearization level")
+    group.add_argument("--relative-gap", type=float, default=defaults.relative_gap_limit,
+                       help="Stop once the objective is within this relative gap of the bound")
+    group.add_argument("--no-decompose", action="store_true",
+                       help="Solve the whole school as one model instead of independent components in parallel")
+    group.add_argument("--improve-time", type=float, default=defaults.improve_time_in_seconds,
+                       help="Seconds spent reducing teacher idle gaps and same-day subject repeats (0 to skip)")
+    return parser
+
+
+def _max_flow(capacity, source, sink):
+    # Edmonds-Karp on a dict-of-dicts graph. Returns the flow value and the nodes still reachable from the
+    # source in the residual graph, i.e. the source side of a minimum cut (the bottleneck).
+    residual = defaultdict(lambda: defaultdict(int))
+    for u, edges in capacity.items():
+        for v, cap in edges.items():
+            residual[u][v] += cap
+            residual[v][u] += 0
+    flow = 0
+    while True:
+        prev = {source: None}
+        queue = deque([source])
+        while queue and sink not in prev:
+            u = queue.popleft()
+            for v, cap in residual[u].items():
+                if cap > 0 and v not in prev:
+                    prev[v] = u
+                    queue.append(v)
+        if sink not in prev:
+            return flow, set(prev)
+        path, v = [], sink
+        while prev[v] is not None:
+            path.append((prev[v], v))
+            v = prev[v]
+        pushed = min(residual[u][v] for u, v in path)
+        for u, v in path:
+            residual[u][v] -= pushed
+            residual[v][u] += pushed
+        flow += pushed
+
+
+def _solve_component(db_path, section_ids, config, warm_start, repair, stop_event=None, model_dir=None,
+                     progress=None, index=None):
+    # Runs in a worker process, so it opens its own connection instead of sharing the GUI's session. Improving
+    # solutions go to the progress queue, tagged with the component's index.
+    engine = create_db_engine(db_path)
+    session = sessionmaker(bind=engine)()
+    solver = TimetableSolver(session, config, warm_start=warm_start, repair=repair, section_ids=section_ids,
+                             model_dir=model_dir)
+    if progress is not None:
+        solver.on_solution = lambda solution, count, objective, bound, elapsed: progress.put(
+            (index, solution, objective, bound))
+    done = threading.Event()
+
+    def watch_for_stop():
+        while not done.is_set():
+            if stop_event.wait(0.2):
+                solver.stop()
+                return
+
+    if stop_event is not None:
+        threading.Thread(target=watch_for_stop, daemon=True).start()
+    try:
+        return solver.solve()
+    finally:
+        done.set()
+        session.close()
+        engine.dispose()
+
+
+class SolutionStreamer(cp_model.CpSolverSolutionCallback):
+    """Hands every improving solution CP-SAT finds to the TimetableSolver's on_solution callback."""
+
+    def __init__(self, timetable_solver):
+        super().__init__()
+        self.timetable_solver = timetable_solver
+        self.solution_count = 0
+
+    def on_solution_callback(self):
+        self.solution_count += 1
+        self.timetable_solver.on_solution(self.timetable_solver._extract_solution(self), self.solution_count,
+                                          self.ObjectiveValue(), self.BestObjectiveBound(), self.WallTime())
+
+
+class TimetableSolver:
+    DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+    MAX_PER_DAY = 3  # Daily Subject Limit: periods of one subject per section per day
+
+    def __init__(self, session, config=None, warm_start=False, repair=False, section_ids=None, cache=None,
+                 model_dir=None):
+        load_start = time.time()
+        self.session = session
+        self.config = config or SolverConfig()
+        self.warm_start = warm_start
+        self.repair = repair
+        # Optional SolutionCache; a hit on unchanged inputs skips the model build and CP-SAT entirely.
+        self.cache = cache
+        # When set, only lessons of these sections are modelled (one independent component of the school).
+        self.section_ids = set(section_ids) if section_ids is not None else None
+        # When set, every built model is saved there with its metadata for timetable.replay.
+        self.model_dir = model_dir
+        self.fingerprint = None
+        # Optional callable(solution, count, objective, bound, elapsed) for each improving solution.
+        self.on_solution = None
+        self._stop_requested = False
+        self._cp_solver = None
+        self._stop_event = None
+        self._fallback = None
+        self.model = cp_model.CpModel()
+        # Sections, teachers, sets, requirements and assignments come from the shared read-only snapshot, so
+        # the sub-solvers of LNS, decomposition and diagnostics do not reload them.
+        self.snapshot = get_snapshot(self.session)
+        self.all_sections = self.snapshot.sections
+        self.all_teachers = self.snapshot.teachers
+        # Teacher id -> person id; a person's teachers share one timeline. A teacher not yet linked to a person
+        # (see link_teachers_to_people) stands alone under its negated id.
+        self.person_of = {t.id: t.person_id if t.person_id is not None else -t.id for t in self.all_teachers.values()}
+        self.person_names = {p.id: p.name for p in self.snapshot.people.values()}
+        self.person_names.update({-t.id: t.name for t in self.all_teachers.values() if t.person_id is None})
+        self.concurrent_sets = self.snapshot.concurrent_sets
+        self.assignment_map = self.snapshot.assignments
+        self.class_periods = {}
+        self.subject_class_vars = defaultdict(list)
+        self.lesson_copies = defaultdict(list)
+        # Lesson copy -> its glue group (see _build_lesson_groups), set when the model is built.
+        self.root_of = {}
+        self.day_literals = {}
+        # Wall time per phase and CP-SAT statistics of the last solve; written to solver_runs by solve().
+        self.timings = {"load": time.time() - load_start}
+        self.stats = {}
+        self.run_id = None
+
+    def _load_requirements(self):
+        requirements = self.snapshot.requirements
+        if self.section_ids is None: return requirements
+        return [req for req in requirements if req.class_section_id in self.section_ids]
+
+    def solve(self):
+        start_time = time.time()
+        fingerprint = self.fingerprint = scheduling_fingerprint(self.snapshot, self.config)
+        # Repair results depend on the saved timetable, not just the inputs, so they bypass the cache.
+        use_cache = self.cache is not None and self.section_ids is None and not self.repair
+        if use_cache:
+            cached = self.cache.get(fingerprint)
+            if cached is not None:
+                print(f"\n--- Cached timetable {fingerprint[:12]} matches the current data; not solving. ---")
+                self._record_run(fingerprint, "CACHED", cached, start_time)
+                return cached
+
+        solution = self._solve()
+        if use_cache and "errors" not in solution and not self._stop_requested:
+            self.cache.put(fingerprint, solution)
+        status = "STOPPED" if self._stop_requested else "FAILED" if "errors" in solution else "SOLVED"
+        self._record_run(fingerprint, status, solution, start_time)
+        return solution
+
+    def _record_run(self, fingerprint, status, solution, start_time):
+        config = dict(self.config.to_dict(), warm_start=self.warm_start, repair=self.repair)
+        self.run_id = record_solver_run(
+            self.session.get_bind(), fingerprint=fingerprint, status=status, cp_status=self.stats.get("cp_status"),
+            num_sections=len(self.section_ids) if self.section_ids is not None else len(self.all_sections),
+            num_lessons=None if "errors" in solution else len(solution),
+            num_variables=self.stats.get("num_variables"), num_constraints=self.stats.get("num_constraints"),
+            load_seconds=self.timings.get("load"), diagnostics_seconds=self.timings.get("diagnostics"),
+            build_seconds=self.timings.get("build"), solve_seconds=self.timings.get("solve"),
+            improve_seconds=self.timings.get("improve"), extract_seconds=self.timings.get("extract"),
+            total_seconds=self.timings["load"] + time.time() - start_time,
+            presolve_seconds=self.stats.get("presolve_seconds"), num_conflicts=self.stats.get("num_conflicts"),
+            num_branches=self.stats.get("num_branches"), config=json.dumps(config, sort_keys=True))
+
+    def record_persist_time(self, seconds, cells_changed=None):
+        # Saving happens in the caller (GUI or CLI), which reports how long it took once it is done.
+        self.timings["persist"] = seconds
+        record_persist_time(self.session.get_bind(), self.run_id, seconds, cells_changed)
+
+    def _solve(self):
+        print("\n--- Starting Timetable Generation (Diagnostic Mode) ---")
+        start_time = time.time()
+
+        # Run pre-check before even trying to solve
+        errors = self.run_diagnostics()
+        self.timings["diagnostics"] = time.time() - start_time
+        print(f"Step 1: Pre-solve checks took {self.timings['diagnostics'] * 1000:.0f} ms.")
+        if errors:
+            print("Step 1: Found data errors. Aborting.")
+            # We return the errors as a string so the UI can show them
+            return {"errors": errors}
+
+        if self.config.decompose and self.section_ids is None:
+            components = self.find_components()
+            if len(components) > 1:
+                return self._solve_components(components, start_time)
+
+        build_start = time.time()
+        self._define_variables_and_constraints()
+        print(f"Step 2: Model defined. Solving with {self.config.num_workers} workers, "
+              f"{self.config.max_time_in_seconds:.0f}s limit.")
+        # Repair mode always hints the free lessons with their saved slots to keep churn low.
+        if self.warm_start or self.repair:
+            print(f"Step 2b: Warm start, hinted {self._add_schedule_hints()} start variables.")
+        if self.repair:
+            fixed = self._fix_unaffected_lessons()
+            print(f"Step 2c: Repair mode, fixed {fixed} of {len(self.class_periods)} lessons to their current slots.")
+        self.timings["build"] = time.time() - build_start
+        proto = self.model.Proto()
+        self.stats.update(num_variables=len(proto.variables), num_constraints=len(proto.constraints))
+        model_path = dump_model(self, self.model_dir) if self.model_dir else None
+        if model_path: print(f"Step 2d: Saved the model to {model_path}.")
+
+        solver = self.config.apply(cp_model.CpSolver())
+        monitor = SearchLogMonitor().attach(solver)
+        self._cp_solver = solver
+        if self._stop_requested:
+            return {"errors": "Generation was stopped before any timetable was found."}
+        solve_start = time.time()
+        status = solver.Solve(self.model, SolutionStreamer(self) if self.on_solution else None)
+        self._cp_solver = None
+        self.timings["solve"] = time.time() - solve_start
+        self.stats.update(cp_status=solver.StatusName(status), num_conflicts=solver.NumConflicts(),
+                          num_branches=solver.NumBranches(), presolve_seconds=monitor.presolve_seconds)
+        if model_path: write_metadata(model_path, dict(self.stats, solve_seconds=self.timings["solve"]))
+        duration = time.time() - start_time
+
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            stopped = " (stopped early, best so far)" if self._stop_requested else ""
+            print(f"Step 3: Solution found in {duration:.2f}s{stopped}.")
+            slots = {key: solver.Value(start_var) for key, start_var in self.class_periods.items()}
+            # Repair keeps churn low, so it does not reshuffle lessons just to improve the timetable's quality.
+            if self.config.improve_time_in_seconds > 0 and not self.repair and not self._stop_requested:
+                improve_start = time.time()
+                slots = LargeNeighbourhoodSearch(self, self.config.improve_time_in_seconds).improve(slots)
+                self.timings["improve"] = time.time() - improve_start
+            extract_start = time.time()
+            solution = self._solution_from_slots(slots)
+            self.timings["extract"] = time.time() - extract_start
+            return solution
+        elif self._stop_requested:
+            print("Step 3: Stopped before a solution was found.")
+            return {"errors": "Generation was stopped before any timetable was found."}
+        elif self.repair:
+            # Fixing the untouched lessons was too tight; re-solve everything, starting from the saved timetable.
+            print("Step 3: Repair found no solution. Falling back to a full solve.")
+            self._fallback = TimetableSolver(self.session, self.config, warm_start=True, section_ids=self.section_ids,
+                                             model_dir=self.model_dir)
+            self._fallback.on_solution = self.on_solution
+            return self._fallback.solve()
+        else:
+            # If the solver fails, run a deep scan to find out why
+            print("Step 4: No solution. Running Deep Diagnostics...")
+            deep_start = time.time()
+            deep_errors = self.run_diagnostics(deep_scan=True)
+            self.timings["diagnostics"] += time.time() - deep_start
+            return {"errors": deep_errors if deep_errors else "Unknown logic contradiction. Check Concurrent Sets."}
+
+    def stop(self):
+        # Safe to call from another thread: CP-SAT returns the best solution found so far.
+        self._stop_requested = True
+        if self._cp_solver is not None:
+            self._cp_solver.StopSearch()
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._fallback is not None:
+            self._fallback.stop()
+
+    def find_components(self):
+        # Sections are linked when they share a human teacher or a concurrent set; each connected group of
+        # sections can be scheduled without looking at the others.
+        parent = {}
+
+        def find(node):
+            parent.setdefault(node, node)
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        def union(a, b):
+            parent[find(a)] = find(b)
+
+        for req in self._load_requirements():
+            teacher_id = self.assignment_map.get((req.class_section_id, req.subject_id))
+            if not teacher_id: continue
+            union(('section', req.class_section_id), ('human', self.person_of[teacher_id]))
+        for cset in self.concurrent_sets:
+            set_sections = [('section', sec_id) for sec_id in cset.section_ids if ('section', sec_id) in parent]
+            for node in set_sections[1:]:
+                union(node, set_sections[0])
+
+        components = defaultdict(set)
+        for node in list(parent):
+            if node[0] == 'section':
+                components[find(node)].add(node[1])
+        return sorted(components.values(), key=len, reverse=True)
+
+    def _solve_components(self, components, start_time):
+        # Every component records its own solver_runs row; this run only times the components as a whole.
+        solve_start = time.time()
+        # Progress is streamed as one timetable: the latest solution of every component that has one so far.
+        latest, count = {}, 0
+
+        def report(index, solution, objective, bound):
+            nonlocal count
+            count += 1
+            latest[index] = (solution, objective, bound)
+            merged = {}
+            for partial, _, _ in latest.values():
+                merged.update(partial)
+            self.on_solution(merged, count, sum(update[1] for update in latest.values()),
+                             sum(update[2] for update in latest.values()), time.time() - solve_start)
+
+        db_url = self.session.get_bind().url
+        if db_url.database in (None, "", ":memory:"):
+            # A private in-memory database can't be reopened from another process.
+            results = []
+            for index, ids in enumerate(components):
+                sub = TimetableSolver(self.session, self.config, self.warm_start, self.repair, ids,
+                                      model_dir=self.model_dir)
+                if self.on_solution:
+                    sub.on_solution = lambda solution, number, objective, bound, elapsed, index=index: report(
+                        index, solution, objective, bound)
+                results.append(sub.solve())
+        else:
+            workers = min(len(components), self.config.num_workers)
+            sub_config = replace(self.config, num_workers=max(1, self.config.num_workers // workers))
+            print(f"Step 2: Solving {len(components)} independent components on {workers} processes.")
+            # Spawned, not forked: the caller is usually a Qt worker thread.
+            context = multiprocessing.get_context("spawn")
+            with context.Manager() as manager, ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                self._stop_event = manager.Event()
+                if self._stop_requested: self._stop_event.set()
+                progress = manager.Queue() if self.on_solution else None
+                futures = [pool.submit(_solve_component, db_url.database, ids, sub_config, self.warm_start,
+                                       self.repair, self._stop_event, self.model_dir, progress, index)
+                           for index, ids in enumerate(components)]
+                pending = set(futures)
+                while pending:
+                    # A component puts its solutions on the queue before it returns, so the last pass sees them.
+                    _, pending = wait(pending, timeout=0.2)
+                    while progress is not None and not progress.empty():
+                        report(*progress.get())
+                results = [f.result() for f in futures]
+                self._stop_event = None
+        self.timings["solve"] = time.time() - solve_start
+
+        errors = [r["errors"] for r in results if isinstance(r, dict) and "errors" in r]
+        if errors:
+            return {"errors": "\n".join(errors)}
+        solution = {}
+        for partial in results:
+            solution.update(partial)
+        print(f"Step 3: All {len(components)} components solved in {time.time() - start_time:.2f}s.")
+        return solution
+
+    def run_diagnostics(self, deep_scan=False):
+        report = []
+        subject_requirements = self._load_requirements()
+
+        # 1. Check Section Totals
+        section_totals = defaultdict(int)
+        for req in subject_requirements:
+            section_totals[req.class_section_id] += req.periods_per_week
+
+        for sec_id, total in section_totals.items():
+            sec = self.all_sections[sec_id]
+            target = sec.periods_per_day * 5
+            if total > target:
+                report.append(f"❌ SECTION OVERLOAD: {sec.name} has {total} periods, but only {target} slots available.")
+
+        # 2. Matching checks: every human and every section must be able to place all their lessons.
+        lesson_keys, root_of, _, group_slots, _ = self._build_lesson_groups()
+        report.extend(self._check_human_slots(lesson_keys, root_of, group_slots))
+        report.extend(self._check_daily_limits(lesson_keys))
+
+        # 3. Check for "Set Overlaps" (The most common 0.17s failure)
+        for cset in self.concurrent_sets:
+            set_sections = [s for s in cset.section_ids if self.section_ids is None or s in self.section_ids]
+            set_subjects = cset.subject_ids
+
+            # Check if any section is forced to do TWO things at once by ONE set
+            for sec_id in set_sections:
+                subjects_for_sec_in_set = [sub_id for sub_id in set_subjects if (sec_id, sub_id) in self.assignment_map]
+                if len(subjects_for_sec_in_set) > 1:
+                    sub_names = [self.snapshot.subjects[s_id].name for s_id in subjects_for_sec_in_set]
+                    report.append(
+                        f"❌ SET LOGIC ERROR: Set '{cset.name}' forces {self.all_sections[sec_id].name} to attend {sub_names} at the same time. This is impossible.")
+
+        # 4. Deep scan: ask CP-SAT which groups of rules conflict (only worth it once a solve has failed).
+        if deep_scan and not report:
+            report.extend(self.explain_infeasibility())
+
+        return "\n".join(report)
+
+    def _build_lesson_groups(self):
+        # Lessons are indexed by (section, subject) so each concurrent set can look up its members directly.
+        # Copy i of every lesson in a set is glued to copy i of the others; a glued group of lesson copies
+        # is one demand on the timetable, limited to the slots every member's section has.
+        lesson_index = {}
+        for req in self._load_requirements():
+            teacher_id = self.assignment_map.get((req.class_section_id, req.subject_id))
+            if not teacher_id: continue
+            _, count = lesson_index.get((req.class_section_id, req.subject_id), (teacher_id, 0))
+            lesson_index[(req.class_section_id, req.subject_id)] = (teacher_id, count + req.periods_per_week)
+
+        parent = {}
+
+        def find(key):
+            parent.setdefault(key, key)
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        set_glue = defaultdict(list)
+        for cset in self.concurrent_sets:
+            members = [(sec_id, sub_id) + lesson_index[(sec_id, sub_id)] for sec_id in cset.section_ids
+                       for sub_id in cset.subject_ids if (sec_id, sub_id) in lesson_index]
+            for i in range(max((count for *_, count in members), default=0)):
+                glued = [(sec_id, sub_id, t_id, i) for sec_id, sub_id, t_id, count in members if count > i]
+                for key in glued[1:]:
+                    parent[find(key)] = find(glued[0])
+                if len(glued) > 1: set_glue[cset].append(glued)
+
+        lesson_keys = [(sec_id, sub_id, t_id, i) for (sec_id, sub_id), (t_id, count) in lesson_index.items()
+                       for i in range(count)]
+        root_of = {key: find(key) for key in lesson_keys}
+        group_slots = {}
+        group_members = defaultdict(set)
+        for key, root in root_of.items():
+            max_p_week = len(self.DAYS) * self.all_sections[key[0]].periods_per_day
+            group_slots[root] = min(group_slots.get(root, max_p_week), max_p_week)
+            group_members[root].add(key[:3])
+        return lesson_keys, root_of, set_glue, group_slots, group_members
+
+    def _check_human_slots(self, lesson_keys, root_of, group_slots):
+        # Bipartite matching of each human's lessons onto distinct slots. A concurrent-set group is one demand,
+        # and it may only use slots that exist in all of its sections (30 for 6-period, 40 for 8-period
+        # sections). Those domains are prefixes, so slots are pooled into blocks between the domain sizes.
+        report = []
+        demands = defaultdict(dict)
+        for key in lesson_keys:
+            demands[self.person_of[key[2]]].setdefault(root_of[key], set()).add(key[0])
+        for person_id, groups in demands.items():
+            name = self.person_names[person_id]
+            by_domain = defaultdict(int)
+            for root in groups:
+                by_domain[group_slots[root]] += 1
+            bounds = sorted(by_domain)
+            capacity = defaultdict(dict)
+            for domain, count in by_domain.items():
+                capacity['source'][('demand', domain)] = count
+                for lo, hi in zip([0] + bounds, bounds):
+                    if hi <= domain: capacity[('demand', domain)][('block', hi)] = hi - lo
+            for lo, hi in zip([0] + bounds, bounds):
+                capacity[('block', hi)]['sink'] = hi - lo
+            flow, reachable = _max_flow(capacity, 'source', 'sink')
+            if flow == len(groups): continue
+            tight = [domain for domain in by_domain if ('demand', domain) in reachable]
+            count, slots = sum(by_domain[d] for d in tight), max(tight)
+            sections = sorted({self.all_sections[sec_id].name for root, secs in groups.items()
+                               if group_slots[root] in tight for sec_id in secs})
+            if slots == max(bounds) and len(tight) == len(by_domain):
+                report.append(f"❌ PHYSICAL IMPOSSIBILITY: {name} needs {count} separate periods (concurrent sets "
+                              f"counted once) but only {slots} slots exist.")
+            else:
+                report.append(f"❌ TEACHER BOTTLENECK: {name} needs {count} separate periods in {', '.join(sections)} "
+                              f"but those classes only have {slots} slots. Move at least {count - slots} of them into "
+                              f"a Concurrent Set or to another teacher.")
+        return report
+
+    def _check_daily_limits(self, lesson_keys):
+        # Max-flow per section: subjects -> days (at most MAX_PER_DAY each) -> the section's periods per day.
+        report = []
+        counts = defaultdict(lambda: defaultdict(int))
+        for sec_id, sub_id, _, _ in lesson_keys:
+            counts[sec_id][sub_id] += 1
+        for sec_id, subjects in counts.items():
+            section = self.all_sections[sec_id]
+            capacity = defaultdict(dict)
+            for sub_id, count in subjects.items():
+                capacity['source'][('subject', sub_id)] = count
+                for day_idx in range(len(self.DAYS)):
+                    capacity[('subject', sub_id)][('day', day_idx)] = self.MAX_PER_DAY
+            for day_idx in range(len(self.DAYS)):
+                capacity[('day', day_idx)]['sink'] = section.periods_per_day
+            flow, reachable = _max_flow(capacity, 'source', 'sink')
+            total = sum(subjects.values())
+            if flow == total: continue
+            names = sorted(self.snapshot.subjects[sub_id].name for sub_id in subjects
+                           if ('subject', sub_id) in reachable)
+            report.append(f"❌ DAILY LIMIT: {section.name} can only place {flow} of its {total} periods with at most "
+                          f"{self.MAX_PER_DAY} per subject per day. Bottleneck: {', '.join(names)}.")
+        return report
+
+    def _define_variables_and_constraints(self, explain=False, break_symmetry=True):
+        # With explain=True every constraint group is guarded by an assumption literal (see
+        # explain_infeasibility), so glued lessons get their own variables tied by guarded equalities.
+        # break_symmetry=False leaves out the copy ordering, for comparing formulations (timetable.replay).
+        self.guards = {}
+        # We track intervals by both human and the specific teacher ID
+        human_intervals = defaultdict(dict)
+        teacher_intervals = defaultdict(list)
+        section_intervals = defaultdict(list)
+
+        # 1. Index the lessons and build the Concurrent Set "Glue": copy i of every lesson in a set shares one
+        # start variable (see _build_lesson_groups).
+        lesson_keys, root_of, set_glue, group_slots, group_members = self._build_lesson_groups()
+        self.root_of = root_of
+
+        group_vars = {}
+        # explain: the first copy of each glue group per human, and the set that glues each pair of copies
+        first_copies = defaultdict(dict)
+        glue_edges = defaultdict(list)
+        if explain:
+            for cset, groups in set_glue.items():
+                for glued in groups:
+                    for key in glued[1:]:
+                        glue_edges[glued[0]].append((key, cset.id))
+                        glue_edges[key].append((glued[0], cset.id))
+        for key in lesson_keys:
+            sec_id, sub_id, teacher_id, i = key
+            root = root_of[key]
+            person_id = self.person_of[teacher_id]
+            prefix = f'L_{sec_id}_{sub_id}_{teacher_id}_{i}'
+            if explain:
+                # NoOverlap takes no enforcement literal, so each guarded group gets optional intervals.
+                max_p_week = len(self.DAYS) * self.all_sections[sec_id].periods_per_day
+                start_var = self.model.NewIntVar(0, max_p_week - 1, f'{prefix}_start')
+                section_lit = self._guard(('section', sec_id))
+                human_lit = self._guard(('human', person_id))
+                first = first_copies[person_id].setdefault(root, key)
+                if first != key:
+                    # The same human's copy glued to another may share its period only while the sets gluing
+                    # them hold; once one is relaxed, it needs its own place in the human's NoOverlap.
+                    human_lit = self._unless_glued(human_lit, self._glue_path(glue_edges, first, key), prefix)
+                interval = self.model.NewOptionalIntervalVar(start_var, 1, start_var + 1, section_lit,
+                                                             f'{prefix}_section_interval')
+                human_interval = self.model.NewOptionalIntervalVar(start_var, 1, start_var + 1, human_lit,
+                                                                   f'{prefix}_human_interval')
+            else:
+                if root not in group_vars:
+                    start_var = self.model.NewIntVar(0, group_slots[root] - 1, f'{prefix}_start')
+                    interval = self.model.NewIntervalVar(start_var, 1, start_var + 1, f'{prefix}_interval')
+                    group_vars[root] = (start_var, interval)
+                start_var, interval = group_vars[root]
+                human_interval = interval
+            self.class_periods[key] = start_var
+            self.lesson_copies[key[:3]].append(start_var)
+
+            # Add to all three tracking lists; a glued lesson counts once per human (in explain mode every copy
+            # has an interval, switched off while glued, see above).
+            human_intervals[person_id].setdefault(key if explain else root, human_interval)
+            teacher_intervals[teacher_id].append(interval)  # For individual teacher check
+            section_intervals[sec_id].append(interval)
+            self.subject_class_vars[(sec_id, sub_id)].append(start_var)
+
+        if explain:
+            for cset, groups in set_glue.items():
+                set_lit = self._guard(('set', cset.id))
+                for glued in groups:
+                    for key in glued[1:]:
+                        self.model.Add(self.class_periods[key] == self.class_periods[glued[0]]).OnlyEnforceIf(set_lit)
+
+        # 3. Base Constraint: No section can be in two places at once.
+        for intervals in section_intervals.values():
+            self.model.AddNoOverlap(intervals)
+
+        # 3b. Symmetry breaking: the copies of a lesson are interchangeable, so force them into slot order.
+        if break_symmetry:
+            self._break_copy_symmetry({key: group_members[root_of[key]] for key in lesson_keys})
+
+        # 4. Prevent HUMAN overlap; lessons glued by a Concurrent Set share an interval, so they may coincide.
+        for intervals in human_intervals.values():
+            if len(intervals) > 1:
+                self.model.AddNoOverlap(list(intervals.values()))
+
+        # 5. Daily Subject Limit (Your "Max 2" rule)
+        for (sec_id, sub_id), start_vars in self.subject_class_vars.items():
+            section = self.all_sections[sec_id]
+            for day_idx in range(len(self.DAYS)):
+                lits = [self._day_literal(var, day_idx, section.periods_per_day) for var in start_vars]
+                limit = self.model.Add(sum(lits) <= self.MAX_PER_DAY)
+                if explain: limit.OnlyEnforceIf(self._guard(('daily', sec_id, sub_id)))
+        return self.guards
+
+    @staticmethod
+    def _glue_path(glue_edges, start, goal):
+        # Ids of the concurrent sets along one chain of glue between two copies of the same glue group.
+        previous = {start: None}
+        queue = deque([start])
+        while goal not in previous:
+            key = queue.popleft()
+            for other, set_id in glue_edges[key]:
+                if other not in previous:
+                    previous[other] = (key, set_id)
+                    queue.append(other)
+        set_ids = []
+        while previous[goal] is not None:
+            goal, set_id = previous[goal]
+            set_ids.append(set_id)
+        return set_ids
+
+    def _unless_glued(self, human_lit, set_ids, prefix):
+        # True when the human guard holds and at least one of these set guards does not.
+        set_lits = [self._guard(('set', set_id)) for set_id in set_ids]
+        glued = self.model.NewBoolVar(f'{prefix}_glued')
+        self.model.AddBoolAnd(set_lits).OnlyEnforceIf(glued)
+        self.model.AddBoolOr([lit.Not() for lit in set_lits]).OnlyEnforceIf(glued.Not())
+        present = self.model.NewBoolVar(f'{prefix}_human_present')
+        self.model.AddBoolAnd([human_lit, glued.Not()]).OnlyEnforceIf(present)
+        self.model.AddBoolOr([human_lit.Not(), glued]).OnlyEnforceIf(present.Not())
+        return present
+
+    def _guard(self, name):
+        if name not in self.guards:
+            self.guards[name] = self.model.NewBoolVar('assume_' + '_'.join(map(str, name)))
+        return self.guards[name]
+
+    def _describe_guard(self, name):
+        kind, *ids = name
+        if kind == 'section':
+            return f"Section {self.all_sections[ids[0]].name} can attend only one lesson at a time."
+        if kind == 'human':
+            return (f"Teacher {self.person_names[ids[0]]} can teach only one lesson at a time "
+                    f"(outside concurrent sets).")
+        if kind == 'set':
+            cset = next(c for c in self.concurrent_sets if c.id == ids[0])
+            return f"Concurrent set '{cset.name}' must hold its lessons at the same time."
+        sec_id, sub_id = ids
+        return (f"{self.all_sections[sec_id].name} can have at most {self.MAX_PER_DAY} periods of "
+                f"{self.snapshot.subjects[sub_id].name} per day.")
+
+    def explain_infeasibility(self):
+        # Re-solve with every constraint group behind an assumption literal. CP-SAT then reports a subset
+        # of assumptions that is already infeasible, which we shrink to a minimal one by deletion.
+        explainer = TimetableSolver(self.session, replace(self.config, log_search_progress=False),
+                                    section_ids=self.section_ids)
+        guards = explainer._define_variables_and_constraints(explain=True)
+        names = {lit.Index(): name for name, lit in guards.items()}
+
+        def infeasible(lits, time_limit):
+            explainer.model.ClearAssumptions()
+            explainer.model.AddAssumptions(lits)
+            solver = explainer.config.apply(cp_model.CpSolver())
+            solver.parameters.max_time_in_seconds = time_limit
+            status = solver.Solve(explainer.model)
+            return status, solver
+
+        status, solver = infeasible(list(guards.values()), self.config.max_time_in_seconds)
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return ["ℹ️ DEEP SCAN: All rules can be satisfied together; the solver simply ran out of time. "
+                    "Try a longer time limit."]
+        if status != cp_model.INFEASIBLE:
+            return ["ℹ️ DEEP SCAN: Could not isolate the conflict within the time limit."]
+
+        core = [guards[names[index]] for index in solver.SufficientAssumptionsForInfeasibility()]
+        for lit in list(core):
+            trial = [other for other in core if other is not lit]
+            if trial and infeasible(trial, min(5.0, self.config.max_time_in_seconds))[0] == cp_model.INFEASIBLE:
+                core = trial
+
+        report = ["❌ CONFLICT: These rules cannot all be satisfied together:"]
+        report += [f"   • {explainer._describe_guard(names[lit.Index()])}" for lit in core]
+        return report
+
+    def _day_literal(self, var, day_idx, periods_per_day):
+        # Glued lessons share a start variable, so they also share its "falls on this day" literal.
+        key = (var.Index(), day_idx, periods_per_day)
+        if key not in self.day_literals:
+            day_start = day_idx * periods_per_day
+            day_end = (day_idx + 1) * periods_per_day - 1
+            lit = self.model.NewBoolVar(f'day_{var.Name()}_{day_idx}')
+            self.model.AddLinearExpressionInDomain(var, cp_model.Domain(day_start, day_end)).OnlyEnforceIf(lit)
+            self.model.AddLinearExpressionInDomain(var, cp_model.Domain.FromIntervals(
+                [[0, day_start - 1], [day_end + 1, 999]])).OnlyEnforceIf(lit.Not())
+            self.day_literals[key] = lit
+        return self.day_literals[key]
+
+    def _break_copy_symmetry(self, copy_members):
+        # Copy i of a lesson is glued to copy i of every other lesson in its concurrent set, so two
+        # copies are only interchangeable if they are glued to exactly the same lessons. We order
+        # consecutive copies whose glue groups have the same members; every member of a glued group
+        # shares the start variable, so the whole group is ordered the same way.
+        ordered = set()
+        for (sec_id, sub_id, t_id), copies in self.lesson_copies.items():
+            for i in range(len(copies) - 1):
+                pair = (copies[i].Index(), copies[i + 1].Index())
+                if pair in ordered: continue
+                if copy_members[(sec_id, sub_id, t_id, i)] == copy_members[(sec_id, sub_id, t_id, i + 1)]:
+                    self.model.Add(copies[i] < copies[i + 1])
+                    ordered.add(pair)
+
+    def _load_current_slots(self):
+        # The current timetable as sorted slot lists per lesson, in the same slot numbering as the model.
+        current = defaultdict(list)
+        for sec_id, day, period, sub_id, t_id in self.snapshot.entries:
+            section = self.all_sections.get(sec_id)
+            if self.section_ids is not None and sec_id not in self.section_ids:
+                continue
+            if section is None or day not in self.DAYS or not 1 <= period <= section.periods_per_day:
+                continue
+            current[(sec_id, sub_id, t_id)].append(self.DAYS.index(day) * section.periods_per_day + period - 1)
+        for slots in current.values():
+            slots.sort()
+        return current
+
+    def _current_copy_slots(self, current):
+        # The saved slot of every lesson copy. Copy i of a lesson is glued to copy i of the other lessons in its
+        # concurrent sets, which may have fewer copies, so a glued copy takes the earliest saved slot its whole
+        # group shares; the lesson's unglued copies then take its leftover slots in order. Both keep the copies
+        # in slot order (see _break_copy_symmetry). Copies without a matching saved slot are left out.
+        groups = defaultdict(list)
+        for key, root in self.root_of.items():
+            groups[root].append(key)
+        remaining = {lesson: list(slots) for lesson, slots in current.items()}
+        copy_slots = {}
+        for keys in sorted((keys for keys in groups.values() if len(keys) > 1), key=lambda keys: keys[0][3]):
+            shared = set.intersection(*(set(remaining.get(key[:3], ())) for key in keys))
+            if not shared: continue
+            slot = min(shared)
+            for key in keys:
+                copy_slots[key] = slot
+                remaining[key[:3]].remove(slot)
+        unglued = defaultdict(list)
+        for key in sorted(self.root_of, key=lambda key: key[3]):
+            if len(groups[self.root_of[key]]) == 1: unglued[key[:3]].append(key)
+        for lesson, keys in unglued.items():
+            copy_slots.update(zip(keys, remaining.get(lesson, ())))
+        return copy_slots
+
+    def _add_schedule_hints(self):
+        # Every copy is hinted with its saved slot (see _current_copy_slots). The day literals of the daily limit
+        # are hinted too, otherwise CP-SAT has to complete the hint itself. Glued lessons share a variable, which
+        # is hinted only once.
+        hints = {}
+        for key, slot in self._current_copy_slots(self._load_current_slots()).items():
+            start_var = self.class_periods[key]
+            hints.setdefault(start_var.Index(), (start_var, slot))
+        for start_var, slot in hints.values():
+            self.model.AddHint(start_var, slot)
+        for (var_index, day_idx, periods_per_day), lit in self.day_literals.items():
+            if var_index in hints:
+                self.model.AddHint(lit, hints[var_index][1] // periods_per_day == day_idx)
+        return len(hints)
+
+    def _fix_unaffected_lessons(self):
+        # A lesson is affected when its saved slots no longer match the requirement (new, removed, resized,
+        # reassigned, or its section's periods_per_day changed). Its section, its human teacher and its
+        # concurrent sets stay free; every other lesson is pinned to its current slot.
+        current = self._load_current_slots()
+        set_members = defaultdict(set)
+        lesson_sets = defaultdict(set)
+        for cset in self.concurrent_sets:
+            set_sec_ids = set(cset.section_ids)
+            set_sub_ids = set(cset.subject_ids)
+            for key in self.lesson_copies:
+                if key[0] in set_sec_ids and key[1] in set_sub_ids:
+                    set_members[cset.id].add(key)
+                    lesson_sets[key].add(cset.id)
+
+        copy_slots = self._current_copy_slots(current)
+        affected = {key for key, copies in self.lesson_copies.items() if len(current.get(key, [])) != len(copies)}
+        affected |= {key for key in current if key not in self.lesson_copies}
+        # e.g. a concurrent set whose lessons were saved at different times
+        affected |= {key[:3] for key in self.class_periods if key not in copy_slots}
+        sections = {key[0] for key in affected}
+        people = {self.person_of[key[2]] for key in affected if key[2] in self.person_of}
+        free = {key for key in self.lesson_copies if key[0] in sections or self.person_of[key[2]] in people}
+        # Glued lessons move together, so a freed lesson frees the rest of its concurrent sets.
+        for set_id in {set_id for key in free for set_id in lesson_sets[key]}:
+            free |= set_members[set_id]
+
+        fixed = 0
+        for key, start_var in self.class_periods.items():
+            if key[:3] in free: continue
+            self.model.Add(start_var == copy_slots[key])
+            fixed += 1
+        return fixed
+
+    def _extract_solution(self, solver):
+        return self._solution_from_slots({key: solver.Value(var) for key, var in self.class_periods.items()})
+
+    def _solution_from_slots(self, slots):
+        solution = {}
+        for (section_id, subject_id, teacher_id, i), slot_val in slots.items():
+            section = self.all_sections[section_id]
+            max_p = section.periods_per_day
+            day_val = self.DAYS[slot_val // max_p]
+            period_val = slot_val % max_p + 1
+            solution[(day_val, period_val, section_id)] = (subject_id, teacher_id)
+        return solution
+
+
+def save_solution(session, solution):
+    # Replaces the stored timetable with a solver solution by diffing it against the stored rows: only the
+    # (section, day, period) cells whose lesson changed are deleted, updated or inserted, each kind in one
+    # executemany. Unchanged rows keep their ids. The caller commits. Returns the number of cells per kind.
+    entries = ScheduleEntry.__table__
+    existing = {(day, period, section_id): (entry_id, subject_id, teacher_id)
+                for entry_id, section_id, day, period, subject_id, teacher_id in session.execute(
+                    select(entries.c.id, entries.c.class_section_id, entries.c.day, entries.c.period,
+                           entries.c.subject_id, entries.c.teacher_id))}
+    inserts, updates, unchanged = [], [], 0
+    for (day, period, section_id), (subject_id, teacher_id) in solution.items():
+        row = existing.pop((day, period, section_id), None)
+        if row is None:
+            inserts.append({"class_section_id": section_id, "day": day, "period": period, "subject_id": subject_id,
+                            "teacher_id": teacher_id})
+        elif row[1:] != (subject_id, teacher_id):
+            updates.append({"entry_id": row[0], "new_subject_id": subject_id, "new_teacher_id": teacher_id})
+        else:
+            unchanged += 1
+    deletes = [row[0] for row in existing.values()]
+    if deletes:
+        session.execute(delete(entries).where(entries.c.id.in_(deletes)))
+    if updates:
+        session.execute(entries.update().where(entries.c.id == bindparam("entry_id"))
+                        .values(subject_id=bindparam("new_subject_id"), teacher_id=bindparam("new_teacher_id")),
+                        updates)
+    if inserts:
+        session.execute(insert(entries), inserts)
+    # Entry objects already loaded in this session may now be stale.
+    session.expire_all()
+    return {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes), "unchanged": unchanged}
+
+
+def changed_cells(counts):
+    return counts["inserted"] + counts["updated"] + counts["deleted"]
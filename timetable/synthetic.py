@@ -0,0 +1,190 @@
+# timetable/synthetic.py
+# Generates realistic school databases of any size, shaped like timetable_v5.db: 8-period junior grades with
+# language and skill splits, 6-period senior grades with science/commerce/humanities streams, teachers who
+# work under several " (2)" style identities, and concurrent sets. Used by `python -m timetable benchmark`.
+import os
+import random
+from collections import namedtuple
+
+from timetable.database import session_factory
+from timetable.models import (ClassSection, ConcurrentSet, Person, Subject, SubjectRequirement, Teacher,
+                              TeacherAssignment, setup_database)
+
+JUNIOR_PERIODS, SENIOR_PERIODS = 8, 6
+# Taught to every junior section separately: 30 periods, plus 6 of a language and 4 of a skill subject.
+JUNIOR_SUBJECTS = [("english", 6), ("mathematics", 8), ("physics", 3), ("chemistry", 2), ("biology", 2),
+                   ("geography", 2), ("history", 2), ("civics", 2), ("life skills", 1), ("library", 2)]
+JUNIOR_LANGUAGES, JUNIOR_LANGUAGE_PERIODS = ["hindi", "sanskrit"], 6
+JUNIOR_SKILLS, JUNIOR_SKILL_PERIODS = ["ai", "it", "pat"], 4
+# stream: (own subjects, "main split" elective, "tech split" elective or None); 30 periods each.
+SENIOR_STREAMS = {
+    "Sci-M": ([], ("mathematics", 5), ("cs/ip (Sci)", 5)),
+    "Sci-B": ([], ("biology", 5), ("pe (Sci)", 5)),
+    "Com": ([("english", 6), ("accountancy", 7), ("business studies", 6), ("eco", 6)], ("cs/ip", 5), None),
+    "Hum": ([("english", 6), ("history", 7), ("political science", 6), ("geography", 6)], ("pe", 5), None),
+}
+# The two science streams share these lessons (one teacher, both sections at once).
+SCIENCE_SYNCS = [("english", 6), ("physics", 7), ("chemistry", 7)]
+# Periods one human may teach per week, by periods per day; glued lessons count once.
+LOAD_CAP = {JUNIOR_PERIODS: 30, SENIOR_PERIODS: 24}
+
+FIRST_NAMES = ["Aarti", "Amit", "Anjali", "Anupama", "Arushi", "Asha", "Ashima", "Deepak", "Geeta", "Hitender",
+               "Kavita", "Komal", "Mamta", "Manasi", "Meenakshi", "Meenu", "Neha", "Nidhi", "Parveen", "Prabhat",
+               "Rachna", "Radhika", "Rekha", "Rohit", "Seema", "Suman", "Sunil", "Veena", "Vikas", "Yukta"]
+LAST_NAMES = ["Ahuja", "Bist", "Goel", "Grover", "Gupta", "Jaiswal", "Kaushal", "Kumar", "Mehta", "Munjal",
+              "Rawat", "Sharma", "Sood", "Vashisht", "Vij", "Vyas"]
+
+# A block of lessons taught by one teacher; sections of a glued block are taught at the same time.
+Unit = namedtuple("Unit", "subject sections periods periods_per_day concurrent_set")
+
+
+def _section_names(num_sections):
+    # Grades of four sections each; the first half of the grades are junior, the rest senior.
+    grades = (num_sections + 3) // 4
+    junior = max(1, grades // 2) if grades > 1 else grades
+    names = []
+    for grade in range(grades):
+        count = min(4, num_sections - 4 * grade)
+        if grade < junior:
+            names += [(f"{grade + 1}th-{'ABCD'[i]}", JUNIOR_PERIODS, grade) for i in range(count)]
+        else:
+            names += [(f"{grade + 1} {stream}", SENIOR_PERIODS, grade) for stream in list(SENIOR_STREAMS)[:count]]
+    return names
+
+
+def _plan_units(sections):
+    # Returns the teaching units and the concurrent sets as {name: (section names, subject names)}.
+    units, sets = [], {}
+    by_grade = {}
+    for name, periods_per_day, grade in sections:
+        by_grade.setdefault(grade, []).append((name, periods_per_day))
+    for grade, members in sorted(by_grade.items()):
+        names = [name for name, _ in members]
+        if members[0][1] == JUNIOR_PERIODS:
+            for name in names:
+                units += [Unit(subject, (name,), periods, JUNIOR_PERIODS, None) for subject, periods in JUNIOR_SUBJECTS]
+            language_set, skill_set = f"G{grade + 1} Language Split", f"G{grade + 1} Skill Split"
+            for split_set, subjects, periods in [(language_set, JUNIOR_LANGUAGES, JUNIOR_LANGUAGE_PERIODS),
+                                                 (skill_set, JUNIOR_SKILLS, JUNIOR_SKILL_PERIODS)]:
+                chosen = {subject: tuple(name for i, name in enumerate(names) if subjects[i % len(subjects)] == subject)
+                          for subject in subjects}
+                units += [Unit(subject, secs, periods, JUNIOR_PERIODS, split_set)
+                          for subject, secs in chosen.items() if secs]
+                if len(names) > 1:
+                    sets[split_set] = (names, [subject for subject, secs in chosen.items() if secs])
+            continue
+        streams = {name.split(" ", 1)[1]: name for name in names}
+        science = [streams[s] for s in ("Sci-M", "Sci-B") if s in streams]
+        for subject, periods in SCIENCE_SYNCS:
+            if not science: break
+            sync_set = f"G{grade + 1} {subject.title()} Sync"
+            units.append(Unit(subject, tuple(science), periods, SENIOR_PERIODS, sync_set))
+            if len(science) > 1: sets[sync_set] = (science, [subject])
+        main_set, tech_set = f"G{grade + 1} Main Split", f"G{grade + 1} Tech Split"
+        for stream, name in streams.items():
+            own, main, tech = SENIOR_STREAMS[stream]
+            units += [Unit(subject, (name,), periods, SENIOR_PERIODS, None) for subject, periods in own]
+            units.append(Unit(main[0], (name,), main[1], SENIOR_PERIODS, main_set))
+            if tech: units.append(Unit(tech[0], (name,), tech[1], SENIOR_PERIODS, tech_set))
+        if len(names) > 1:
+            sets[main_set] = (names, [SENIOR_STREAMS[s][1][0] for s in streams])
+        if len(science) > 1:
+            sets[tech_set] = (science, [SENIOR_STREAMS[s][2][0] for s in ("Sci-M", "Sci-B") if s in streams])
+    return units, sets
+
+
+def _allocate_teachers(units, split_ratio, rng):
+    # First fit per subject, then some lightly loaded humans take on a second subject under a " (2)" identity.
+    # A human never gets two different units of one concurrent set, since those run at the same time.
+    humans = []
+    for unit in units:
+        for human in humans:
+            if (human["subject"] == unit.subject and human["periods_per_day"] == unit.periods_per_day
+                    and human["load"] + unit.periods <= LOAD_CAP[unit.periods_per_day]
+                    and (unit.concurrent_set is None or unit.concurrent_set not in human["sets"])):
+                break
+        else:
+            human = {"subject": unit.subject, "periods_per_day": unit.periods_per_day, "load": 0, "sets": set(),
+                     "units": []}
+            humans.append(human)
+        human["load"] += unit.periods
+        human["units"].append(unit)
+        if unit.concurrent_set: human["sets"].add(unit.concurrent_set)
+
+    people = []
+    merged = set()
+    order = list(range(len(humans)))
+    rng.shuffle(order)
+    for i in order:
+        if i in merged: continue
+        merged.add(i)
+        identities = [humans[i]]
+        if rng.random() < split_ratio:
+            for j in order:
+                other = humans[j]
+                if j in merged or other["subject"] == humans[i]["subject"]: continue
+                if (other["periods_per_day"] == humans[i]["periods_per_day"] and not other["sets"] & humans[i]["sets"]
+                        and other["load"] + humans[i]["load"] <= LOAD_CAP[other["periods_per_day"]]):
+                    identities.append(other)
+                    merged.add(j)
+                    break
+        people.append(identities)
+    return people
+
+
+def _person_names(count, rng):
+    base = [(first, last) for first in FIRST_NAMES for last in LAST_NAMES]
+    rng.shuffle(base)
+    names = [f"{first} {last}" for first, last in base]
+    # Schools larger than the name pool get middle initials.
+    for letter in "ABCDEFGHJKLMNPRSTW":
+        if len(names) >= count: break
+        names += [f"{first} {letter}. {last}" for first, last in base]
+    return names[:count]
+
+
+def generate_school(session, num_sections, seed=0, split_ratio=0.25):
+    """Fills an empty database with a school of num_sections class sections. Returns a summary dict."""
+    rng = random.Random(seed)
+    sections = _section_names(num_sections)
+    units, sets = _plan_units(sections)
+    people = _allocate_teachers(units, split_ratio, rng)
+
+    section_rows = {name: ClassSection(name=name, display_name=name, periods_per_day=periods_per_day)
+                    for name, periods_per_day, _ in sections}
+    subject_rows = {name: Subject(name=name) for name in sorted({unit.subject for unit in units})}
+    session.add_all(list(section_rows.values()) + list(subject_rows.values()))
+
+    teachers = 0
+    for name, identities in zip(_person_names(len(people), rng), people):
+        person = Person(name=name)
+        for k, identity in enumerate(identities):
+            teacher = Teacher(name=name if k == 0 else f"{name} ({k + 1})", person=person)
+            session.add(teacher)
+            teachers += 1
+            for unit in identity["units"]:
+                for section_name in unit.sections:
+                    session.add(TeacherAssignment(teacher=teacher, subject=subject_rows[unit.subject],
+                                                  class_section=section_rows[section_name]))
+                    session.add(SubjectRequirement(class_section=section_rows[section_name],
+                                                   subject=subject_rows[unit.subject], periods_per_week=unit.periods))
+    for name, (section_names, subject_names) in sets.items():
+        session.add(ConcurrentSet(name=name, sections=[section_rows[s] for s in section_names],
+                                  subjects=[subject_rows[s] for s in subject_names]))
+    session.commit()
+    return {"sections": len(section_rows), "subjects": len(subject_rows), "teachers": teachers,
+            "people": len(people), "lessons": sum(unit.periods * len(unit.sections) for unit in units),
+            "concurrent_sets": len(sets)}
+
+
+def create_school_database(db_path, num_sections, seed=0, split_ratio=0.25, overwrite=False):
+    if os.path.exists(db_path):
+        if not overwrite: raise FileExistsError(db_path)
+        os.remove(db_path)
+    engine = setup_database(db_path)
+    session = session_factory(engine)()
+    try:
+        return generate_school(session, num_sections, seed=seed, split_ratio=split_ratio)
+    finally:
+        session.close()
+        engine.dispose()
@@ -0,0 +1,72 @@
+# timetable/telemetry.py
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+from timetable.models import SolverRun
+
+
+class SearchLogMonitor:
+    """Reads CP-SAT's search log, when it is on, to time phases the solver response does not report, such as
+    presolve."""
+
+    def __init__(self):
+        self.presolve_started = None
+        self.presolve_finished = None
+
+    def attach(self, solver):
+        # Only reads a log the configuration asked for (log_search_progress): producing it just for the timing
+        # would print it on every solve and slow the search. Without it presolve_seconds is None.
+        if solver.parameters.log_search_progress: solver.log_callback = self
+        return self
+
+    def __call__(self, line):
+        if self.presolve_started is None and line.startswith("Starting presolve"):
+            self.presolve_started = time.time()
+        elif self.presolve_finished is None and line.startswith("Presolved "):
+            self.presolve_finished = time.time()
+
+    @property
+    def presolve_seconds(self):
+        if self.presolve_started is None or self.presolve_finished is None: return None
+        return self.presolve_finished - self.presolve_started
+
+
+def record_solver_run(bind, **fields):
+    # Telemetry uses its own short session, so it never commits or rolls back the caller's work, and a
+    # database that cannot take the row (locked, read-only) only costs a warning.
+    try:
+        SolverRun.__table__.create(bind, checkfirst=True)
+        session = sessionmaker(bind=bind)()
+        try:
+            run = SolverRun(**fields)
+            session.add(run)
+            session.commit()
+            return run.id
+        finally:
+            session.close()
+    except SQLAlchemyError as e:
+        print(f"Warning: could not record the solver run: {e}")
+        return None
+
+
+def record_persist_time(bind, run_id, seconds, cells_changed=None):
+    if run_id is None: return
+    try:
+        session = sessionmaker(bind=bind)()
+        try:
+            session.query(SolverRun).filter_by(id=run_id).update({"persist_seconds": seconds,
+                                                                  "cells_changed": cells_changed})
+            session.commit()
+        finally:
+            session.close()
+    except SQLAlchemyError as e:
+        print(f"Warning: could not record the save time: {e}")
+
+
+def load_solver_runs(session, limit=200):
+    # The latest runs, oldest first. Other sessions (the solver thread, worker processes) write the rows, so
+    # they are re-read rather than taken from this session's identity map.
+    runs = session.query(SolverRun).populate_existing().order_by(SolverRun.id.desc()).limit(limit).all()
+    return runs[::-1]
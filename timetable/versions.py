@@ -0,0 +1,103 @@
+# timetable/versions.py
+# Every saved timetable is kept as a version. schedule_entries always holds the active one, so activating an
+# older version (a rollback) rewrites only the cells that differ instead of re-solving.
+from sqlalchemy import and_, delete, exists, func, insert, or_, select
+
+from timetable.models import ClassSection, ScheduleEntry, ScheduleVersion, ScheduleVersionCell, Subject, Teacher
+from timetable.solver import changed_cells, save_solution
+
+
+def _solution_from_rows(rows):
+    return {(day, period, section_id): (subject_id, teacher_id)
+            for section_id, day, period, subject_id, teacher_id in rows}
+
+
+def current_solution(session):
+    entries = ScheduleEntry.__table__
+    return _solution_from_rows(session.execute(select(entries.c.class_section_id, entries.c.day, entries.c.period,
+                                                      entries.c.subject_id, entries.c.teacher_id)))
+
+
+def version_solution(session, version_id):
+    cells = ScheduleVersionCell.__table__
+    return _solution_from_rows(session.execute(select(cells.c.class_section_id, cells.c.day, cells.c.period,
+                                                      cells.c.subject_id, cells.c.teacher_id)
+                                               .where(cells.c.version_id == version_id)))
+
+
+def active_version(session):
+    return session.query(ScheduleVersion).filter_by(is_active=True).first()
+
+
+def list_versions(session, limit=100):
+    # Newest first. Versions saved by the GUI's save thread come from another session, so they are re-read.
+    return (session.query(ScheduleVersion).populate_existing().order_by(ScheduleVersion.id.desc())
+            .limit(limit).all())
+
+
+def _add_version(session, solution, label, parent_id=None, solver_run_id=None, cells_changed=None):
+    version = ScheduleVersion(label=label, parent_id=parent_id, solver_run_id=solver_run_id,
+                              num_cells=len(solution), cells_changed=cells_changed)
+    session.add(version)
+    session.flush()
+    if solution:
+        session.execute(insert(ScheduleVersionCell.__table__), [
+            {"version_id": version.id, "class_section_id": section_id, "day": day, "period": period,
+             "subject_id": subject_id, "teacher_id": teacher_id}
+            for (day, period, section_id), (subject_id, teacher_id) in solution.items()])
+    return version
+
+
+def _make_active(session, version):
+    for other in session.query(ScheduleVersion).filter_by(is_active=True).all():
+        other.is_active = False
+    version.is_active = True
+
+
+def store_solution(session, solution, label="Generated", solver_run_id=None):
+    # Saves a solution as a new version and makes it the active timetable; the caller commits. Returns
+    # (version, cell counts from save_solution). A solution identical to the active timetable adds no version.
+    # The first call on a database keeps its existing timetable as a version of its own.
+    active = active_version(session)
+    if active is None:
+        current = current_solution(session)
+        if current:
+            active = _add_version(session, current, "Before versioning")
+            _make_active(session, active)
+    counts = save_solution(session, solution)
+    if active is not None and changed_cells(counts) == 0:
+        return active, counts
+    version = _add_version(session, solution, label, parent_id=active.id if active else None,
+                           solver_run_id=solver_run_id, cells_changed=changed_cells(counts))
+    _make_active(session, version)
+    return version, counts
+
+
+def activate_version(session, version_id):
+    # Makes a stored version the active timetable; the caller commits. Returns the cell counts, as save_solution
+    # does. The diff against the current timetable runs in SQLite, so neither timetable is loaded and only the
+    # cells that differ are written; lessons whose section, subject or teacher has been deleted since the
+    # version was saved are left out.
+    version = session.get(ScheduleVersion, version_id)
+    if version is None: raise ValueError(f"There is no timetable version {version_id}.")
+    entries, cells = ScheduleEntry.__table__, ScheduleVersionCell.__table__
+    in_version = (cells.c.version_id == version_id,
+                  cells.c.class_section_id.in_(select(ClassSection.__table__.c.id)),
+                  cells.c.subject_id.in_(select(Subject.__table__.c.id)),
+                  cells.c.teacher_id.in_(select(Teacher.__table__.c.id)))
+    same_cell = and_(cells.c.class_section_id == entries.c.class_section_id, cells.c.day == entries.c.day,
+                     cells.c.period == entries.c.period, *in_version)
+    changed = or_(cells.c.subject_id.is_distinct_from(entries.c.subject_id),
+                  cells.c.teacher_id.is_distinct_from(entries.c.teacher_id))
+    deleted = session.execute(delete(entries).where(~exists().where(same_cell))).rowcount
+    updated = session.execute(entries.update().where(exists().where(same_cell, changed)).values(
+        subject_id=select(cells.c.subject_id).where(same_cell).scalar_subquery(),
+        teacher_id=select(cells.c.teacher_id).where(same_cell).scalar_subquery())).rowcount
+    columns = ["class_section_id", "day", "period", "subject_id", "teacher_id"]
+    inserted = session.execute(insert(entries).from_select(columns, select(*(cells.c[name] for name in columns))
+                                                           .where(*in_version, ~exists().where(same_cell)))).rowcount
+    kept = session.execute(select(func.count()).select_from(cells).where(*in_version)).scalar()
+    # Entry objects already loaded in this session may now be stale.
+    session.expire_all()
+    _make_active(session, version)
+    return {"inserted": inserted, "updated": updated, "deleted": deleted, "unchanged": kept - inserted - updated}
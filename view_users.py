@@ -1,7 +1,6 @@
 # view_users.py
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from timetable.database import create_db_engine, session_factory
 
 # Import your models
 from main import Base, User, Teacher
@@ -11,8 +10,8 @@ DB_PATH = os.path.join(BASE_DIR, "timetable_v5.db")
 
 
 def show_all_users():
-    engine = create_engine(f'sqlite:///{DB_PATH}')
-    Session = sessionmaker(bind=engine)
+    engine = create_db_engine(DB_PATH)
+    Session = session_factory(engine)
     session = Session()
 
     print("--- Listing All User Accounts in the Database ---")